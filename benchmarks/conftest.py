@@ -0,0 +1,45 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+
+from nstimes.ratelimit import TokenBucket
+from nstimes.ratelimit import UNLIMITED
+from nstimes.utils import configure_rate_limiter
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small json body over a keep-alive connection"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = json.dumps({"trips": []}).encode()
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture(scope="session")
+def stand_in_server() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit() -> None:
+    """Measure the client, not the quota of the NS API"""
+    configure_rate_limiter(TokenBucket(rate=UNLIMITED))
@@ -0,0 +1,130 @@
+import json
+import random
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import Any
+
+import httpx
+
+STATIONS = [
+    ("Amsterdam Centraal", "8400058", "ASD"),
+    ("Utrecht Centraal", "8400621", "UT"),
+    ("Amersfoort Centraal", "8400055", "AMF"),
+    ("Rotterdam Centraal", "8400530", "RTD"),
+    ("Den Haag Centraal", "8400282", "GVC"),
+    ("Eindhoven Centraal", "8400206", "EHV"),
+]
+CEST = timezone(timedelta(hours=2))
+# Number of trips in a v3/trips response: a typical one, a busy day, a stress test
+TRIP_SIZES = [10, 100, 1000]
+
+
+def ns_time(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+
+def stop(
+    station: tuple[str, str, str], planned: datetime, delay: int
+) -> dict[str, Any]:
+    name, uic_code, code = station
+    track = str(random.randint(1, 20))
+    return {
+        "name": name,
+        "lng": 5.11,
+        "lat": 52.09,
+        "countryCode": "NL",
+        "uicCode": uic_code,
+        "stationCode": code,
+        "type": "STATION",
+        "plannedTimeZoneOffset": 120,
+        "plannedDateTime": ns_time(planned),
+        "actualTimeZoneOffset": 120,
+        "actualDateTime": ns_time(planned + timedelta(minutes=delay)),
+        "plannedTrack": track,
+        "actualTrack": track,
+        "checkinStatus": "NOTHING",
+    }
+
+
+def make_trips_payload(
+    trips: int,
+    legs: int = 1,
+    start: datetime = datetime(2023, 10, 15, 6, 0, tzinfo=CEST),
+    seed: int = 0,
+) -> dict[str, Any]:
+    """A v3/trips response with the shape and field set of a recorded one
+
+    Trips depart every 10 minutes from `start`, with `legs` legs of 20
+    minutes and a 5 minute transfer. Random delays are seeded, so the
+    payload is the same on every run.
+    """
+    random.seed(seed)
+    payload = []
+    for index in range(trips):
+        departure = start + timedelta(minutes=10 * index)
+        delay = random.choice([0, 0, 0, 1, 2, 5])
+        trip_legs: list[dict[str, Any]] = []
+        for leg_index in range(legs):
+            origin = STATIONS[leg_index % len(STATIONS)]
+            destination = STATIONS[(leg_index + 1) % len(STATIONS)]
+            arrival = departure + timedelta(minutes=20)
+            trip_legs.append(
+                {
+                    "idx": str(leg_index),
+                    "name": f"IC {3000 + index}",
+                    "travelType": "PUBLIC_TRANSIT",
+                    "direction": destination[0],
+                    "cancelled": random.random() < 0.02,
+                    "origin": stop(origin, departure, delay),
+                    "destination": stop(destination, arrival, delay),
+                    "product": {
+                        "number": str(3000 + index),
+                        "categoryCode": random.choice(["IC", "SPR", "ICD"]),
+                        "shortCategoryName": "IC",
+                        "operatorName": "NS",
+                        "type": "TRAIN",
+                    },
+                    "stops": [
+                        {"uicCode": origin[1], "name": origin[0]},
+                        {"uicCode": destination[1], "name": destination[0]},
+                    ],
+                }
+            )
+            departure = arrival + timedelta(minutes=5)
+        payload.append(
+            {
+                "idx": index,
+                "uid": f"arnu|fromStation={trip_legs[0]['origin']['uicCode']}|{index}",
+                "ctxRecon": f"arnu|{index}",
+                "plannedDurationInMinutes": 25 * legs - 5,
+                "transfers": legs - 1,
+                "status": "NORMAL",
+                "legs": trip_legs,
+                "optimal": False,
+                "type": "NS",
+            }
+        )
+    return {"source": "HARP", "trips": payload}
+
+
+def upcoming_trips_payload(trips: int, legs: int = 1) -> dict[str, Any]:
+    """Like make_trips_payload, but departing from the next minute on
+
+    Needed wherever departures are parsed against the current time, as trips
+    that already left are skipped.
+    """
+    start = datetime.now(CEST).replace(second=0, microsecond=0)
+    return make_trips_payload(trips, legs, start=start + timedelta(minutes=1))
+
+
+def mock_transport(payload: dict[str, Any]) -> httpx.MockTransport:
+    """Answers every request with `payload`, serialized once up front"""
+    body = json.dumps(payload).encode()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, content=body, headers={"Content-Type": "application/json"}
+        )
+
+    return httpx.MockTransport(handler)
@@ -0,0 +1,29 @@
+import httpx
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from nstimes.utils import ClientSettings
+from nstimes.utils import httpx_get
+
+QUERY = {"originUicCode": "8400058", "destinationUicCode": "8400621"}
+
+
+def test_new_client_per_request(
+    benchmark: BenchmarkFixture, stand_in_server: str
+) -> None:
+    def get() -> httpx.Response:
+        with httpx.Client(base_url=stand_in_server) as client:
+            return httpx_get(
+                token="x", query_params=QUERY, api="v3/trips", client=client
+            )
+
+    benchmark.group = "httpx_get"
+    benchmark(get)
+
+
+def test_pooled_client(benchmark: BenchmarkFixture, stand_in_server: str) -> None:
+    settings = ClientSettings(base_url=stand_in_server)
+    with httpx.Client(**settings.client_kwargs()) as client:
+        benchmark.group = "httpx_get"
+        benchmark(
+            httpx_get, token="x", query_params=QUERY, api="v3/trips", client=client
+        )
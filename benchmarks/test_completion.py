@@ -0,0 +1,62 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from nstimes.completion import CompletionIndex
+from nstimes.completion import get_completion_index
+from nstimes.completion import load_index_snapshot
+from nstimes.completion import write_index_snapshot
+from nstimes.main import complete_name
+from nstimes.stations import get_station_codes
+from nstimes.stations import get_uic_mapping
+
+INCOMPLETE = ["A", "Utrecht", "Den Haag C", "centraal", "xyz"]
+
+
+def complete_linear(incomplete: str) -> list[str]:
+    return list(complete_name(lut=get_uic_mapping(), incomplete=incomplete))
+
+
+def complete_indexed(incomplete: str) -> list[str]:
+    return get_completion_index().complete(incomplete)
+
+
+@pytest.mark.parametrize("incomplete", INCOMPLETE)
+@pytest.mark.parametrize(
+    "complete", [complete_linear, complete_indexed], ids=["linear", "indexed"]
+)
+def test_complete_station_name(
+    benchmark: BenchmarkFixture,
+    complete: Callable[[str], list[str]],
+    incomplete: str,
+) -> None:
+    complete(incomplete)  # warm up the station and completion index
+    benchmark.group = f"complete:{incomplete}"
+    benchmark(complete, incomplete)
+
+
+# Shell completion runs a new process for every Tab, so what a Tab costs is
+# getting an index plus one query, from scratch or from the snapshot.
+@pytest.mark.parametrize("source", ["build", "snapshot"])
+def test_complete_station_name_cold(
+    benchmark: BenchmarkFixture, source: str, tmp_path: Path
+) -> None:
+    uic_mapping = get_uic_mapping()
+    codes = get_station_codes()
+    path = str(tmp_path / "stations.json")
+    Path(path).write_text("{}", encoding="utf-8")
+    write_index_snapshot(CompletionIndex(uic_mapping, aliases=codes), path)
+
+    def complete_cold(incomplete: str) -> list[str]:
+        if source == "build":
+            index = CompletionIndex(uic_mapping, aliases=codes)
+        else:
+            loaded = load_index_snapshot(path)
+            assert loaded is not None
+            index = loaded
+        return index.complete(incomplete)
+
+    benchmark.group = "complete:cold"
+    benchmark(complete_cold, "Utrecht")
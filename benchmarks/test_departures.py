@@ -0,0 +1,73 @@
+from typing import Iterator
+
+import httpx
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.fixtures import mock_transport
+from benchmarks.fixtures import TRIP_SIZES
+from benchmarks.fixtures import upcoming_trips_payload
+from nstimes.departure import get_departures
+from nstimes.departure import parse_datetime
+from nstimes.departure import parse_departures
+from nstimes.departure import TripFilter
+
+START = "Amsterdam Centraal"
+END = "Utrecht Centraal"
+
+
+@pytest.fixture(params=TRIP_SIZES, ids=lambda size: f"{size}-trips")
+def trips(request: pytest.FixtureRequest) -> list[dict]:  # type: ignore
+    return upcoming_trips_payload(request.param)["trips"]  # type: ignore
+
+
+@pytest.fixture
+def client(trips: list[dict]) -> Iterator[httpx.Client]:  # type: ignore
+    transport = mock_transport({"source": "HARP", "trips": trips})
+    with httpx.Client(base_url="https://ns.test", transport=transport) as client:
+        yield client
+
+
+def test_parse_departures(benchmark: BenchmarkFixture, trips: list[dict]) -> None:  # type: ignore
+    benchmark.group = f"parse_departures:{len(trips)}"
+    departures = benchmark.pedantic(  # type: ignore
+        lambda: list(parse_departures(trips)),
+        setup=parse_datetime.cache_clear,
+        rounds=20,
+    )
+    assert len(departures) == len(trips)
+
+
+def test_get_departures(benchmark: BenchmarkFixture, client: httpx.Client) -> None:
+    """The whole pipeline: request, json decoding and parsing, without the cache"""
+    benchmark.group = "get_departures"
+    departures = benchmark(
+        get_departures,
+        START,
+        END,
+        token="x",
+        rdc3339_datetime="2023-10-15T06:00:00+0200",
+        client=client,
+        use_cache=False,
+    )
+    assert departures
+
+
+MULTI_LEG_TRIPS = upcoming_trips_payload(1000, legs=3)["trips"]
+
+
+@pytest.mark.parametrize(
+    "trip_filter",
+    [TripFilter(), TripFilter(max_transfers=1), TripFilter(min_transfer_minutes=10)],
+    ids=["none", "max-transfers", "min-transfer-minutes"],
+)
+def test_filter_multi_leg_trips(
+    benchmark: BenchmarkFixture, trip_filter: TripFilter
+) -> None:
+    """Rejected trips should cost next to nothing, whatever their number of legs"""
+    benchmark.group = "trip_filter:1000-trips"
+    benchmark.pedantic(  # type: ignore
+        lambda: list(parse_departures(MULTI_LEG_TRIPS, trip_filter=trip_filter)),
+        setup=parse_datetime.cache_clear,
+        rounds=20,
+    )
@@ -0,0 +1,45 @@
+import random
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from nstimes.departure import Departure
+from nstimes.departure import Time
+from nstimes.history import HistoryStore
+
+ROWS = 1_000_000
+BATCH = 10_000
+
+
+@pytest.fixture(scope="module")
+def store() -> HistoryStore:
+    """A year and a half of departures, every 45 seconds, on one route"""
+    random.seed(0)
+    store = HistoryStore(":memory:")
+    start = datetime(2022, 1, 1)
+    for offset in range(0, ROWS, BATCH):
+        departures = []
+        for i in range(offset, offset + BATCH):
+            planned = start + timedelta(seconds=45 * i)
+            delay = timedelta(minutes=int(random.expovariate(0.5)))
+            departures.append(
+                Departure(
+                    train_type="IC",
+                    platform="5",
+                    departure_time=Time(planned=planned, actual=planned + delay),
+                    arrival_time=Time(planned=planned + timedelta(minutes=30)),
+                    cancelled=random.random() < 0.02,
+                )
+            )
+        store.record("Amsterdam Centraal", "Utrecht Centraal", departures)
+    return store
+
+
+def test_stats_over_a_million_departures(
+    benchmark: BenchmarkFixture, store: HistoryStore
+) -> None:
+    stats = benchmark(store.stats, "Amsterdam Centraal", "Utrecht Centraal")
+    assert stats.departures == ROWS
+    assert stats.percentile(50) <= stats.percentile(99)
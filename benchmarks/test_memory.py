@@ -0,0 +1,98 @@
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.fixtures import make_trips_payload
+from nstimes.departure import Departure
+from nstimes.departure import DepartureTable
+from nstimes.departure import parse_datetime
+from nstimes.departure import parse_time
+from nstimes.departure import Time
+
+TRIPS = make_trips_payload(trips=5000)["trips"]
+
+
+class PlainTime:
+    """Time as it was before it got __slots__"""
+
+    def __init__(self, time: Time) -> None:
+        self.actual = time.actual
+        self.planned = time.planned
+
+
+@dataclass
+class PlainDeparture:
+    """Departure as it was before it got slots"""
+
+    train_type: str
+    platform: str
+    departure_time: PlainTime
+    arrival_time: PlainTime
+    cancelled: bool = False
+
+
+def plain_departures() -> list[PlainDeparture]:
+    return [
+        PlainDeparture(
+            train_type=trip["legs"][0]["product"]["categoryCode"],
+            platform=trip["legs"][0]["origin"]["plannedTrack"],
+            departure_time=PlainTime(parse_time(trip["legs"][0]["origin"])),
+            arrival_time=PlainTime(parse_time(trip["legs"][0]["destination"])),
+        )
+        for trip in TRIPS
+    ]
+
+
+def slotted_departures() -> list[Departure]:
+    # The fixture departs in 2023, so every trip is in the past for parse_departures
+    return [
+        Departure(
+            train_type=trip["legs"][0]["product"]["categoryCode"],
+            platform=trip["legs"][0]["origin"]["plannedTrack"],
+            departure_time=parse_time(trip["legs"][0]["origin"]),
+            arrival_time=parse_time(trip["legs"][0]["destination"]),
+        )
+        for trip in TRIPS
+    ]
+
+
+def departure_table() -> DepartureTable:
+    return DepartureTable(slotted_departures())
+
+
+def bytes_per_departure(build: Callable[[], Any]) -> float:
+    parse_datetime.cache_clear()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    # Only count what the departures keep alive, not the timestamp cache
+    parse_datetime.cache_clear()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return (after - before) / len(TRIPS)
+
+
+@pytest.mark.parametrize(
+    "build",
+    [plain_departures, slotted_departures, departure_table],
+    ids=["plain", "slotted", "table"],
+)
+def test_memory_per_departure(
+    benchmark: BenchmarkFixture, build: Callable[[], Any]
+) -> None:
+    benchmark.group = "memory"
+    benchmark.extra_info["bytes_per_departure"] = bytes_per_departure(build)
+    benchmark.pedantic(build, rounds=3)  # type: ignore
+
+
+def test_compact_representations_are_smaller() -> None:
+    plain = bytes_per_departure(plain_departures)
+    slotted = bytes_per_departure(slotted_departures)
+    # Only the table itself is retained once the intermediate list is dropped
+    table = bytes_per_departure(lambda: DepartureTable(iter(slotted_departures())))
+    assert table < slotted < plain
@@ -0,0 +1,48 @@
+from typing import Iterator
+
+import httpx
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.fixtures import mock_transport
+from benchmarks.fixtures import upcoming_trips_payload
+from nstimes.departure import get_departures
+from nstimes.metrics import configure_metrics
+from nstimes.metrics import Metrics
+from nstimes.metrics import span
+
+
+@pytest.fixture
+def client() -> Iterator[httpx.Client]:
+    transport = mock_transport(upcoming_trips_payload(100))
+    with httpx.Client(base_url="https://ns.test", transport=transport) as client:
+        yield client
+
+
+@pytest.mark.parametrize("enabled", [False, True], ids=["disabled", "enabled"])
+def test_get_departures_overhead(
+    benchmark: BenchmarkFixture, client: httpx.Client, enabled: bool
+) -> None:
+    configure_metrics(Metrics() if enabled else None)
+    benchmark.group = "metrics:get_departures"
+    benchmark(
+        get_departures,
+        "Amsterdam Centraal",
+        "Utrecht Centraal",
+        token="x",
+        rdc3339_datetime="2023-10-15T06:00:00+0200",
+        client=client,
+        use_cache=False,
+    )
+    configure_metrics(None)
+
+
+def test_disabled_span(benchmark: BenchmarkFixture) -> None:
+    def spans() -> None:
+        for _ in range(1000):
+            with span("parse"):
+                pass
+
+    configure_metrics(None)
+    benchmark.group = "metrics:span"
+    benchmark(spans)
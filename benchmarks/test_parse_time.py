@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Any
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.fixtures import make_trips_payload
+from nstimes.departure import DATETIME_FORMAT_STRING
+from nstimes.departure import parse_datetime
+from nstimes.departure import parse_time
+from nstimes.departure import Time
+
+
+def strptime_parse_time(data: dict[str, Any]) -> Time:
+    planned_time = datetime.strptime(data["plannedDateTime"], DATETIME_FORMAT_STRING)
+    actual_time = data.get("actualDateTime")
+    if actual_time is not None:
+        actual_time = datetime.strptime(actual_time, DATETIME_FORMAT_STRING)
+    return Time(planned=planned_time, actual=actual_time)
+
+
+STOPS = [
+    stop
+    for trip in make_trips_payload(trips=500, legs=3)["trips"]
+    for leg in trip["legs"]
+    for stop in (leg["origin"], leg["destination"])
+]
+
+
+def parse_all(parse: Any) -> list[Time]:
+    return [parse(stop) for stop in STOPS]
+
+
+def test_parse_time_matches_strptime() -> None:
+    for fast, slow in zip(parse_all(parse_time), parse_all(strptime_parse_time)):
+        assert (fast.planned, fast.actual) == (slow.planned, slow.actual)
+        assert fast.planned.utcoffset() == slow.planned.utcoffset()
+
+
+@pytest.mark.parametrize(
+    "parse", [strptime_parse_time, parse_time], ids=["strptime", "fromisoformat"]
+)
+def test_parse_time(benchmark: BenchmarkFixture, parse: Any) -> None:
+    benchmark.group = "parse_time"
+    if parse is parse_time:
+        # Measure a cold cache on every round, repeated timestamps within the
+        # payload still hit it
+        benchmark.pedantic(  # type: ignore
+            parse_all, args=(parse,), setup=parse_datetime.cache_clear, rounds=50
+        )
+    else:
+        benchmark.pedantic(parse_all, args=(parse,), rounds=50)  # type: ignore
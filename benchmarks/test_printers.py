@@ -0,0 +1,53 @@
+import importlib.util
+import io
+from contextlib import redirect_stdout
+from typing import Callable
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.fixtures import upcoming_trips_payload
+from nstimes.departure import parse_departures
+from nstimes.printers import ArrowPrinter
+from nstimes.printers import ConsolePrinter
+from nstimes.printers import ConsoleTablePrinter
+from nstimes.printers import CsvPrinter
+from nstimes.printers import JsonLinesPrinter
+from nstimes.printers import PlainPrinter
+from nstimes.printers import Printer
+
+DEPARTURES = list(parse_departures(upcoming_trips_payload(100)["trips"]))
+PRINTERS: dict[str, Callable[[], Printer]] = {
+    "ascii": ConsolePrinter,
+    "table": ConsoleTablePrinter,
+    "plain": lambda: PlainPrinter(io.StringIO()),
+    "plain-color": lambda: PlainPrinter(io.StringIO(), color=True),
+    "jsonl": lambda: JsonLinesPrinter(io.StringIO()),
+    "csv": lambda: CsvPrinter(io.StringIO()),
+    "arrow": lambda: ArrowPrinter(io.BytesIO()),
+}
+no_pyarrow = pytest.mark.skipif(
+    importlib.util.find_spec("pyarrow") is None, reason="needs the arrow extra"
+)
+
+
+def print_departures(make_printer: Callable[[], Printer]) -> None:
+    # The console printers write to stdout, keep it out of the measurement
+    with redirect_stdout(io.StringIO()):
+        printer = make_printer()
+        printer.title = "Amsterdam Centraal -> Utrecht Centraal"
+        for departure in DEPARTURES:
+            printer.add_departure(departure)
+        printer.generate_output()
+
+
+@pytest.mark.parametrize(
+    "printer",
+    [
+        pytest.param(name, marks=no_pyarrow) if name == "arrow" else name
+        for name in PRINTERS
+    ],
+)
+def test_printer(benchmark: BenchmarkFixture, printer: str) -> None:
+    benchmark.group = f"printer:{len(DEPARTURES)}-departures"
+    benchmark(print_departures, PRINTERS[printer])
@@ -0,0 +1,49 @@
+import tempfile
+from typing import Iterator
+
+import httpx
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.fixtures import mock_transport
+from benchmarks.fixtures import TRIP_SIZES
+from benchmarks.fixtures import upcoming_trips_payload
+from nstimes.replay import RecordTransport
+from nstimes.replay import ReplayTransport
+from nstimes.utils import API_URL
+
+QUERY = {
+    "originUicCode": "8400058",
+    "destinationUicCode": "8400621",
+    "dateTime": "2023-10-15T06:00:00",
+}
+
+
+@pytest.fixture(params=TRIP_SIZES, ids=lambda size: f"{size}-trips")
+def replay_client(request: pytest.FixtureRequest) -> Iterator[httpx.Client]:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        transport = RecordTransport(
+            temp_dir, mock_transport(upcoming_trips_payload(request.param))
+        )
+        with httpx.Client(base_url=API_URL, transport=transport) as client:
+            client.get("v3/trips", params=QUERY)
+        replay = ReplayTransport(temp_dir)
+        with httpx.Client(base_url=API_URL, transport=replay) as client:
+            yield client
+
+
+def test_replayed_request(
+    benchmark: BenchmarkFixture, replay_client: httpx.Client
+) -> None:
+    """A request answered from a recording, the ceiling of an offline load run"""
+    benchmark.group = "replay"
+    # The first replay reads the recording and shifts its times
+    replay_client.get("v3/trips", params={**QUERY, "dateTime": "2024-01-01T08:00:00"})
+    response = benchmark(
+        replay_client.get,
+        "v3/trips",
+        params={**QUERY, "dateTime": "2024-01-01T08:00:00"},
+    )
+    assert response.status_code == 200
+    if benchmark.stats is not None:
+        benchmark.extra_info["queries_per_second"] = 1 / benchmark.stats.stats.mean
@@ -0,0 +1,11 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from nstimes.resolver import get_resolver
+
+
+@pytest.mark.parametrize("query", ["Asd", "Den Haag C", "Utrecht Cantraal"])
+def test_resolve_station(benchmark: BenchmarkFixture, query: str) -> None:
+    resolver = get_resolver()
+    benchmark.group = "resolve"
+    benchmark(resolver.candidates, query)
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+COMMANDS = {
+    "import": "import nstimes.main",
+    "help": "from nstimes.main import app\napp(['--help'], prog_name='nstimes')",
+    "complete": "from nstimes.main import app\napp(prog_name='nstimes')",
+}
+COMPLETE_ENV = {
+    "_NSTIMES_COMPLETE": "complete_bash",
+    "COMP_WORDS": "nstimes journey --start Utr",
+    "COMP_CWORD": "3",
+}
+
+
+def run(code: str, env: dict[str, str]) -> None:
+    subprocess.run(
+        [sys.executable, "-c", code], env=env, stdout=subprocess.DEVNULL, check=False
+    )
+
+
+@pytest.mark.parametrize("command", COMMANDS)
+def test_cli_startup(benchmark: BenchmarkFixture, command: str) -> None:
+    """Wall time of a fresh interpreter, what a user waits for on every call"""
+    env = {**os.environ, **(COMPLETE_ENV if command == "complete" else {})}
+    benchmark.group = "startup"
+    benchmark.pedantic(run, args=(COMMANDS[command], env), rounds=10)  # type: ignore
@@ -0,0 +1,22 @@
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from nstimes.stations import get_uic_mapping
+from nstimes.stations import invalidate_station_index
+from nstimes.stations import load_stations
+
+
+def test_load_stations(benchmark: BenchmarkFixture) -> None:
+    benchmark.group = "stations"
+    assert benchmark(load_stations)
+
+
+def test_get_uic_mapping_cold(benchmark: BenchmarkFixture) -> None:
+    """What the first station lookup of every CLI invocation pays"""
+    benchmark.group = "stations"
+    benchmark.pedantic(get_uic_mapping, setup=invalidate_station_index, rounds=50)  # type: ignore
+
+
+def test_get_uic_mapping_warm(benchmark: BenchmarkFixture) -> None:
+    get_uic_mapping()
+    benchmark.group = "stations"
+    benchmark(get_uic_mapping)
@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+
+import httpx
+
+from nstimes.departure import DATE_FORMAT
+from nstimes.departure import DEFAULT_CONCURRENCY
+from nstimes.departure import get_departures
+from nstimes.departure import TIME_FORMAT
+from nstimes.errors import NSAPIError
+from nstimes.ratelimit import DEFAULT_RATE
+from nstimes.ratelimit import DEFAULT_RETRIES
+from nstimes.ratelimit import RetryPolicy
+from nstimes.ratelimit import TokenBucket
+from nstimes.resolver import resolve_station
+from nstimes.resolver import UnknownStationError
+from nstimes.utils import convert_to_rfc3339
+from nstimes.utils import get_client
+from nstimes.utils import httpx_get
+
+
+@dataclass
+class BatchRow:
+    row: int
+    start: str
+    end: str
+    date: str
+    time: str
+
+
+@dataclass
+class BatchSummary:
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+
+def read_rows(path: str) -> Iterator[BatchRow]:
+    """Rows of a CSV file with start and end, and optionally date and time, columns"""
+    now = datetime.now()
+    with open(path, newline="", encoding="utf-8") as file:
+        for row, record in enumerate(csv.DictReader(file)):
+            yield BatchRow(
+                row=row,
+                start=record["start"],
+                end=record["end"],
+                date=record.get("date") or now.strftime(DATE_FORMAT),
+                time=record.get("time") or now.strftime(TIME_FORMAT),
+            )
+
+
+def checkpoint_path(output_path: str) -> str:
+    return f"{output_path}.checkpoint"
+
+
+def errors_path(output_path: str) -> str:
+    return f"{output_path}.errors"
+
+
+def read_checkpoint(path: str) -> set[int]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as file:
+        return {int(line) for line in file if line.strip()}
+
+
+def read_output_rows(path: str) -> set[int]:
+    """Rows in the output already, a line cut off by a crash is not counted"""
+    if not os.path.exists(path):
+        return set()
+    rows = set()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                rows.add(json.loads(line)["row"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return rows
+
+
+class BatchRunner:
+    """Evaluates the journeys of a CSV file on a bounded pool of worker threads
+
+    Requests share one client, are rate limited by a token bucket of `rate`
+    requests per second and retried on transient errors. Every evaluated row is
+    written to the output as a line of JSON as soon as it is done, and its row
+    number to a checkpoint file, so an interrupted batch resumes where it
+    stopped, also when it stopped between the two writes. Rows that failed on a
+    transient error are written to an errors file next to the output instead
+    and are tried again when the batch resumes, so the output holds one line
+    per row.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: float = DEFAULT_RATE,
+        retries: int = DEFAULT_RETRIES,
+        max_len: Optional[int] = None,
+        client: Optional[httpx.Client] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.token = token
+        self.concurrency = concurrency
+        self.max_len = max_len
+        self.client = client or get_client()
+        self.limiter = TokenBucket(rate, sleep=sleep)
+        self.retry_policy = RetryPolicy(retries=retries, sleep=sleep)
+
+    def get(self, **kwargs: Any) -> httpx.Response:
+        return httpx_get(**kwargs, retry_policy=self.retry_policy, limiter=self.limiter)
+
+    def evaluate(self, row: BatchRow) -> tuple[dict[str, Any], bool]:
+        """The result of a row, and whether it is final or worth another try"""
+        result: dict[str, Any] = {
+            "row": row.row,
+            "start": row.start,
+            "end": row.end,
+            "date": row.date,
+            "time": row.time,
+        }
+        try:
+            start = resolve_station(row.start)
+            end = resolve_station(row.end)
+        except UnknownStationError as error:
+            result["error"] = f"Station '{error.query}' does not exist"
+            return result, True
+        try:
+            rdc3339_datetime = convert_to_rfc3339(row.time, row.date)
+        except ValueError:
+            result[
+                "error"
+            ] = f"Expected time as {TIME_FORMAT} and date as {DATE_FORMAT}"
+            return result, True
+        try:
+            departures = get_departures(
+                start=start,
+                end=end,
+                token=self.token,
+                rdc3339_datetime=rdc3339_datetime,
+                max_len=self.max_len,
+                client=self.client,
+                get=self.get,
+            )
+            result["departures"] = [departure.as_dict() for departure in departures]
+        except NSAPIError as error:
+            result["error"] = str(error)
+            return result, not error.retryable
+        except (ValueError, KeyError, TypeError, IndexError) as error:
+            # A response of an unexpected shape fails its row, not the batch
+            result.pop("departures", None)
+            result["error"] = f"Unexpected response from the NS API: {error!r}"
+        return result, True
+
+    def run(
+        self,
+        input_path: str,
+        output_path: str,
+        checkpoint: Optional[str] = None,
+    ) -> BatchSummary:
+        checkpoint = checkpoint or checkpoint_path(output_path)
+        transient_errors_path = errors_path(output_path)
+        # A crash between writing a row and checkpointing it leaves the row
+        # in the output only, it is not evaluated again
+        finished = read_checkpoint(checkpoint) | read_output_rows(output_path)
+        summary = BatchSummary()
+        # Bounds the rows read ahead of the workers
+        slots = threading.BoundedSemaphore(2 * self.concurrency)
+        lock = threading.Lock()
+        errors: list[BaseException] = []
+
+        with open(output_path, "a", encoding="utf-8") as output, open(
+            checkpoint, "a", encoding="utf-8"
+        ) as progress, open(
+            transient_errors_path, "a", encoding="utf-8"
+        ) as transient_errors, ThreadPoolExecutor(
+            self.concurrency
+        ) as pool:
+
+            def write(future: "Future[tuple[dict[str, Any], bool]]") -> None:
+                try:
+                    result, final = future.result()
+                    with lock:
+                        if final:
+                            output.write(json.dumps(result) + "\n")
+                            output.flush()
+                            progress.write(f"{result['row']}\n")
+                            progress.flush()
+                        else:
+                            transient_errors.write(json.dumps(result) + "\n")
+                            transient_errors.flush()
+                        if "error" in result:
+                            summary.failed += 1
+                        else:
+                            summary.done += 1
+                except BaseException as error:
+                    errors.append(error)
+                finally:
+                    slots.release()
+
+            for row in read_rows(input_path):
+                if errors:
+                    break
+                if row.row in finished:
+                    summary.skipped += 1
+                    continue
+                slots.acquire()
+                pool.submit(self.evaluate, row).add_done_callback(write)
+        if errors:
+            raise errors[0]
+        return summary
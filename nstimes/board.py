@@ -0,0 +1,158 @@
+import sys
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from nstimes.departure import minutes_left
+from nstimes.departure import now
+from nstimes.departure import parse_time
+from nstimes.departure import Time
+from nstimes.departure import track
+from nstimes.singleflight import SingleFlight
+from nstimes.stations import get_uic_mapping
+
+if TYPE_CHECKING:  # pragma: no cover
+    import httpx
+
+# Departures asked from the API per station, the default of v2/departures
+DEFAULT_MAX_JOURNEYS = 40
+# Departures shown per destination
+DEFAULT_BOARD_LIMIT = 3
+
+
+@dataclass(slots=True)
+class BoardDeparture:
+    """A train leaving a station, like a Departure but without an arrival time
+
+    `stops` holds the UIC codes of the stations the train calls at after
+    leaving, as far as v2/departures lists them, ending with its direction.
+    """
+
+    train_type: str
+    platform: str
+    departure_time: Time
+    direction: str
+    stops: tuple[str, ...] = ()
+    cancelled: bool = False
+    time_left: Optional[int] = field(default=None, compare=False, repr=False)
+
+    @property
+    def time_left_minutes(self) -> int:
+        if self.time_left is None:
+            return minutes_left(self.departure_time.actual, now())
+        return self.time_left
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "train_type": self.train_type,
+            "platform": self.platform,
+            "departure_time": self.departure_time.as_dict(),
+            "direction": self.direction,
+            "cancelled": self.cancelled,
+            "time_left_minutes": self.time_left_minutes,
+        }
+
+
+def parse_board_departures(
+    departures: Iterable[dict],  # type: ignore
+    reference_time: Optional[datetime] = None,
+) -> Iterator[BoardDeparture]:
+    """Parse a v2/departures payload, skipping trains that already left"""
+    reference_time = reference_time or now()
+    uic_mapping = get_uic_mapping()
+    for departure in departures:
+        departure_time = parse_time(departure)
+        time_left = minutes_left(departure_time.actual, reference_time)
+        if time_left < 0:
+            continue
+        direction = departure.get("direction", "")
+        stops = [stop["uicCode"] for stop in departure.get("routeStations", ())]
+        # Route stations are the major stops only, the direction is the last one
+        direction_code = uic_mapping.get(direction)
+        if direction_code is not None and direction_code not in stops:
+            stops.append(direction_code)
+        yield BoardDeparture(
+            train_type=sys.intern(departure["product"]["categoryCode"]),
+            platform=sys.intern(track(departure)),
+            departure_time=departure_time,
+            direction=direction,
+            stops=tuple(stops),
+            cancelled=departure.get("cancelled", False),
+            time_left=time_left,
+        )
+
+
+class StationBoard:
+    """Departures of one station, indexed by every station they call at
+
+    Answers "next direct trains to X" for any number of destinations from a
+    single v2/departures response.
+    """
+
+    def __init__(self, station: str, departures: Iterable[BoardDeparture]) -> None:
+        self.station = station
+        self.departures = list(departures)
+        self.stops: dict[str, list[int]] = {}
+        for index, departure in enumerate(self.departures):
+            for stop in departure.stops:
+                self.stops.setdefault(stop, []).append(index)
+
+    def to(self, destination: str, limit: Optional[int] = None) -> list[BoardDeparture]:
+        """Direct trains to `destination`, a station name, in departure order"""
+        uic_code = get_uic_mapping()[destination]
+        indices = self.stops.get(uic_code, [])[:limit]
+        return [self.departures[index] for index in indices]
+
+
+def get_board_query(
+    station: str,
+    rdc3339_datetime: Optional[str] = None,
+    max_journeys: int = DEFAULT_MAX_JOURNEYS,
+) -> dict[str, str]:
+    query_params = {
+        "uicCode": get_uic_mapping()[station],
+        "maxJourneys": str(max_journeys),
+    }
+    if rdc3339_datetime is not None:
+        query_params["dateTime"] = rdc3339_datetime
+    return query_params
+
+
+board_flights: SingleFlight[StationBoard] = SingleFlight()
+
+
+def get_station_board(
+    station: str,
+    token: str,
+    rdc3339_datetime: Optional[str] = None,
+    max_journeys: int = DEFAULT_MAX_JOURNEYS,
+    client: Optional["httpx.Client"] = None,
+    use_cache: bool = True,
+) -> StationBoard:
+    """Board of a station from one v2/departures request
+
+    Responses are cached per station like trips are, so boards asked for
+    different destinations of the same origin share one upstream request.
+    """
+    from nstimes.utils import httpx_get
+
+    query_params = get_board_query(station, rdc3339_datetime, max_journeys)
+
+    def fetch() -> StationBoard:
+        response = httpx_get(
+            token=token,
+            query_params=query_params,
+            api="v2/departures",
+            client=client,
+            use_cache=use_cache,
+        )
+        departures = response.json()["payload"]["departures"]
+        return StationBoard(station, parse_board_departures(departures))
+
+    key = (*sorted(query_params.items()), use_cache)
+    return board_flights.do(key, fetch)
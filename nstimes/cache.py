@@ -0,0 +1,270 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+from typing import Literal
+from typing import Optional
+from urllib.parse import urlencode
+
+import httpx
+from pydantic_settings import BaseSettings
+from pydantic_settings import SettingsConfigDict
+
+from nstimes.errors import NSAPIError
+
+
+@dataclass
+class CachePolicy:
+    # Seconds a response is served without asking the API
+    ttl: float
+    # Seconds after the ttl that a response is still served while it is refreshed
+    stale: float
+
+
+POLICIES = {
+    "v3/trips": CachePolicy(ttl=30, stale=60),
+    "v2/departures": CachePolicy(ttl=30, stale=60),
+    "v2/stations": CachePolicy(ttl=24 * 3600, stale=7 * 24 * 3600),
+}
+
+
+def default_cache_dir() -> str:
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "nstimes")
+
+
+class CacheSettings(BaseSettings):
+    """Response cache settings, configurable as NSTIMES_CACHE_* env vars"""
+
+    model_config = SettingsConfigDict(env_prefix="NSTIMES_CACHE_")
+
+    backend: Literal["off", "memory", "disk"] = "memory"
+    dir: str = default_cache_dir()
+    max_entries: int = 256
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    stored_at: float
+    policy: CachePolicy
+
+    @classmethod
+    def from_response(
+        cls, response: httpx.Response, policy: CachePolicy
+    ) -> "CachedResponse":
+        return cls(
+            status_code=response.status_code,
+            headers=list(response.headers.items()),
+            content=response.content,
+            stored_at=time.time(),
+            policy=policy,
+        )
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def is_fresh(self) -> bool:
+        return self.age() < self.policy.ttl
+
+    def is_usable(self) -> bool:
+        return self.age() < self.policy.ttl + self.policy.stale
+
+    def to_response(self, request: Optional[httpx.Request] = None) -> httpx.Response:
+        return httpx.Response(
+            status_code=self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=request,
+        )
+
+
+def cache_key(api: str, query_params: dict[str, str]) -> str:
+    return f"{api}?{urlencode(sorted(query_params.items()))}"
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class DiskCache:
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, status_code INTEGER, headers TEXT, "
+                "content BLOB, stored_at REAL, ttl REAL, stale REAL)"
+            )
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT status_code, headers, content, stored_at, ttl, stale "
+                "FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        status_code, headers, content, stored_at, ttl, stale = row
+        return CachedResponse(
+            status_code=status_code,
+            headers=[tuple(header) for header in json.loads(headers)],
+            content=content,
+            stored_at=stored_at,
+            policy=CachePolicy(ttl=ttl, stale=stale),
+        )
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        """Store `entry`, removing the responses that are no longer usable
+
+        Keys include the requested time, so without the purge the file would
+        keep every response ever fetched.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM responses WHERE stored_at + ttl + stale < ?",
+                (time.time(),),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    entry.status_code,
+                    json.dumps(entry.headers),
+                    entry.content,
+                    entry.stored_at,
+                    entry.policy.ttl,
+                    entry.policy.stale,
+                ),
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class ResponseCache:
+    """Two level (memory, then optionally disk) cache of successful API responses"""
+
+    def __init__(
+        self,
+        memory: Optional[MemoryCache] = None,
+        disk: Optional[DiskCache] = None,
+        policies: dict[str, CachePolicy] = POLICIES,
+    ) -> None:
+        self.memory = memory or MemoryCache()
+        self.disk = disk
+        self.policies = policies
+        self.revalidating: set[str] = set()
+        self.lock = threading.Lock()
+
+    def get(self, api: str, query_params: dict[str, str]) -> Optional[CachedResponse]:
+        """A response that is fresh, or stale but still within its stale window"""
+        if api not in self.policies:
+            return None
+        key = cache_key(api, query_params)
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        if entry is None or not entry.is_usable():
+            return None
+        return entry
+
+    def set(
+        self, api: str, query_params: dict[str, str], response: httpx.Response
+    ) -> None:
+        policy = self.policies.get(api)
+        if policy is None or response.status_code != httpx.codes.OK:
+            return
+        key = cache_key(api, query_params)
+        entry = CachedResponse.from_response(response, policy)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def start_revalidation(self, api: str, query_params: dict[str, str]) -> bool:
+        """Claim the refresh of a stale entry, False if one is already running"""
+        key = cache_key(api, query_params)
+        with self.lock:
+            if key in self.revalidating:
+                return False
+            self.revalidating.add(key)
+            return True
+
+    def finish_revalidation(self, api: str, query_params: dict[str, str]) -> None:
+        with self.lock:
+            self.revalidating.discard(cache_key(api, query_params))
+
+    def revalidate(
+        self,
+        api: str,
+        query_params: dict[str, str],
+        fetch: Callable[[], httpx.Response],
+    ) -> None:
+        """Refresh a stale entry in a background thread"""
+        if not self.start_revalidation(api, query_params):
+            return
+
+        def run() -> None:
+            try:
+                self.set(api, query_params, fetch())
+            except (NSAPIError, RuntimeError):
+                # Keep serving the stale entry until it expires
+                pass
+            finally:
+                self.finish_revalidation(api, query_params)
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+_response_cache: Optional[ResponseCache] = None
+_configured = False
+
+
+def create_response_cache(settings: CacheSettings) -> Optional[ResponseCache]:
+    if settings.backend == "off":
+        return None
+    disk = None
+    if settings.backend == "disk":
+        disk = DiskCache(os.path.join(settings.dir, "responses.sqlite3"))
+    return ResponseCache(memory=MemoryCache(settings.max_entries), disk=disk)
+
+
+def configure_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Use `cache` for API responses, None disables caching"""
+    global _response_cache, _configured
+    _response_cache = cache
+    _configured = True
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    if not _configured:
+        configure_response_cache(create_response_cache(CacheSettings()))
+    return _response_cache
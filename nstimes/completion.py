@@ -0,0 +1,125 @@
+import os
+import pickle
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Iterable
+from typing import Optional
+
+from nstimes.stations import atomic_write
+from nstimes.stations import get_station_codes
+from nstimes.stations import get_uic_mapping
+from nstimes.stations import metadata_path
+from nstimes.stations import STATIONS_FILE
+
+WORD_START = re.compile(r"(?<![a-z0-9])[a-z0-9]")
+
+
+def normalize(text: str) -> str:
+    """Casefold and strip accents, so 'mariënberg' matches 'Mariënberg'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class CompletionIndex:
+    """Sorted suffix array over the start of every word in the station names
+
+    `aliases`, e.g. short codes, complete to the name they stand for, after
+    the names that match.
+    """
+
+    def __init__(
+        self, names: Iterable[str], aliases: Optional[dict[str, str]] = None
+    ) -> None:
+        self.names = list(names)
+        self.normalized = [normalize(name) for name in self.names]
+        ranks = {name: rank for rank, name in enumerate(self.names)}
+        entries = sorted(
+            [
+                (normalized[match.start() :], match.start() > 0, rank)
+                for rank, normalized in enumerate(self.normalized)
+                for match in WORD_START.finditer(normalized)
+            ]
+            + [
+                (normalize(alias), True, ranks[name])
+                for alias, name in (aliases or {}).items()
+                if name in ranks
+            ]
+        )
+        self.keys = [key for key, _, _ in entries]
+        self.matches = [(infix, rank) for _, infix, rank in entries]
+
+    def complete(self, incomplete: str) -> list[str]:
+        needle = normalize(incomplete)
+        if not needle:
+            return list(self.names)
+        low = bisect_left(self.keys, needle)
+        high = bisect_left(self.keys, needle + "\U0010ffff", lo=low)
+        if low == high:
+            # Not at a word boundary, fall back to a plain infix scan
+            return [
+                name
+                for name, normalized in zip(self.names, self.normalized)
+                if needle in normalized
+            ]
+        ranks: dict[int, None] = dict.fromkeys(
+            rank for _, rank in sorted(self.matches[low:high])
+        )
+        return [self.names[rank] for rank in ranks]
+
+
+def index_snapshot_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.completion.pickle"
+
+
+def write_index_snapshot(index: CompletionIndex, path: str = STATIONS_FILE) -> str:
+    """Precompile the completion index of the stations at `path` into a pickle"""
+    snapshot = index_snapshot_path(path)
+    atomic_write(snapshot, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+    return snapshot
+
+
+def load_index_snapshot(path: str = STATIONS_FILE) -> Optional[CompletionIndex]:
+    """The precompiled index, None when there is none or it is older than the stations
+
+    Shell completion runs a new process for every Tab, loading the index is
+    a lot cheaper than building it.
+    """
+    snapshot = index_snapshot_path(path)
+    try:
+        built = os.path.getmtime(snapshot)
+        sources = [path, metadata_path(path)]
+        if any(
+            os.path.getmtime(source) > built
+            for source in sources
+            if os.path.exists(source)
+        ):
+            return None
+        with open(snapshot, "rb") as file:
+            index = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return index if isinstance(index, CompletionIndex) else None
+
+
+_index: Optional[CompletionIndex] = None
+
+
+def get_completion_index() -> CompletionIndex:
+    """Completion index of the stations, from the snapshot when it is fresh
+
+    The stations and their codes are only read to build the index when there
+    is no snapshot or it is stale.
+    """
+    global _index
+    if _index is None:
+        _index = load_index_snapshot() or CompletionIndex(
+            get_uic_mapping(), aliases=get_station_codes()
+        )
+    return _index
+
+
+def reset_completion_index() -> None:
+    """Forget the index, the next completion loads the updated stations"""
+    global _index
+    _index = None
@@ -1,18 +1,44 @@
+import sys
+from array import array
 from dataclasses import dataclass  # pragma: no cover
+from dataclasses import field
 from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from functools import lru_cache
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Literal
 from typing import Optional
+from typing import overload
+from typing import TYPE_CHECKING
+from typing import Union
 
-from pydantic import computed_field
-
+from nstimes.metrics import span
+from nstimes.metrics import timed_iter
+from nstimes.singleflight import AsyncSingleFlight
+from nstimes.singleflight import SingleFlight
+from nstimes.stations import get_uic_mapping
 from nstimes.styles import green
 from nstimes.styles import red
-from nstimes.utils import get_uic_mapping
-from nstimes.utils import httpx_get
+
+if TYPE_CHECKING:  # pragma: no cover
+    import httpx
+
+# The HTTP client, and asyncio, are imported by the functions that fetch, so
+# that importing the Departure model stays cheap for the CLI and completion.
 
 DATETIME_FORMAT_STRING = "%Y-%m-%dT%H:%M:%S%z"
+DATE_FORMAT = "%d-%m-%Y"
+TIME_FORMAT = "%H:%M"
+DEFAULT_CONCURRENCY = 8
 
 
 class Time:
+    __slots__ = ("actual", "planned")
+
     def __init__(self, planned: datetime, actual: Optional[datetime] = None) -> None:
         self.actual = actual or planned
         self.planned = planned
@@ -27,73 +53,540 @@ class Time:
         delay_str = "" if self.delay_minutes == 0 else red(f"+{self.delay_minutes}")
         return f"({time_str}{delay_str})"
 
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "planned": self.planned.isoformat(),
+            "actual": self.actual.isoformat(),
+            "delay_minutes": self.delay_minutes,
+        }
+
+
+@dataclass(slots=True)
+class Leg:
+    train_type: str
+    origin: str
+    destination: str
+    departure_platform: str
+    arrival_platform: str
+    departure_time: Time
+    arrival_time: Time
+    cancelled: bool = False
+
+
+class Itinerary:
+    """Every leg of a trip, parsed from the raw trip when first accessed
+
+    Departures that are never printed in detail, or filtered on their legs,
+    never pay for parsing more than the times of their first and last leg.
+    """
+
+    __slots__ = ("trip", "_legs")
+
+    def __init__(self, trip: dict) -> None:  # type: ignore
+        self.trip = trip
+        self._legs: Optional[list[Leg]] = None
+
+    @property
+    def legs(self) -> list[Leg]:
+        if self._legs is None:
+            self._legs = [parse_leg(leg) for leg in self.trip["legs"]]
+        return self._legs
+
+    @property
+    def transfers(self) -> int:
+        return trip_transfers(self.trip)
+
+    @property
+    def duration_minutes(self) -> int:
+        departure = self.legs[0].departure_time.actual
+        arrival = self.legs[-1].arrival_time.actual
+        return int((arrival - departure).total_seconds() // 60)
+
+    @property
+    def transfer_margins(self) -> list[int]:
+        """Minutes between arriving with a leg and leaving with the next one"""
+        return [
+            minutes_between(arriving.arrival_time.actual, leaving.departure_time.actual)
+            for arriving, leaving in zip(self.legs, self.legs[1:])
+        ]
 
-@dataclass
+
+@dataclass(slots=True)
 class Departure:
     train_type: str
     platform: str
     departure_time: Time
     arrival_time: Time
     cancelled: bool = False
+    # Minutes left as computed by set_time_left or while parsing
+    time_left: Optional[int] = field(default=None, compare=False, repr=False)
+    transfers: int = 0
+    # All legs of the trip, when parsed from one
+    itinerary: Optional[Itinerary] = field(default=None, compare=False, repr=False)
 
-    @computed_field  # type: ignore
     @property
     def time_left_minutes(self) -> int:
-        return self.calc_time_left_minutes()
+        if self.time_left is None:
+            return self.calc_time_left_minutes()
+        return self.time_left
+
+    def calc_time_left_minutes(self, reference_time: Optional[datetime] = None) -> int:
+        return minutes_left(self.departure_time.actual, reference_time or now())
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "train_type": self.train_type,
+            "platform": self.platform,
+            "departure_time": self.departure_time.as_dict(),
+            "arrival_time": self.arrival_time.as_dict(),
+            "cancelled": self.cancelled,
+            "time_left_minutes": self.time_left_minutes,
+            "transfers": self.transfers,
+        }
+
+
+EPOCH = datetime(1970, 1, 1)
+NAIVE = -(2**31)
+
+
+def to_epoch_us(moment: datetime) -> tuple[int, int]:
+    """Microseconds since the epoch and the utc offset in seconds of `moment`"""
+    offset = moment.utcoffset()
+    if offset is None:
+        return (moment - EPOCH) // timedelta(microseconds=1), NAIVE
+    naive = moment.replace(tzinfo=None) - offset
+    return (naive - EPOCH) // timedelta(microseconds=1), int(offset.total_seconds())
+
+
+def from_epoch_us(epoch_us: int, offset: int) -> datetime:
+    if offset == NAIVE:
+        return EPOCH + timedelta(microseconds=epoch_us)
+    tz = timezone(timedelta(seconds=offset))
+    return (EPOCH + timedelta(microseconds=epoch_us, seconds=offset)).replace(tzinfo=tz)
+
+
+class DepartureTable:
+    """Columnar store for many departures, e.g. in long-lived caches
+
+    Times are kept as epoch microseconds and strings as indices into a table
+    of interned values, so a row costs a few dozen bytes instead of the
+    hundreds of a Departure with its Time and datetime objects. Rows are
+    materialized as Departure objects on access.
+    """
+
+    TIME_COLUMNS = (
+        "departure_planned",
+        "departure_actual",
+        "arrival_planned",
+        "arrival_actual",
+    )
 
-    def calc_time_left_minutes(self, reference_time: datetime = datetime.now()) -> int:
-        reference_time = reference_time.replace(
-            tzinfo=self.departure_time.actual.tzinfo
+    def __init__(self, departures: Iterable[Departure] = ()) -> None:
+        self.strings: list[str] = []
+        self.string_ids: dict[str, int] = {}
+        self.train_types = array("I")
+        self.platforms = array("I")
+        self.cancelled = array("b")
+        self.transfers = array("B")
+        self.times = {column: array("q") for column in self.TIME_COLUMNS}
+        self.offsets = {column: array("i") for column in self.TIME_COLUMNS}
+        for departure in departures:
+            self.append(departure)
+
+    def intern(self, value: str) -> int:
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(sys.intern(value))
+        return string_id
+
+    def append(self, departure: Departure) -> None:
+        self.train_types.append(self.intern(departure.train_type))
+        self.platforms.append(self.intern(departure.platform))
+        self.cancelled.append(departure.cancelled)
+        self.transfers.append(departure.transfers)
+        moments = (
+            departure.departure_time.planned,
+            departure.departure_time.actual,
+            departure.arrival_time.planned,
+            departure.arrival_time.actual,
+        )
+        for column, moment in zip(self.TIME_COLUMNS, moments):
+            epoch_us, offset = to_epoch_us(moment)
+            self.times[column].append(epoch_us)
+            self.offsets[column].append(offset)
+
+    def __len__(self) -> int:
+        return len(self.train_types)
+
+    def __getitem__(self, index: int) -> Departure:
+        (
+            departure_planned,
+            departure_actual,
+            arrival_planned,
+            arrival_actual,
+        ) = (
+            from_epoch_us(self.times[column][index], self.offsets[column][index])
+            for column in self.TIME_COLUMNS
         )
-        time_left = self.departure_time.actual - reference_time
-        return int(time_left.total_seconds() / 60)
+        return Departure(
+            train_type=self.strings[self.train_types[index]],
+            platform=self.strings[self.platforms[index]],
+            departure_time=Time(planned=departure_planned, actual=departure_actual),
+            arrival_time=Time(planned=arrival_planned, actual=arrival_actual),
+            cancelled=bool(self.cancelled[index]),
+            transfers=self.transfers[index],
+        )
+
+    def __iter__(self) -> Iterator[Departure]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+@lru_cache(maxsize=1024)
+def parse_datetime(value: str) -> datetime:
+    """Parse an NS timestamp like 2023-10-15T12:19:00+0200
+
+    Equivalent to strptime with DATETIME_FORMAT_STRING, but fromisoformat is
+    many times faster. It only accepts a +HHMM offset from python 3.11, so
+    the offset is rewritten as +HH:MM. Timestamps repeat a lot across the
+    legs and trips of a response, hence the cache.
+    """
+    if len(value) == 24 and value[19] in "+-":
+        value = f"{value[:22]}:{value[22:]}"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, DATETIME_FORMAT_STRING)
 
 
 def parse_time(data: dict) -> Time:  # type: ignore
-    planned_time = datetime.strptime(data["plannedDateTime"], DATETIME_FORMAT_STRING)
+    planned_time = parse_datetime(data["plannedDateTime"])
     actual_time = data.get("actualDateTime")
     if actual_time is not None:
-        actual_time = datetime.strptime(actual_time, DATETIME_FORMAT_STRING)
+        actual_time = parse_datetime(actual_time)
     return Time(planned=planned_time, actual=actual_time)
 
 
+def track(stop: dict) -> str:  # type: ignore
+    return stop.get("actualTrack", stop.get("plannedTrack", "?"))  # type: ignore
+
+
+def parse_leg(leg: dict) -> Leg:  # type: ignore
+    origin = leg["origin"]
+    destination = leg["destination"]
+    return Leg(
+        train_type=sys.intern(leg.get("product", {}).get("categoryCode", "?")),
+        origin=origin.get("name", ""),
+        destination=destination.get("name", ""),
+        departure_platform=sys.intern(track(origin)),
+        arrival_platform=sys.intern(track(destination)),
+        departure_time=parse_time(origin),
+        arrival_time=parse_time(destination),
+        cancelled=leg.get("cancelled", False),
+    )
+
+
+def trip_transfers(trip: dict) -> int:  # type: ignore
+    return len(trip["legs"]) - 1
+
+
+def actual_datetime(stop: dict) -> datetime:  # type: ignore
+    return parse_datetime(stop.get("actualDateTime") or stop["plannedDateTime"])
+
+
+def minutes_between(arrival: datetime, departure: datetime) -> int:
+    return int((departure - arrival).total_seconds() // 60)
+
+
+@dataclass(frozen=True)
+class TripFilter:
+    """Keeps the trips that match, run on the raw trips before anything is built
+
+    The transfer count is the number of legs, and the transfer margins only
+    need the cached timestamps of the stops where legs meet.
+    """
+
+    max_transfers: Optional[int] = None
+    min_transfer_minutes: Optional[int] = None
+
+    def __bool__(self) -> bool:
+        return self.max_transfers is not None or self.min_transfer_minutes is not None
+
+    def __call__(self, trip: dict) -> bool:  # type: ignore
+        if self.max_transfers is not None and trip_transfers(trip) > self.max_transfers:
+            return False
+        if self.min_transfer_minutes is not None:
+            legs = trip["legs"]
+            for arriving, leaving in zip(legs, legs[1:]):
+                margin = minutes_between(
+                    actual_datetime(arriving["destination"]),
+                    actual_datetime(leaving["origin"]),
+                )
+                if margin < self.min_transfer_minutes:
+                    return False
+        return True
+
+
+def get_trips_query(start: str, end: str, rdc3339_datetime: str) -> dict[str, str]:
+    uic_mapping = get_uic_mapping()
+    return {
+        "originUicCode": uic_mapping[start],
+        "destinationUicCode": uic_mapping[end],
+        "dateTime": rdc3339_datetime,
+    }
+
+
+def now() -> datetime:
+    """Snapshot of the current local time to compute time left against"""
+    return datetime.now().astimezone()
+
+
+def minutes_left(moment: datetime, reference_time: datetime) -> int:
+    if moment.tzinfo is None:
+        reference_time = reference_time.replace(tzinfo=None)
+    elif reference_time.tzinfo is None:
+        # A naive reference time is local time
+        reference_time = reference_time.astimezone()
+    return int((moment - reference_time).total_seconds() / 60)
+
+
+def set_time_left(
+    departures: Iterable[Departure], reference_time: Optional[datetime] = None
+) -> None:
+    """Compute time_left_minutes of all departures against one reference time"""
+    reference_time = reference_time or now()
+    for departure in departures:
+        departure.time_left = minutes_left(
+            departure.departure_time.actual, reference_time
+        )
+
+
+def parse_departures(
+    trips: Iterable[dict],  # type: ignore
+    max_len: Optional[int] = None,
+    reference_time: Optional[datetime] = None,
+    trip_filter: Optional[TripFilter] = None,
+) -> Iterator[Departure]:
+    """Lazily parse trips into departures, stopping after `max_len` of them
+
+    Trips that `trip_filter` rejects, or that left before `reference_time`
+    (default: now), are skipped before anything but their departure time is
+    parsed. The time left is computed once here, against the same reference
+    time for all departures. A departure arrives when the last leg of its
+    trip does, the other legs are parsed when its itinerary is accessed.
+    """
+    if max_len is not None and max_len <= 0:
+        return
+    reference_time = reference_time or now()
+    count = 0
+    for trip in trips:
+        if trip_filter and not trip_filter(trip):
+            continue
+        legs = trip["legs"]
+        first_leg = legs[0]
+        origin = first_leg["origin"]
+        departure_time = parse_time(origin)
+        time_left = minutes_left(departure_time.actual, reference_time)
+        if time_left < 0:
+            continue
+
+        yield Departure(
+            train_type=sys.intern(first_leg["product"]["categoryCode"]),
+            platform=sys.intern(track(origin)),
+            departure_time=departure_time,
+            arrival_time=parse_time(legs[-1]["destination"]),
+            cancelled=any(leg.get("cancelled", False) for leg in legs),
+            time_left=time_left,
+            transfers=trip_transfers(trip),
+            itinerary=Itinerary(trip),
+        )
+        count += 1
+        if count == max_len:
+            return
+
+
+departure_flights: SingleFlight[list[Departure]] = SingleFlight()
+departure_flights_async: AsyncSingleFlight[list[Departure]] = AsyncSingleFlight()
+
+
+def coalescing_stats() -> dict[str, int]:
+    """How many departure lookups shared (hits) or made (misses) an upstream call"""
+    return {
+        "hits": departure_flights.hits + departure_flights_async.hits,
+        "misses": departure_flights.misses + departure_flights_async.misses,
+    }
+
+
+def iter_departures(
+    start: str,
+    end: str,
+    token: str,
+    rdc3339_datetime: str,
+    max_len: Optional[int] = None,
+    client: Optional["httpx.Client"] = None,
+    trip_filter: Optional[TripFilter] = None,
+) -> Iterator[Departure]:
+    """Like get_departures, but yields each departure as soon as it is parsed"""
+    from nstimes.history import record_departures
+    from nstimes.utils import httpx_get
+
+    query_params = get_trips_query(start, end, rdc3339_datetime)
+    response = httpx_get(
+        token=token, query_params=query_params, api="v3/trips", client=client
+    )
+    departures = []
+    with span("json.decode"):
+        trips = response.json()["trips"]
+    parsed = parse_departures(trips, max_len, trip_filter=trip_filter)
+    for departure in timed_iter("parse.departures", parsed):
+        departures.append(departure)
+        yield departure
+    record_departures(start, end, departures)
+
+
 def get_departures(
     start: str,
     end: str,
     token: str,
     rdc3339_datetime: str,
     max_len: Optional[int] = None,
+    client: Optional["httpx.Client"] = None,
+    use_cache: bool = True,
+    get: Optional[Callable[..., "httpx.Response"]] = None,
+    trip_filter: Optional[TripFilter] = None,
 ) -> list[Departure]:
-    uic_mapping = get_uic_mapping()
+    """Departures of a journey, concurrent identical calls share one request
 
-    query_params = {
-        "originUicCode": uic_mapping[start],
-        "destinationUicCode": uic_mapping[end],
-        "dateTime": rdc3339_datetime,
-    }
-    response = httpx_get(token=token, query_params=query_params, api="v3/trips")
-    departures = []
-    trips = response.json()["trips"]
-    for trip in trips:
-        trip = trip["legs"][0]
-        origin = trip["origin"]
-        destination = trip["destination"]
-        track = origin.get("actualTrack", origin.get("plannedTrack", "?"))
+    `get` replaces httpx_get, e.g. to use another rate limit and retry policy.
+    """
+    from nstimes.history import record_departures
+    from nstimes.utils import httpx_get
 
-        cancelled = trip.get("cancelled", False)
-        departure_time = parse_time(origin)
-        arrival_time = parse_time(destination)
+    query_params = get_trips_query(start, end, rdc3339_datetime)
 
-        train_type = trip["product"]["categoryCode"]
+    def fetch() -> list[Departure]:
+        response = (get or httpx_get)(
+            token=token,
+            query_params=query_params,
+            api="v3/trips",
+            client=client,
+            use_cache=use_cache,
+        )
+        with span("json.decode"):
+            trips = response.json()["trips"]
+        with span("parse.departures"):
+            departures = list(parse_departures(trips, max_len, trip_filter=trip_filter))
+        record_departures(start, end, departures)
+        return departures
 
-        departure = Departure(
-            train_type=train_type,
-            platform=track,
-            departure_time=departure_time,
-            arrival_time=arrival_time,
-            cancelled=cancelled,
+    key = (*sorted(query_params.items()), max_len, use_cache, trip_filter)
+    return departure_flights.do(key, fetch)
+
+
+async def get_departures_async(
+    start: str,
+    end: str,
+    token: str,
+    rdc3339_datetime: str,
+    max_len: Optional[int] = None,
+    client: Optional["httpx.AsyncClient"] = None,
+    trip_filter: Optional[TripFilter] = None,
+) -> list[Departure]:
+    import asyncio
+
+    from nstimes.history import record_departures
+    from nstimes.utils import httpx_get_async
+
+    query_params = get_trips_query(start, end, rdc3339_datetime)
+
+    async def fetch() -> list[Departure]:
+        response = await httpx_get_async(
+            token=token, query_params=query_params, api="v3/trips", client=client
         )
-        if departure.time_left_minutes < 0:
-            continue
-        departures.append(departure)
-    return departures
+        with span("json.decode"):
+            trips = response.json()["trips"]
+        with span("parse.departures"):
+            departures = list(parse_departures(trips, max_len, trip_filter=trip_filter))
+        # SQLite blocks, keep it off the event loop
+        await asyncio.to_thread(record_departures, start, end, departures)
+        return departures
+
+    key = (*sorted(query_params.items()), max_len, trip_filter)
+    return await departure_flights_async.do(key, fetch)
+
+
+@overload
+async def get_departures_batch(
+    queries: Iterable[tuple[str, str, str]],
+    token: str,
+    concurrency: int = ...,
+    max_len: Optional[int] = ...,
+    client: Optional["httpx.AsyncClient"] = ...,
+    trip_filter: Optional[TripFilter] = ...,
+    return_exceptions: Literal[False] = ...,
+) -> list[list[Departure]]:
+    ...
+
+
+@overload
+async def get_departures_batch(
+    queries: Iterable[tuple[str, str, str]],
+    token: str,
+    concurrency: int = ...,
+    max_len: Optional[int] = ...,
+    client: Optional["httpx.AsyncClient"] = ...,
+    trip_filter: Optional[TripFilter] = ...,
+    *,
+    return_exceptions: Literal[True],
+) -> list[Union[list[Departure], BaseException]]:
+    ...
+
+
+async def get_departures_batch(
+    queries: Iterable[tuple[str, str, str]],
+    token: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_len: Optional[int] = None,
+    client: Optional["httpx.AsyncClient"] = None,
+    trip_filter: Optional[TripFilter] = None,
+    return_exceptions: bool = False,
+) -> Union[list[list[Departure]], list[Union[list[Departure], BaseException]]]:
+    """Departures for many (start, end, rdc3339_datetime) queries, in query order
+
+    At most `concurrency` requests are in flight at once, all over one client.
+    With `return_exceptions`, a failed query gives its exception in place of
+    its departures, instead of failing the batch, like asyncio.gather.
+    """
+    import asyncio
+
+    from nstimes.utils import get_async_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get(
+        client: "httpx.AsyncClient", start: str, end: str, rdc3339_datetime: str
+    ) -> list[Departure]:
+        async with semaphore:
+            return await get_departures_async(
+                start=start,
+                end=end,
+                token=token,
+                rdc3339_datetime=rdc3339_datetime,
+                max_len=max_len,
+                client=client,
+                trip_filter=trip_filter,
+            )
+
+    async def gather(
+        client: "httpx.AsyncClient",
+    ) -> list[Union[list[Departure], BaseException]]:
+        return await asyncio.gather(
+            *(get(client, *query) for query in queries),
+            return_exceptions=return_exceptions,
+        )
+
+    if client is None:
+        async with get_async_client() as async_client:
+            return await gather(async_client)
+    return await gather(client)
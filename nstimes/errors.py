@@ -0,0 +1,97 @@
+import email.utils
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from typing import Optional
+
+import httpx
+
+# Rate limited, or an overloaded or restarting gateway, worth another try
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+
+class NSAPIError(Exception):
+    """A request to the NS API failed
+
+    `retryable` tells whether the same request may succeed later, and
+    `retry_after` how many seconds the API asked to wait, if it did.
+    """
+
+    retryable = False
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class NSAPITimeoutError(NSAPIError):
+    retryable = True
+
+
+class NSAPIConnectionError(NSAPIError):
+    retryable = True
+
+
+class NSAPIStatusError(NSAPIError):
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(message, status_code, retry_after)
+        self.retryable = status_code in RETRYABLE_STATUS_CODES
+
+
+class NSAPIRateLimitError(NSAPIStatusError):
+    """The subscription quota is used up, 429 Too Many Requests"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header, in seconds or a date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment.timestamp() - time.time())
+
+
+def from_httpx_error(error: httpx.HTTPError) -> NSAPIError:
+    if isinstance(error, httpx.TimeoutException):
+        return NSAPITimeoutError(f"NS API request timed out: {error}")
+    if isinstance(error, httpx.HTTPStatusError):
+        response = error.response
+        error_class = (
+            NSAPIRateLimitError
+            if response.status_code == httpx.codes.TOO_MANY_REQUESTS
+            else NSAPIStatusError
+        )
+        return error_class(
+            f"NS API responded {response.status_code} {response.reason_phrase}",
+            status_code=response.status_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
+    if isinstance(error, httpx.TransportError):
+        return NSAPIConnectionError(f"NS API is unreachable: {error}")
+    return NSAPIError(f"NS API request failed: {error}")
+
+
+@contextmanager
+def api_errors() -> Iterator[None]:
+    """Raise the httpx errors of a request as the matching NSAPIError"""
+    try:
+        yield
+    except httpx.HTTPError as error:
+        raise from_httpx_error(error) from error
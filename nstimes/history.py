@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from typing import Iterable
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+from pydantic_settings import SettingsConfigDict
+
+from nstimes.departure import Departure
+
+STATS_PERCENTILES = (50, 90, 95, 99)
+
+
+def default_history_path() -> str:
+    data_home = os.getenv("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(data_home, "nstimes", "history.sqlite3")
+
+
+class HistorySettings(BaseSettings):
+    """Departure history settings, configurable as NSTIMES_HISTORY_* env vars"""
+
+    model_config = SettingsConfigDict(env_prefix="NSTIMES_HISTORY_")
+
+    enabled: bool = False
+    path: str = default_history_path()
+
+
+@dataclass
+class RouteStats:
+    departures: int = 0
+    cancelled: int = 0
+    # Number of departures, that were not cancelled, per minutes of delay
+    delays: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def cancellation_rate(self) -> float:
+        return self.cancelled / self.departures if self.departures else 0.0
+
+    @property
+    def mean_delay(self) -> float:
+        count = sum(self.delays.values())
+        total = sum(delay * n for delay, n in self.delays.items())
+        return total / count if count else 0.0
+
+    def percentile(self, percentile: float) -> int:
+        """Delay in minutes that `percentile` percent of the trains did not exceed"""
+        count = sum(self.delays.values())
+        if not count:
+            return 0
+        rank = percentile / 100 * count
+        seen = 0
+        for delay in sorted(self.delays):
+            seen += self.delays[delay]
+            if seen >= rank:
+                return delay
+        return max(self.delays)
+
+
+class HistoryStore:
+    """SQLite store of every departure fetched, the latest observation of each
+
+    A departure is identified by its route, train type and planned departure,
+    so fetching it again updates its delay, platform and cancellation rather
+    than counting it twice. Nothing is ever deleted.
+    """
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS departures ("
+                "start TEXT NOT NULL, end TEXT NOT NULL, train_type TEXT NOT NULL, "
+                "departure_planned INTEGER NOT NULL, departure_actual INTEGER, "
+                "arrival_planned INTEGER, arrival_actual INTEGER, platform TEXT, "
+                "cancelled INTEGER NOT NULL, delay_minutes INTEGER NOT NULL, "
+                "fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (start, end, departure_planned, train_type)) "
+                # Stored in key order, so the stats of a route are a range scan
+                "WITHOUT ROWID"
+            )
+
+    def record(self, start: str, end: str, departures: Iterable[Departure]) -> None:
+        fetched_at = time.time()
+        rows = [
+            (
+                start,
+                end,
+                departure.train_type,
+                int(departure.departure_time.planned.timestamp()),
+                int(departure.departure_time.actual.timestamp()),
+                int(departure.arrival_time.planned.timestamp()),
+                int(departure.arrival_time.actual.timestamp()),
+                departure.platform,
+                departure.cancelled,
+                departure.departure_time.delay_minutes,
+                fetched_at,
+            )
+            for departure in departures
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO departures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (start, end, departure_planned, train_type) DO UPDATE "
+                "SET departure_actual = excluded.departure_actual, "
+                "arrival_actual = excluded.arrival_actual, "
+                "platform = excluded.platform, cancelled = excluded.cancelled, "
+                "delay_minutes = excluded.delay_minutes, "
+                "fetched_at = excluded.fetched_at",
+                rows,
+            )
+
+    def stats(
+        self, start: str, end: str, since: Optional[datetime] = None
+    ) -> RouteStats:
+        """Statistics of a route, aggregated by SQLite into a histogram of delays"""
+        since_timestamp = int(since.timestamp()) if since is not None else 0
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT delay_minutes, cancelled, COUNT(*) FROM departures "
+                "WHERE start = ? AND end = ? AND departure_planned >= ? "
+                "GROUP BY delay_minutes, cancelled",
+                (start, end, since_timestamp),
+            ).fetchall()
+        stats = RouteStats()
+        for delay, cancelled, count in rows:
+            stats.departures += count
+            if cancelled:
+                stats.cancelled += count
+            else:
+                stats.delays[delay] = stats.delays.get(delay, 0) + count
+        return stats
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+_history_store: Optional[HistoryStore] = None
+_configured = False
+
+
+def configure_history_store(store: Optional[HistoryStore]) -> None:
+    """Record fetched departures in `store`, None disables recording"""
+    global _history_store, _configured
+    _history_store = store
+    _configured = True
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    if not _configured:
+        settings = HistorySettings()
+        configure_history_store(
+            HistoryStore(settings.path) if settings.enabled else None
+        )
+    return _history_store
+
+
+def record_departures(start: str, end: str, departures: Iterable[Departure]) -> None:
+    store = get_history_store()
+    if store is not None:
+        store.record(start, end, departures)
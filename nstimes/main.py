@@ -1,26 +1,76 @@
-import json
+import functools
 import os
 from datetime import datetime
-from importlib.metadata import version
+from typing import Callable
 from typing import Generator
+from typing import Optional
+from typing import ParamSpec
 
-import httpx
 import typer
-from dotenv import load_dotenv
 from typing_extensions import Annotated
 
+from nstimes.board import DEFAULT_BOARD_LIMIT
+from nstimes.board import DEFAULT_MAX_JOURNEYS
+from nstimes.board import get_station_board
+from nstimes.completion import CompletionIndex
+from nstimes.completion import get_completion_index
+from nstimes.completion import index_snapshot_path
+from nstimes.completion import reset_completion_index
+from nstimes.completion import write_index_snapshot
+from nstimes.departure import DATE_FORMAT
+from nstimes.departure import DEFAULT_CONCURRENCY
+from nstimes.departure import Departure
 from nstimes.departure import get_departures
+from nstimes.departure import get_departures_batch
+from nstimes.departure import iter_departures
+from nstimes.departure import TIME_FORMAT
+from nstimes.departure import TripFilter
+from nstimes.metrics import span
 from nstimes.printers import get_printer
+from nstimes.printers import get_streaming_printer
 from nstimes.printers import PrinterChoice
-from nstimes.utils import convert_to_rfc3339
-from nstimes.utils import DATE_FORMAT
-from nstimes.utils import get_uic_mapping
-from nstimes.utils import httpx_get
-from nstimes.utils import STATIONS_FILE
-from nstimes.utils import TIME_FORMAT
+from nstimes.ratelimit import DEFAULT_RATE
+from nstimes.ratelimit import DEFAULT_RETRIES
+from nstimes.resolver import resolve_station
+from nstimes.resolver import UnknownStationError
+from nstimes.stations import build_metadata
+from nstimes.stations import invalidate_station_index
+from nstimes.stations import read_metadata
+from nstimes.stations import snapshot_path
+from nstimes.stations import STATIONS_FILE
+from nstimes.stations import write_metadata
+from nstimes.stations import write_snapshot
+from nstimes.stations import write_stations
+from nstimes.watch import DEFAULT_INTERVAL
+from nstimes.watch import DepartureBoard
+from nstimes.watch import PollSchedule
+from nstimes.watch import watch as run_watch
 
-# Load environment variables from the .env file
-load_dotenv()
+# Every invocation, including each shell completion, imports this module, so
+# httpx, pydantic, rich and asyncio are only imported by the commands that
+# use them. tests/test_startup.py keeps it that way.
+
+P = ParamSpec("P")
+
+
+def exit_on_api_error(command: Callable[P, None]) -> Callable[P, None]:
+    """Exit with 2 when the NS API timed out, and with 1 when it failed otherwise"""
+
+    @functools.wraps(command)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> None:
+        from nstimes.errors import NSAPIError
+        from nstimes.errors import NSAPITimeoutError
+
+        try:
+            command(*args, **kwargs)
+        except NSAPITimeoutError as error:
+            typer.echo(error, err=True)
+            raise typer.Exit(2)
+        except NSAPIError as error:
+            typer.echo(error, err=True)
+            raise typer.Exit(1)
+
+    return wrapper
 
 
 app = typer.Typer(
@@ -30,19 +80,63 @@ app = typer.Typer(
 
 
 @app.command(help="Generate stations lookup, should not be neccesary", hidden=True)
+@exit_on_api_error
 def update_stations_json(
     token: Annotated[
         str, typer.Option(help="Token to talk with the NS API", envvar="NS_API_TOKEN")
     ],
     path: Annotated[str, typer.Option(help="Path for stations.json")] = STATIONS_FILE,
+    snapshot: Annotated[
+        bool,
+        typer.Option(
+            help="Also precompile pickled snapshots of the stations and their "
+            "completion index for fast loading"
+        ),
+    ] = False,
 ) -> None:
+    from nstimes.utils import httpx_get
+
+    metadata = read_metadata(path)
+    headers = {}
+    if os.path.exists(path):
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
     query_params = {"countryCodes": "nl"}
-    response = httpx_get(token=token, query_params=query_params, api="v2/stations")
+    response = httpx_get(
+        token=token,
+        query_params=query_params,
+        api="v2/stations",
+        use_cache=False,
+        headers=headers,
+    )
+    if response.status_code == 304:
+        print("Stations are up to date")
+        return
     # get list of stations to uic code
     data = response.json()["payload"]
     uic_mapping = {d["namen"]["lang"]: d["UICCode"] for d in data}
-    with open(path, "w", encoding="utf-8") as file:
-        json.dump(uic_mapping, file)
+    changed = write_stations(uic_mapping, path)
+    write_metadata(
+        build_metadata(
+            data,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        ),
+        path,
+    )
+    if snapshot:
+        if changed or not os.path.exists(snapshot_path(path)):
+            write_snapshot(uic_mapping, path)
+        codes = {d["code"]: d["namen"]["lang"] for d in data if d.get("code")}
+        write_index_snapshot(CompletionIndex(uic_mapping, aliases=codes), path)
+    else:
+        for stale in (snapshot_path(path), index_snapshot_path(path)):
+            if os.path.exists(stale):
+                os.remove(stale)
+    invalidate_station_index()
+    reset_completion_index()
     typer.Exit(0)
 
 
@@ -52,20 +146,27 @@ def complete_name(lut: dict[str, str], incomplete: str) -> Generator[str, None,
             yield name
 
 
-complete_station_name = lambda incomplete: complete_name(
-    lut=get_uic_mapping(), incomplete=incomplete
-)
+complete_station_name = lambda incomplete: get_completion_index().complete(incomplete)
 
 
 @app.command(
     help="Provide train type, platform and departure times of an A -> B journey"
 )
+@exit_on_api_error
 def journey(
     start: Annotated[
-        str, typer.Option(help="Start station", autocompletion=complete_station_name)
+        str,
+        typer.Option(
+            help="Start station, typos and abbreviations are resolved",
+            autocompletion=complete_station_name,
+        ),
     ],
     end: Annotated[
-        str, typer.Option(help="Stop station", autocompletion=complete_station_name)
+        str,
+        typer.Option(
+            help="Stop station, typos and abbreviations are resolved",
+            autocompletion=complete_station_name,
+        ),
     ],
     token: Annotated[
         str, typer.Option(help="Token to talk with the NS API", envvar="NS_API_TOKEN")
@@ -79,32 +180,400 @@ def journey(
     printer_choice: Annotated[
         PrinterChoice, typer.Option(help="The type of printer")
     ] = PrinterChoice.ascii,
+    limit: Annotated[
+        Optional[int], typer.Option(help="Maximum number of departures", min=0)
+    ] = None,
+    max_transfers: Annotated[
+        Optional[int], typer.Option(help="Skip trips with more transfers", min=0)
+    ] = None,
+    min_transfer_minutes: Annotated[
+        Optional[int],
+        typer.Option(help="Skip trips with a shorter transfer", min=0),
+    ] = None,
 ) -> None:
+    from nstimes.utils import convert_to_rfc3339
+
     printer = get_printer(printer_choice)
 
+    try:
+        start = resolve_station(start)
+        end = resolve_station(end)
+    except UnknownStationError:
+        print("One or more of the stations does not exist")
+        raise typer.Exit(1)
     printer.title = f"Journeys from {start} -> {end} at {date} {time}"
     rdc3339_datetime = convert_to_rfc3339(time, date)
+    departures = iter_departures(
+        start=start,
+        end=end,
+        token=token,
+        rdc3339_datetime=rdc3339_datetime,
+        max_len=limit,
+        trip_filter=TripFilter(max_transfers, min_transfer_minutes),
+    )
+    for departure in departures:
+        with span("render"):
+            printer.add_departure(departure)
+    with span("render"):
+        printer.generate_output()
+
+
+def parse_route(route: str) -> tuple[str, str]:
+    start, separator, end = route.partition(":")
+    if not separator:
+        raise typer.BadParameter(f"Route '{route}' is not of the form START:END")
     try:
-        departures = get_departures(
-            start=start, end=end, token=token, rdc3339_datetime=rdc3339_datetime
+        return resolve_station(start), resolve_station(end)
+    except UnknownStationError as error:
+        raise typer.BadParameter(f"Station '{error.query}' does not exist")
+
+
+@app.command(help="Provide departures of several A -> B journeys at once")
+@exit_on_api_error
+def journeys(
+    route: Annotated[
+        list[str],
+        typer.Option("--route", help="Journey as START:END, can be repeated"),
+    ],
+    token: Annotated[
+        str, typer.Option(help="Token to talk with the NS API", envvar="NS_API_TOKEN")
+    ],
+    time: Annotated[
+        str, typer.Option(help=f"Time to departure ({TIME_FORMAT})")
+    ] = datetime.now().strftime("%H:%M"),
+    date: Annotated[
+        str, typer.Option(help=f"Date to departure ({DATE_FORMAT})")
+    ] = datetime.now().strftime("%d-%m-%Y"),
+    printer_choice: Annotated[
+        PrinterChoice, typer.Option(help="The type of printer")
+    ] = PrinterChoice.ascii,
+    concurrency: Annotated[
+        int, typer.Option(help="Maximum number of simultaneous requests", min=1)
+    ] = DEFAULT_CONCURRENCY,
+    limit: Annotated[
+        Optional[int], typer.Option(help="Maximum number of departures", min=0)
+    ] = None,
+    max_transfers: Annotated[
+        Optional[int], typer.Option(help="Skip trips with more transfers", min=0)
+    ] = None,
+    min_transfer_minutes: Annotated[
+        Optional[int],
+        typer.Option(help="Skip trips with a shorter transfer", min=0),
+    ] = None,
+) -> None:
+    import asyncio
+
+    from nstimes.errors import NSAPIError
+    from nstimes.errors import NSAPITimeoutError
+    from nstimes.utils import convert_to_rfc3339
+
+    routes = [parse_route(r) for r in route]
+    rdc3339_datetime = convert_to_rfc3339(time, date)
+    queries = [(start, end, rdc3339_datetime) for start, end in routes]
+    results = asyncio.run(
+        get_departures_batch(
+            queries,
+            token=token,
+            concurrency=concurrency,
+            max_len=limit,
+            trip_filter=TripFilter(max_transfers, min_transfer_minutes),
+            return_exceptions=True,
         )
-    except KeyError:
+    )
+    # A failed route is reported after the others are printed
+    succeeded: list[tuple[tuple[str, str], list[Departure]]] = []
+    failed: list[tuple[tuple[str, str], NSAPIError]] = []
+    for route_stations, result in zip(routes, results):
+        if isinstance(result, NSAPIError):
+            failed.append((route_stations, result))
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            succeeded.append((route_stations, result))
+    # Departures of all routes go to one stream, labeled with their route
+    streaming_printer = get_streaming_printer(printer_choice)
+    if streaming_printer is not None:
+        with span("render"):
+            for route_stations, departures in succeeded:
+                streaming_printer.route = route_stations
+                for departure in departures:
+                    streaming_printer.add_departure(departure)
+            streaming_printer.generate_output()
+    else:
+        for (start, end), departures in succeeded:
+            printer = get_printer(printer_choice)
+            printer.title = f"Journeys from {start} -> {end} at {date} {time}"
+            with span("render"):
+                for departure in departures:
+                    printer.add_departure(departure)
+                printer.generate_output()
+    for (start, end), error in failed:
+        typer.echo(f"Journeys from {start} -> {end} failed: {error}", err=True)
+    if failed:
+        timed_out = all(isinstance(error, NSAPITimeoutError) for _, error in failed)
+        raise typer.Exit(2 if timed_out else 1)
+
+
+@app.command(help="Next direct trains from a station to each of several destinations")
+@exit_on_api_error
+def board(
+    station: Annotated[
+        str,
+        typer.Option(
+            help="Station to leave from, typos and abbreviations are resolved",
+            autocompletion=complete_station_name,
+        ),
+    ],
+    to: Annotated[
+        list[str],
+        typer.Option(
+            help="Destination, can be repeated",
+            autocompletion=complete_station_name,
+        ),
+    ],
+    token: Annotated[
+        str, typer.Option(help="Token to talk with the NS API", envvar="NS_API_TOKEN")
+    ],
+    time: Annotated[
+        str, typer.Option(help=f"Time to departure ({TIME_FORMAT})")
+    ] = datetime.now().strftime("%H:%M"),
+    date: Annotated[
+        str, typer.Option(help=f"Date to departure ({DATE_FORMAT})")
+    ] = datetime.now().strftime("%d-%m-%Y"),
+    limit: Annotated[
+        int, typer.Option(help="Maximum number of departures per destination", min=1)
+    ] = DEFAULT_BOARD_LIMIT,
+    max_journeys: Annotated[
+        int, typer.Option(help="Departures of the station to search", min=1)
+    ] = DEFAULT_MAX_JOURNEYS,
+) -> None:
+    from rich.console import Console
+
+    from nstimes.printers import board_row
+    from nstimes.printers import create_board_table
+    from nstimes.utils import convert_to_rfc3339
+
+    try:
+        station = resolve_station(station)
+        destinations = [resolve_station(destination) for destination in to]
+    except UnknownStationError as error:
+        raise typer.BadParameter(f"Station '{error.query}' does not exist")
+    station_board = get_station_board(
+        station,
+        token=token,
+        rdc3339_datetime=convert_to_rfc3339(time, date),
+        max_journeys=max_journeys,
+    )
+    with span("render"):
+        table = create_board_table(f"Departures from {station} at {date} {time}")
+        for destination in destinations:
+            departures = station_board.to(destination, limit)
+            if not departures:
+                table.add_row(destination, "-", "no direct trains", "", "", "")
+            for departure in departures:
+                table.add_row(*board_row(destination, departure))
+        Console().print(table)
+
+
+@app.command(help="Write the departures of every journey in a CSV file as JSON Lines")
+def batch(
+    input_path: Annotated[
+        str,
+        typer.Option(
+            "--input", help="CSV file with start, end and optionally date and time"
+        ),
+    ],
+    output_path: Annotated[
+        str, typer.Option("--output", help="JSON Lines file the results are added to")
+    ],
+    token: Annotated[
+        str, typer.Option(help="Token to talk with the NS API", envvar="NS_API_TOKEN")
+    ],
+    concurrency: Annotated[
+        int, typer.Option(help="Number of journeys evaluated at once", min=1)
+    ] = DEFAULT_CONCURRENCY,
+    rate: Annotated[
+        float, typer.Option(help="Maximum number of requests per second", min=0.1)
+    ] = DEFAULT_RATE,
+    retries: Annotated[
+        int, typer.Option(help="Retries of a request on timeouts and 429s", min=0)
+    ] = DEFAULT_RETRIES,
+    limit: Annotated[
+        Optional[int], typer.Option(help="Maximum number of departures", min=0)
+    ] = None,
+    checkpoint: Annotated[
+        Optional[str],
+        typer.Option(help="Progress file to resume from [default: OUTPUT.checkpoint]"),
+    ] = None,
+) -> None:
+    from nstimes.batch import BatchRunner
+
+    runner = BatchRunner(
+        token=token,
+        concurrency=concurrency,
+        rate=rate,
+        retries=retries,
+        max_len=limit,
+    )
+    summary = runner.run(input_path, output_path, checkpoint)
+    typer.echo(
+        f"{summary.done} done, {summary.failed} failed, "
+        f"{summary.skipped} skipped from checkpoint",
+        err=True,
+    )
+
+
+@app.command(help="Keep a live board of the departures of an A -> B journey open")
+def watch(
+    start: Annotated[
+        str,
+        typer.Option(
+            help="Start station, typos and abbreviations are resolved",
+            autocompletion=complete_station_name,
+        ),
+    ],
+    end: Annotated[
+        str,
+        typer.Option(
+            help="Stop station, typos and abbreviations are resolved",
+            autocompletion=complete_station_name,
+        ),
+    ],
+    token: Annotated[
+        str, typer.Option(help="Token to talk with the NS API", envvar="NS_API_TOKEN")
+    ],
+    interval: Annotated[
+        float,
+        typer.Option(
+            help="Seconds between updates, shorter when a train leaves soon", min=5
+        ),
+    ] = DEFAULT_INTERVAL,
+    limit: Annotated[
+        Optional[int], typer.Option(help="Maximum number of departures", min=0)
+    ] = None,
+    polls: Annotated[
+        Optional[int],
+        typer.Option(help="Stop after this many updates instead of on Ctrl-C", min=1),
+    ] = None,
+) -> None:
+    from rich.live import Live
+
+    from nstimes.utils import convert_to_rfc3339
+    from nstimes.utils import get_client
+
+    try:
+        start = resolve_station(start)
+        end = resolve_station(end)
+    except UnknownStationError:
         print("One or more of the stations does not exist")
         raise typer.Exit(1)
-    for departure in departures:
-        if departure.time_left_minutes >= 0:
-            printer.add_departure(departure)
-    printer.generate_output()
+    client = get_client()
+
+    def fetch(moment: datetime) -> list[Departure]:
+        return get_departures(
+            start=start,
+            end=end,
+            token=token,
+            rdc3339_datetime=convert_to_rfc3339(
+                moment.strftime(TIME_FORMAT), moment.strftime(DATE_FORMAT)
+            ),
+            max_len=limit,
+            client=client,
+            use_cache=False,
+        )
+
+    board = DepartureBoard(title=f"Journeys from {start} -> {end}")
+    with Live(board.render(), auto_refresh=False) as live:
+        try:
+            run_watch(
+                board,
+                fetch,
+                on_change=lambda board: live.update(board.render(), refresh=True),
+                schedule=PollSchedule(interval),
+                polls=polls,
+            )
+        except KeyboardInterrupt:
+            pass
+
+
+@app.command(help="Delays and cancellations of a journey, from the recorded history")
+def stats(
+    route: Annotated[str, typer.Option(help="Journey as START:END")],
+    since: Annotated[
+        Optional[str],
+        typer.Option(help=f"Only count departures from this date ({DATE_FORMAT})"),
+    ] = None,
+) -> None:
+    from nstimes.history import HistorySettings
+    from nstimes.history import HistoryStore
+    from nstimes.history import STATS_PERCENTILES
+
+    start, end = parse_route(route)
+    try:
+        since_date = datetime.strptime(since, DATE_FORMAT) if since else None
+    except ValueError:
+        raise typer.BadParameter(
+            f"Expected a date as {DATE_FORMAT}", param_hint="since"
+        )
+    route_stats = HistoryStore(HistorySettings().path).stats(start, end, since_date)
+    if not route_stats.departures:
+        print(
+            f"No departures from {start} -> {end} recorded, see NSTIMES_HISTORY_ENABLED"
+        )
+        raise typer.Exit(1)
+    percentiles = ", ".join(
+        f"p{p} {route_stats.percentile(p)} min" for p in STATS_PERCENTILES
+    )
+    print(f"Journeys from {start} -> {end}" + (f" since {since}" if since else ""))
+    print(f"Departures: {route_stats.departures}")
+    print(f"Cancelled: {route_stats.cancellation_rate:.1%}")
+    print(f"Mean delay: {route_stats.mean_delay:.1f} min")
+    print(f"Delay: {percentiles}")
 
 
 def version_callback(value: bool) -> None:
     if value:
+        from importlib.metadata import version
+
         print(f"nstimes version: {version(__package__)}")
         raise typer.Exit(0)
 
 
+def start_profile(ctx: typer.Context) -> None:
+    """Collect metrics and print where the time went once the command is done"""
+    import time
+
+    from nstimes.metrics import configure_metrics
+    from nstimes.metrics import format_profile
+    from nstimes.metrics import Metrics
+
+    metrics = Metrics()
+    configure_metrics(metrics)
+    started = time.perf_counter()
+
+    def report() -> None:
+        total_seconds = time.perf_counter() - started
+        typer.echo(format_profile(metrics, total_seconds), err=True)
+        configure_metrics(None)
+
+    ctx.call_on_close(report)
+
+
+def use_recordings(record: Optional[str], replay: Optional[str]) -> None:
+    from nstimes.utils import configure_client
+    from nstimes.utils import get_client_settings
+
+    if record is not None and replay is not None:
+        raise typer.BadParameter("--record and --replay can not be combined")
+    settings = get_client_settings().model_copy(
+        update={"record_dir": record, "replay_dir": replay}
+    )
+    configure_client(settings)
+
+
 @app.callback()
 def main(
+    ctx: typer.Context,
     version: bool = typer.Option(
         None,
         "--version",
@@ -112,8 +581,28 @@ def main(
         is_eager=True,
         help="Print version info",
     ),
+    profile: bool = typer.Option(
+        False, "--profile", help="Print the time spent per stage to stderr"
+    ),
+    record: Optional[str] = typer.Option(
+        None, "--record", metavar="DIR", help="Save every NS API response in DIR"
+    ),
+    replay: Optional[str] = typer.Option(
+        None,
+        "--replay",
+        metavar="DIR",
+        help="Answer NS API requests from the responses saved in DIR, offline",
+    ),
 ) -> None:
-    return
+    # Load environment variables from the .env file, before the options of the
+    # command are parsed and the client settings are read
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if profile:
+        start_profile(ctx)
+    if record is not None or replay is not None:
+        use_recordings(record, replay)
 
 
 if __name__ == "__main__":
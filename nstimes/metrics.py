@@ -0,0 +1,290 @@
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import ContextManager
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Protocol
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# Stages of an httpx request, as traced by httpcore, and the span they count as
+HTTP_STAGES = {
+    "connect_tcp": "http.connect",
+    "start_tls": "http.tls",
+    "receive_response_headers": "http.wait",
+    "receive_response_body": "http.download",
+}
+
+
+@dataclass
+class SpanStats:
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+class Metrics:
+    """Time spent per named span and running counters, safe to share by threads"""
+
+    def __init__(self) -> None:
+        self.spans: dict[str, SpanStats] = {}
+        self.counters: dict[str, float] = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.count += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+class Span:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: Metrics, name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.metrics.record(self.name, time.perf_counter() - self.started)
+
+
+_metrics: Optional[Metrics] = None
+# Returned by span() while metrics are disabled, so that costs one check
+NO_SPAN: ContextManager[None] = nullcontext()
+
+
+def configure_metrics(metrics: Optional[Metrics]) -> None:
+    """Collect spans and counters in `metrics`, None disables collecting"""
+    global _metrics
+    _metrics = metrics
+
+
+def get_metrics() -> Optional[Metrics]:
+    return _metrics
+
+
+def span(name: str) -> ContextManager[None]:
+    """Time the block as span `name`, when metrics are enabled"""
+    metrics = _metrics
+    if metrics is None:
+        return NO_SPAN
+    return Span(metrics, name)
+
+
+def count(name: str, value: float = 1) -> None:
+    metrics = _metrics
+    if metrics is not None:
+        metrics.increment(name, value)
+
+
+def timed_iter(name: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Time producing each item as span `name`, not the caller's work in between"""
+    metrics = _metrics
+    iterator = iter(iterable)
+    if metrics is None:
+        return iterator
+
+    def timed() -> Iterator[T]:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                metrics.record(name, time.perf_counter() - started)
+                return
+            metrics.record(name, time.perf_counter() - started)
+            yield item
+
+    return timed()
+
+
+def http_trace_stage(event: str) -> tuple[Optional[str], str]:
+    """The span and phase of an httpcore trace event name"""
+    stage, _, phase = event.rpartition(".")
+    return HTTP_STAGES.get(stage.partition(".")[2]), phase
+
+
+def http_trace() -> Optional[Callable[[str, dict[str, Any]], None]]:
+    """httpx "trace" extension timing connect, TLS, wait and download, if enabled"""
+    metrics = _metrics
+    if metrics is None:
+        return None
+    started: dict[str, float] = {}
+
+    def trace(event: str, info: dict[str, Any]) -> None:
+        name, phase = http_trace_stage(event)
+        if name is None:
+            return
+        if phase == "started":
+            started[name] = time.perf_counter()
+        elif name in started:
+            metrics.record(name, time.perf_counter() - started.pop(name))
+
+    return trace
+
+
+def http_trace_async() -> Optional[Callable[[str, dict[str, Any]], Awaitable[None]]]:
+    trace = http_trace()
+    if trace is None:
+        return None
+    sync_trace = trace
+
+    async def trace_async(event: str, info: dict[str, Any]) -> None:
+        sync_trace(event, info)
+
+    return trace_async
+
+
+def format_profile(metrics: Metrics, total_seconds: Optional[float] = None) -> str:
+    """Per stage breakdown for --profile, in the order the stages first ran
+
+    Spans can nest, e.g. http.connect is part of http.request, so the stages
+    do not add up to the total.
+    """
+    lines = [f"{'stage':<22}{'calls':>7}{'total ms':>11}{'mean ms':>10}{'max ms':>9}"]
+    for name, stats in metrics.spans.items():
+        lines.append(
+            f"{name:<22}{stats.count:>7}{stats.seconds * 1000:>11.2f}"
+            f"{stats.seconds * 1000 / stats.count:>10.2f}"
+            f"{stats.max_seconds * 1000:>9.2f}"
+        )
+    if total_seconds is not None:
+        lines.append(f"{'total':<22}{1:>7}{total_seconds * 1000:>11.2f}")
+    for name, value in metrics.counters.items():
+        lines.append(f"{name:<22}{value:>7g}")
+    return "\n".join(lines)
+
+
+class Exporter(Protocol):
+    content_type: str
+
+    def export(self, metrics: Metrics) -> str:
+        """serializes the spans and counters"""
+
+
+def metric_name(name: str) -> str:
+    return "nstimes_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+class PrometheusExporter:
+    """Prometheus text exposition format, spans as a summary without quantiles"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def export(self, metrics: Metrics) -> str:
+        with metrics.lock:
+            spans = {name: SpanStats(**vars(s)) for name, s in metrics.spans.items()}
+            counters = dict(metrics.counters)
+        lines = [
+            "# HELP nstimes_span_seconds Time spent per stage",
+            "# TYPE nstimes_span_seconds summary",
+        ]
+        for name, stats in spans.items():
+            lines.append(f'nstimes_span_seconds_sum{{span="{name}"}} {stats.seconds}')
+            lines.append(f'nstimes_span_seconds_count{{span="{name}"}} {stats.count}')
+        for name, value in counters.items():
+            lines.append(f"# TYPE {metric_name(name)}_total counter")
+            lines.append(f"{metric_name(name)}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class OTLPJsonExporter:
+    """An OpenTelemetry ExportMetricsServiceRequest, as OTLP/HTTP JSON
+
+    Can be posted to the /v1/metrics endpoint of an OpenTelemetry collector.
+    Sums are cumulative since the metrics were created.
+    """
+
+    content_type = "application/json"
+
+    def __init__(self, service_name: str = "nstimes") -> None:
+        self.service_name = service_name
+
+    def export(self, metrics: Metrics) -> str:
+        import json
+
+        start = str(int(metrics.started * 1e9))
+        now = str(time.time_ns())
+
+        def point(value: float, **attributes: str) -> dict[str, Any]:
+            return {
+                "attributes": [
+                    {"key": key, "value": {"stringValue": item}}
+                    for key, item in attributes.items()
+                ],
+                "startTimeUnixNano": start,
+                "timeUnixNano": now,
+                "asDouble": value,
+            }
+
+        def monotonic_sum(
+            name: str, unit: str, points: list[dict[str, Any]]
+        ) -> dict[str, Any]:
+            return {
+                "name": name,
+                "unit": unit,
+                "sum": {
+                    "dataPoints": points,
+                    # AGGREGATION_TEMPORALITY_CUMULATIVE
+                    "aggregationTemporality": 2,
+                    "isMonotonic": True,
+                },
+            }
+
+        with metrics.lock:
+            spans = list(metrics.spans.items())
+            counters = list(metrics.counters.items())
+        otel_metrics = [
+            monotonic_sum(
+                "nstimes.span.duration",
+                "s",
+                [point(stats.seconds, span=name) for name, stats in spans],
+            ),
+            monotonic_sum(
+                "nstimes.span.calls",
+                "1",
+                [point(stats.count, span=name) for name, stats in spans],
+            ),
+        ]
+        otel_metrics += [
+            monotonic_sum(f"nstimes.{name}", "1", [point(value)])
+            for name, value in counters
+        ]
+        request = {
+            "resourceMetrics": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeMetrics": [
+                        {"scope": {"name": "nstimes"}, "metrics": otel_metrics}
+                    ],
+                }
+            ]
+        }
+        return json.dumps(request)
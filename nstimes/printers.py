@@ -1,20 +1,36 @@
+import csv
+import json
+import os
+import sys
 from enum import Enum
+from typing import Any
+from typing import IO
+from typing import Optional
 from typing import Protocol
+from typing import TYPE_CHECKING
 
-import httpx
 import typer
-from rich import print
-from rich.console import Console
-from rich.table import Column
-from rich.table import Table
-from rich.text import Text
 
-from nstimes.departure import Departure
+from nstimes.styles import ANSI_CANCELLED
+from nstimes.styles import ANSI_CYAN
+from nstimes.styles import ANSI_RED
+from nstimes.styles import ANSI_RESET
 from nstimes.styles import cancelled
 from nstimes.styles import cyan
 from nstimes.styles import green
 from nstimes.styles import red
 
+if TYPE_CHECKING:  # pragma: no cover
+    from rich.table import Table
+
+    from nstimes.board import BoardDeparture
+    from nstimes.departure import Departure
+    from nstimes.departure import Itinerary
+    from nstimes.departure import Time
+
+# rich is imported when a printer is created, so that choosing a printer on
+# the command line does not load it.
+
 
 class Printer(Protocol):
     title: str = ""
@@ -22,10 +38,20 @@ class Printer(Protocol):
     def generate_output(self) -> None:
         """generates output in the console"""
 
-    def add_departure(self, departure: Departure) -> None:
+    def add_departure(self, departure: "Departure") -> None:
         """adds a row to the departures"""
 
 
+class StreamingPrinter(Printer, Protocol):
+    """A printer writing departures as records of one stream, as they are added
+
+    While `route` is set, every record starts with its start and end station,
+    so departures of several routes can share one stream.
+    """
+
+    route: Optional[tuple[str, str]]
+
+
 class ConsolePrinter:
     def __init__(self) -> None:
         self.buf = ""
@@ -33,29 +59,101 @@ class ConsolePrinter:
         self.lines: list[str] = []
 
     def generate_output(self) -> None:
+        from rich import print
+
         print(self.title)
         print("\n")
         for line in self.lines:
             print(line)
 
-    def add_departure(self, departure: Departure) -> None:
-        line = f"{departure.train_type:<3s} p.{departure.platform:>3s} in {departure.calc_time_left_minutes():>2d} min {departure.departure_time} -> {departure.arrival_time}"
+    def add_departure(self, departure: "Departure") -> None:
+        line = f"{departure.train_type:<3s} p.{departure.platform:>3s} in {departure.time_left_minutes:>2d} min {departure.departure_time} -> {departure.arrival_time}"
+        if departure.transfers and departure.itinerary is not None:
+            line = f"{line} {transfer_details(departure.itinerary)}"
         if departure.cancelled:
             line = cancelled(line)
         self.lines.append(line)
 
 
+def transfer_details(itinerary: "Itinerary") -> str:
+    """Where, from and to which platform, and how fast each transfer is"""
+    legs = itinerary.legs
+    return ", ".join(
+        f"via {arriving.destination} p.{arriving.arrival_platform} -> "
+        f"p.{leaving.departure_platform} {leaving.train_type} ({margin} min)"
+        for arriving, leaving, margin in zip(legs, legs[1:], itinerary.transfer_margins)
+    )
+
+
+def create_table(title: str = "") -> "Table":
+    from rich.table import Column
+    from rich.table import Table
+
+    return Table(
+        Column("Train", justify="left"),
+        Column("Platform", justify="right"),
+        Column("Leaves in", justify="right"),
+        Column("Departure time", justify="right"),
+        Column("Arrival time", justify="right"),
+        title=title or None,
+    )
+
+
+def table_row(departure: "Departure") -> tuple[str, ...]:
+    """The cells of a departure in a table created by create_table"""
+    if departure.cancelled:
+        return (
+            cancelled(departure.train_type),
+            cancelled(departure.platform),
+            cancelled(f"{departure.time_left_minutes} min"),
+            cancelled(str(departure.departure_time)),
+            cancelled(str(departure.arrival_time)),
+        )
+    return (
+        departure.train_type,
+        cyan(departure.platform),
+        f"{cyan(departure.time_left_minutes)} min",
+        f"{departure.departure_time}",
+        f"{departure.arrival_time}",
+    )
+
+
+def create_board_table(title: str = "") -> "Table":
+    from rich.table import Column
+    from rich.table import Table
+
+    return Table(
+        Column("To", justify="left"),
+        Column("Train", justify="left"),
+        Column("Direction", justify="left"),
+        Column("Platform", justify="right"),
+        Column("Leaves in", justify="right"),
+        Column("Departure time", justify="right"),
+        title=title or None,
+    )
+
+
+def board_row(destination: str, departure: "BoardDeparture") -> tuple[str, ...]:
+    """The cells of a departure in a table created by create_board_table"""
+    cells = (
+        departure.train_type,
+        departure.direction,
+        departure.platform,
+        f"{departure.time_left_minutes} min",
+        str(departure.departure_time),
+    )
+    if departure.cancelled:
+        return (destination, *(cancelled(cell) for cell in cells))
+    return (destination, cells[0], cells[1], cyan(cells[2]), cells[3], cells[4])
+
+
 class ConsoleTablePrinter:
     def __init__(self) -> None:
-        self.table = Table(
-            Column("Train", justify="left"),
-            Column("Platform", justify="right"),
-            Column("Leaves in", justify="right"),
-            Column("Departure time", justify="right"),
-            Column("Arrival time", justify="right"),
-        )
+        self.table = create_table()
 
     def generate_output(self) -> None:
+        from rich.console import Console
+
         Console().print(self.table)
 
     @property
@@ -66,28 +164,192 @@ class ConsoleTablePrinter:
     def title(self, value: str) -> None:
         self.table.title = value
 
-    def add_departure(self, departure: Departure) -> None:
+    def add_departure(self, departure: "Departure") -> None:
+        self.table.add_row(*table_row(departure))
+
+
+def flat_dict(departure: "Departure") -> dict[str, Any]:
+    """Departure.as_dict with the nested times flattened, e.g. departure_time_planned"""
+    flat: dict[str, Any] = {}
+    for key, value in departure.as_dict().items():
+        if isinstance(value, dict):
+            flat.update((f"{key}_{field}", item) for field, item in value.items())
+        else:
+            flat[key] = value
+    return flat
+
+
+def with_route(
+    route: Optional[tuple[str, str]], record: dict[str, Any]
+) -> dict[str, Any]:
+    if route is None:
+        return record
+    start, end = route
+    return {"start": start, "end": end, **record}
+
+
+class PlainPrinter:
+    """The lines of ConsolePrinter, formatted without rich and written at once
+
+    Colors are written as ANSI escape codes when the stream is a terminal,
+    and left out when it is not or NO_COLOR is set. No markup is parsed.
+    """
+
+    def __init__(
+        self, stream: Optional[IO[str]] = None, color: Optional[bool] = None
+    ) -> None:
+        self.stream = stream or sys.stdout
+        self.title = ""
+        self.lines: list[str] = []
+        if color is None:
+            color = self.stream.isatty() and "NO_COLOR" not in os.environ
+        self.red, self.cyan, self.cancelled, self.reset = (
+            (ANSI_RED, ANSI_CYAN, ANSI_CANCELLED, ANSI_RESET)
+            if color
+            else ("", "", "", "")
+        )
+
+    def format_time(self, time: "Time", style: str = "") -> str:
+        """The planned time and delay, continuing in `style` after the delay"""
+        planned = f"{time.planned.hour:02d}:{time.planned.minute:02d}"
+        delay = time.delay_minutes
+        if delay:
+            return f"({planned}{self.red}+{delay}{self.reset}{style})"
+        return f"({planned})"
+
+    def add_departure(self, departure: "Departure") -> None:
         if departure.cancelled:
-            self.table.add_row(
-                cancelled(departure.train_type),
-                cancelled(departure.platform),
-                cancelled(f"{departure.time_left_minutes} min"),
-                cancelled(str(departure.departure_time)),
-                cancelled(str(departure.arrival_time)),
+            line = (
+                f"{self.cancelled}{departure.train_type:<3s} p.{departure.platform:>3s}"
+                f" in {departure.time_left_minutes:>2d} min"
+                f" {self.format_time(departure.departure_time, self.cancelled)}"
+                f" -> {self.format_time(departure.arrival_time, self.cancelled)}"
+                f"{self.reset}"
             )
         else:
-            self.table.add_row(
-                departure.train_type,
-                cyan(departure.platform),
-                f"{cyan(departure.time_left_minutes)} min",
-                f"{departure.departure_time}",
-                f"{departure.arrival_time}",
+            line = (
+                f"{departure.train_type:<3s} p.{self.cyan}{departure.platform:>3s}"
+                f"{self.reset} in {departure.time_left_minutes:>2d} min"
+                f" {self.format_time(departure.departure_time)}"
+                f" -> {self.format_time(departure.arrival_time)}"
+            )
+        if departure.transfers and departure.itinerary is not None:
+            line = f"{line} {transfer_details(departure.itinerary)}"
+        self.lines.append(line)
+
+    def generate_output(self) -> None:
+        self.stream.write("\n".join([self.title, "", *self.lines, ""]))
+        self.stream.flush()
+
+
+class JsonLinesPrinter:
+    """Writes every departure as a line of JSON, as soon as it is added"""
+
+    def __init__(self, stream: Optional[IO[str]] = None) -> None:
+        self.stream = stream or sys.stdout
+        self.title = ""
+        self.route: Optional[tuple[str, str]] = None
+
+    def generate_output(self) -> None:
+        self.stream.flush()
+
+    def add_departure(self, departure: "Departure") -> None:
+        record = with_route(self.route, departure.as_dict())
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+class CsvPrinter:
+    """Writes every departure as a row of CSV, as soon as it is added"""
+
+    def __init__(self, stream: Optional[IO[str]] = None) -> None:
+        self.stream = stream or sys.stdout
+        self.title = ""
+        self.route: Optional[tuple[str, str]] = None
+        self.writer: Optional[csv.DictWriter[str]] = None
+
+    def generate_output(self) -> None:
+        self.stream.flush()
+
+    def add_departure(self, departure: "Departure") -> None:
+        row = with_route(self.route, flat_dict(departure))
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.stream, fieldnames=list(row))
+            self.writer.writeheader()
+        self.writer.writerow(row)
+        self.stream.flush()
+
+
+class ArrowPrinter:
+    """Writes an Arrow IPC stream with a record batch per departure
+
+    The stream is opened by the first departure, with start and end columns
+    when a route is set by then. Needs pyarrow, installed with the arrow extra.
+    """
+
+    def __init__(self, stream: Optional[IO[bytes]] = None) -> None:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            typer.echo(
+                "The arrow printer needs pyarrow: pip install 'nstimes[arrow]'",
+                err=True,
             )
+            raise typer.Exit(1)
+        self.pa = pa
+        self.stream = stream or sys.stdout.buffer
+        self.title = ""
+        self.route: Optional[tuple[str, str]] = None
+        self.schema = pa.schema(
+            [
+                ("train_type", pa.string()),
+                ("platform", pa.string()),
+                ("departure_time_planned", pa.string()),
+                ("departure_time_actual", pa.string()),
+                ("departure_time_delay_minutes", pa.int32()),
+                ("arrival_time_planned", pa.string()),
+                ("arrival_time_actual", pa.string()),
+                ("arrival_time_delay_minutes", pa.int32()),
+                ("cancelled", pa.bool_()),
+                ("time_left_minutes", pa.int32()),
+                ("transfers", pa.int32()),
+            ]
+        )
+        self.writer: Any = None
+
+    def open_writer(self) -> Any:
+        if self.writer is None:
+            if self.route is not None:
+                self.schema = self.pa.schema(
+                    [
+                        ("start", self.pa.string()),
+                        ("end", self.pa.string()),
+                        *self.schema,
+                    ]
+                )
+            self.writer = self.pa.ipc.new_stream(self.stream, self.schema)
+        return self.writer
+
+    def generate_output(self) -> None:
+        self.open_writer().close()
+        self.stream.flush()
+
+    def add_departure(self, departure: "Departure") -> None:
+        writer = self.open_writer()
+        batch = self.pa.RecordBatch.from_pylist(
+            [with_route(self.route, flat_dict(departure))], schema=self.schema
+        )
+        writer.write_batch(batch)
+        self.stream.flush()
 
 
 class PrinterChoice(str, Enum):
     table = "table"
     ascii = "ascii"
+    plain = "plain"
+    jsonl = "jsonl"
+    csv = "csv"
+    arrow = "arrow"
 
 
 def get_printer(
@@ -97,5 +359,22 @@ def get_printer(
         return ConsolePrinter()
     elif printer_choice == PrinterChoice.table:
         return ConsoleTablePrinter()
-    else:
+    elif printer_choice == PrinterChoice.plain:
+        return PlainPrinter()
+    streaming_printer = get_streaming_printer(printer_choice)
+    if streaming_printer is None:
         raise typer.Exit(1)
+    return streaming_printer
+
+
+def get_streaming_printer(
+    printer_choice: PrinterChoice,
+) -> Optional[StreamingPrinter]:
+    """The printer of a machine readable choice, None for the console printers"""
+    if printer_choice == PrinterChoice.jsonl:
+        return JsonLinesPrinter()
+    elif printer_choice == PrinterChoice.csv:
+        return CsvPrinter()
+    elif printer_choice == PrinterChoice.arrow:
+        return ArrowPrinter()
+    return None
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable
+from typing import Callable
+from typing import Coroutine
+from typing import Optional
+from typing import TypeVar
+
+from nstimes.metrics import count
+
+T = TypeVar("T")
+
+# Requests per second, lower it to match the quota of your NS API subscription
+DEFAULT_RATE = 5.0
+# A rate no caller ever waits for
+UNLIMITED = 1e9
+DEFAULT_RETRIES = 4
+# Seconds before the first retry, doubled for every next one
+BASE_DELAY = 1.0
+# Never wait longer than this before a retry, give up instead
+MAX_DELAY = 30.0
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, in bursts of up to `burst` calls
+
+    Callers that find the bucket empty reserve a token and sleep until it has
+    been refilled, so waiting callers are served in order. One bucket can be
+    shared by threads and coroutines.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, returns the seconds to wait before using it"""
+        with self.lock:
+            now = self.clock()
+            elapsed = now - self.updated
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            self.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        import asyncio
+
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether an error, like a NSAPIError, says the request may succeed later"""
+    return bool(getattr(error, "retryable", False))
+
+
+@dataclass
+class RetryPolicy:
+    """Retries transient errors with jittered exponential backoff
+
+    The n-th retry waits between half and all of `base_delay * 2**n` seconds,
+    at most `max_delay`, unless the error carries the Retry-After of the API.
+    A Retry-After longer than `max_delay` is not waited for.
+    """
+
+    retries: int = DEFAULT_RETRIES
+    base_delay: float = BASE_DELAY
+    max_delay: float = MAX_DELAY
+    sleep: Callable[[float], None] = time.sleep
+    # Defaults to asyncio.sleep
+    async_sleep: Optional[Callable[[float], Coroutine[None, None, None]]] = None
+
+    def delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """Seconds to wait before retrying after `error`, None to give up"""
+        if attempt >= self.retries or not is_transient(error):
+            return None
+        retry_after: Optional[float] = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        backoff = min(self.max_delay, self.base_delay * 2.0**attempt)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def call(self, fn: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as error:
+                delay = self.delay(attempt, error)
+                if delay is None:
+                    raise
+            count("http.retries")
+            self.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]]) -> T:
+        import asyncio
+
+        async_sleep = self.async_sleep or asyncio.sleep
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except Exception as error:
+                delay = self.delay(attempt, error)
+                if delay is None:
+                    raise
+            count("http.retries")
+            await async_sleep(delay)
+            attempt += 1
@@ -0,0 +1,187 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import Optional
+
+import httpx
+
+from nstimes.departure import DATETIME_FORMAT_STRING
+from nstimes.departure import parse_datetime
+from nstimes.stations import atomic_write
+
+# Query parameters left out of the key of a recording: a journey asked for
+# at another time replays the same recording, with its times shifted.
+VOLATILE_PARAMS = {"dateTime"}
+# Response headers worth keeping, the rest describe the recorded connection
+KEPT_HEADERS = {"content-type", "etag", "last-modified"}
+
+
+def recording_key(request: httpx.Request) -> str:
+    """File name of the recording of `request`, by endpoint and normalized params"""
+    path = request.url.path.strip("/")
+    params = sorted(
+        (name, value)
+        for name, value in request.url.params.multi_items()
+        if name not in VOLATILE_PARAMS
+    )
+    digest = hashlib.sha1(json.dumps([path, params]).encode()).hexdigest()[:16]
+    endpoint = "_".join(path.split("/")[-2:])
+    return f"{endpoint}-{digest}.json.gz"
+
+
+def request_datetime(params: dict[str, str]) -> Optional[datetime]:
+    value = params.get("dateTime")
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def shift_times(data: Any, shift: timedelta) -> Any:
+    """Copy of an NS payload with every ...DateTime field moved by `shift`"""
+    if isinstance(data, dict):
+        return {
+            key: (
+                (parse_datetime(value) + shift).strftime(DATETIME_FORMAT_STRING)
+                if key.endswith("DateTime") and isinstance(value, str)
+                else shift_times(value, shift)
+            )
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [shift_times(item, shift) for item in data]
+    return data
+
+
+class RecordTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Passes requests on to the NS API and saves every response in `directory`
+
+    Recordings are gzipped json, one file per endpoint and normalized query,
+    so recording a query again replaces the previous recording.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.transport = transport or httpx.HTTPTransport()
+        self.async_transport = async_transport or httpx.AsyncHTTPTransport()
+
+    def save(self, request: httpx.Request, response: httpx.Response) -> None:
+        recording = {
+            "url": str(request.url.copy_with(query=None)),
+            "params": dict(request.url.params),
+            "recorded_at": time.time(),
+            "status_code": response.status_code,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() in KEPT_HEADERS
+            },
+            "body": response.text,
+        }
+        path = os.path.join(self.directory, recording_key(request))
+        atomic_write(path, gzip.compress(json.dumps(recording).encode()))
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.transport.handle_request(request)
+        response.read()
+        self.save(request, response)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.async_transport.handle_async_request(request)
+        await response.aread()
+        self.save(request, response)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+    async def aclose(self) -> None:
+        await self.async_transport.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Answers requests from the recordings in `directory`, without a network
+
+    Times in a replayed response are moved by the time between the recorded
+    and the replayed request, so departures are as far in the future as they
+    were when recorded. A request without a dateTime is shifted by the age
+    of the recording. Recordings are read once and shifted bodies are cached
+    per minute of shift, so a replay costs little more than a dict lookup.
+    A request that was never recorded gets a 404.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.recordings: dict[str, Optional[dict[str, Any]]] = {}
+        self.bodies: dict[tuple[str, int], bytes] = {}
+        self.lock = threading.Lock()
+
+    def load(self, key: str) -> Optional[dict[str, Any]]:
+        if key not in self.recordings:
+            try:
+                with gzip.open(os.path.join(self.directory, key), "rb") as file:
+                    recording: Optional[dict[str, Any]] = json.load(file)
+            except OSError:
+                recording = None
+            with self.lock:
+                self.recordings[key] = recording
+        return self.recordings[key]
+
+    def shift_minutes(self, request: httpx.Request, recording: dict[str, Any]) -> int:
+        requested = request_datetime(dict(request.url.params))
+        recorded = request_datetime(recording["params"])
+        if requested is not None and recorded is not None:
+            if (requested.tzinfo is None) != (recorded.tzinfo is None):
+                requested = requested.astimezone()
+                recorded = recorded.astimezone()
+            shift = requested - recorded
+        else:
+            shift = timedelta(seconds=time.time() - recording["recorded_at"])
+        return round(shift.total_seconds() / 60)
+
+    def body(self, key: str, recording: dict[str, Any], shift_minutes: int) -> bytes:
+        body = self.bodies.get((key, shift_minutes))
+        if body is None:
+            text: str = recording["body"]
+            if shift_minutes and "DateTime" in text:
+                shifted = shift_times(
+                    json.loads(text), timedelta(minutes=shift_minutes)
+                )
+                text = json.dumps(shifted)
+            body = text.encode()
+            with self.lock:
+                self.bodies[(key, shift_minutes)] = body
+        return body
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = recording_key(request)
+        recording = self.load(key)
+        if recording is None:
+            return httpx.Response(
+                404, json={"message": f"Not recorded: {key}"}, request=request
+            )
+        shift_minutes = self.shift_minutes(request, recording)
+        return httpx.Response(
+            recording["status_code"],
+            headers=recording["headers"],
+            content=self.body(key, recording, shift_minutes),
+            request=request,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return self.handle_request(request)
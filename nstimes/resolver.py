@@ -0,0 +1,142 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+from collections import defaultdict
+from typing import Iterable
+from typing import Optional
+
+from nstimes.completion import normalize
+from nstimes.stations import get_station_codes
+from nstimes.stations import get_uic_mapping
+
+MIN_SCORE = 0.5
+PREFIX_SCORE = 0.9
+ABBREVIATION_SCORE = 0.7
+FIRST_WORD = re.compile(r"[a-z0-9]+")
+
+
+class UnknownStationError(KeyError):
+    def __init__(self, query: str, candidates: list[tuple[str, float]]) -> None:
+        super().__init__(query)
+        self.query = query
+        self.candidates = candidates
+
+
+def trigrams(normalized: str) -> set[str]:
+    padded = f"  {normalized} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def is_subsequence(needle: str, haystack: str) -> bool:
+    chars = iter(haystack)
+    return all(c in chars for c in needle)
+
+
+class StationResolver:
+    """Resolves typos and abbreviations to station names using a trigram index
+
+    Prefixes ("Den Haag C") and, for single words, abbreviations of the first
+    word ("Asd", "Ut") rank above trigram matches. Ties prefer the Centraal
+    station of a city and then the order of stations.json, which lists the
+    largest stations first.
+    """
+
+    def __init__(
+        self, names: Iterable[str], aliases: Optional[dict[str, str]] = None
+    ) -> None:
+        self.names = list(names)
+        self.exact = {normalize(name): name for name in reversed(self.names)}
+        self.exact.update(
+            (normalize(alias), name) for alias, name in (aliases or {}).items()
+        )
+        self.penalties = [
+            0.0 if name.endswith("Centraal") else 0.1 for name in self.names
+        ]
+        self.prefixes = sorted(
+            (normalize(name), rank) for rank, name in enumerate(self.names)
+        )
+        self.sizes: list[int] = []
+        self.postings: dict[str, list[int]] = defaultdict(list)
+        self.first_words: dict[str, list[tuple[int, str]]] = defaultdict(list)
+        for rank, name in enumerate(self.names):
+            normalized = normalize(name)
+            grams = trigrams(normalized)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(rank)
+            match = FIRST_WORD.search(normalized)
+            if match is not None:
+                self.first_words[match.group()[0]].append((rank, match.group()))
+
+    def candidates(self, query: str, limit: int = 5) -> list[tuple[str, float]]:
+        """Ranked (station name, score) pairs, where a score of 1.0 is an exact match"""
+        normalized = normalize(query).strip()
+        if not normalized:
+            return []
+        if normalized in self.exact:
+            return [(self.exact[normalized], 1.0)]
+        scores: dict[int, float] = {}
+        if " " not in normalized:
+            for rank, first_word in self.first_words.get(normalized[0], []):
+                if is_subsequence(normalized, first_word):
+                    scores[rank] = ABBREVIATION_SCORE - self.penalties[rank]
+        start = bisect_left(self.prefixes, (normalized, -1))
+        for prefix, rank in self.prefixes[start:]:
+            if not prefix.startswith(normalized):
+                break
+            scores[rank] = PREFIX_SCORE - self.penalties[rank]
+        grams = trigrams(normalized)
+        overlap = Counter(
+            rank for gram in grams for rank in self.postings.get(gram, [])
+        )
+        for rank, count in overlap.items():
+            dice = 2 * count / (len(grams) + self.sizes[rank])
+            scores[rank] = max(scores.get(rank, 0.0), dice)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.names[rank], score) for rank, score in ranked[:limit]]
+
+    def resolve(self, query: str, min_score: float = MIN_SCORE) -> str:
+        """Best match of `query`, raises UnknownStationError when there is none
+
+        A query matching several stations equally well, e.g. "Dt" for Delft,
+        Deventer and Dordrecht, is ambiguous and raises too, with the
+        stations it matches as candidates.
+        """
+        candidates = self.candidates(query)
+        if not candidates or candidates[0][1] < min_score:
+            raise UnknownStationError(query, candidates)
+        best_score = candidates[0][1]
+        if best_score < 1.0 and len(candidates) > 1 and candidates[1][1] == best_score:
+            raise UnknownStationError(
+                query,
+                [candidate for candidate in candidates if candidate[1] == best_score],
+            )
+        return candidates[0][0]
+
+
+_resolver: Optional[StationResolver] = None
+_source: Optional[tuple[dict[str, str], dict[str, str]]] = None
+
+
+def get_resolver() -> StationResolver:
+    """Resolver for the current station lookup, rebuilt when it is reloaded
+
+    The short codes of the stations, e.g. ASD, resolve exactly.
+    """
+    global _resolver, _source
+    uic_mapping = get_uic_mapping()
+    codes = get_station_codes()
+    if (
+        _resolver is None
+        or _source is None
+        or not all(
+            loaded is current for loaded, current in zip(_source, (uic_mapping, codes))
+        )
+    ):
+        _resolver = StationResolver(uic_mapping, aliases=codes)
+        _source = (uic_mapping, codes)
+    return _resolver
+
+
+def resolve_station(query: str) -> str:
+    return get_resolver().resolve(query)
@@ -0,0 +1,165 @@
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any
+from typing import AsyncIterator
+from typing import Optional
+
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from fastapi import HTTPException
+from fastapi import Response
+from pydantic_settings import BaseSettings
+from pydantic_settings import SettingsConfigDict
+
+from nstimes.completion import get_completion_index
+from nstimes.departure import coalescing_stats
+from nstimes.departure import DATE_FORMAT
+from nstimes.departure import get_departures_async
+from nstimes.departure import TIME_FORMAT
+from nstimes.errors import NSAPIError
+from nstimes.errors import NSAPIRateLimitError
+from nstimes.errors import NSAPITimeoutError
+from nstimes.metrics import configure_metrics
+from nstimes.metrics import Exporter
+from nstimes.metrics import get_metrics
+from nstimes.metrics import Metrics
+from nstimes.metrics import OTLPJsonExporter
+from nstimes.metrics import PrometheusExporter
+from nstimes.resolver import resolve_station
+from nstimes.resolver import UnknownStationError
+from nstimes.stations import get_uic_mapping
+from nstimes.utils import convert_to_rfc3339
+from nstimes.utils import get_async_client
+
+
+class ServerSettings(BaseSettings):
+    """Server settings, configurable as NSTIMES_SERVER_* env vars"""
+
+    model_config = SettingsConfigDict(env_prefix="NSTIMES_SERVER_")
+
+    host: str = "0.0.0.0"
+    port: int = 8000
+    # Time every request, served at /metrics
+    metrics: bool = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # NS_API_TOKEN and the settings may come from a .env file, also when the
+    # app is served by another entry point than main
+    load_dotenv()
+    # One pooled upstream client for all requests, responses are shared
+    # between requests through the response cache of httpx_get_async
+    if ServerSettings().metrics and get_metrics() is None:
+        configure_metrics(Metrics())
+    async with get_async_client() as client:
+        app.state.client = client
+        yield
+
+
+app = FastAPI(
+    title="nstimes",
+    description="Departures of the Dutch Railway Services (Nederlandse Spoorwegen)",
+    lifespan=lifespan,
+)
+
+
+@app.get("/journey")
+async def journey(
+    start: str,
+    end: str,
+    time: Optional[str] = None,
+    date: Optional[str] = None,
+) -> dict[str, Any]:
+    try:
+        start = resolve_station(start)
+        end = resolve_station(end)
+    except UnknownStationError as error:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "message": f"Station '{error.query}' does not exist",
+                "candidates": [name for name, _ in error.candidates],
+            },
+        )
+    now = datetime.now()
+    time = time or now.strftime(TIME_FORMAT)
+    date = date or now.strftime(DATE_FORMAT)
+    try:
+        rdc3339_datetime = convert_to_rfc3339(time, date)
+    except ValueError:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Expected time as {TIME_FORMAT} and date as {DATE_FORMAT}",
+        )
+    try:
+        departures = await get_departures_async(
+            start=start,
+            end=end,
+            token=os.getenv("NS_API_TOKEN", ""),
+            rdc3339_datetime=rdc3339_datetime,
+            client=app.state.client,
+        )
+    except NSAPITimeoutError:
+        raise HTTPException(status_code=504, detail="NS API request timed out")
+    except NSAPIRateLimitError as error:
+        headers = None
+        if error.retry_after is not None:
+            headers = {"Retry-After": str(int(error.retry_after))}
+        raise HTTPException(
+            status_code=503, detail="NS API quota exceeded", headers=headers
+        )
+    except NSAPIError:
+        raise HTTPException(status_code=502, detail="NS API request failed")
+    return {
+        "start": start,
+        "end": end,
+        "date_time": rdc3339_datetime,
+        "departures": [departure.as_dict() for departure in departures],
+    }
+
+
+@app.get("/stations")
+async def stations(prefix: str = "") -> list[dict[str, str]]:
+    uic_mapping = get_uic_mapping()
+    return [
+        {"name": name, "uic_code": uic_mapping[name]}
+        for name in get_completion_index().complete(prefix)
+    ]
+
+
+@app.get("/stats")
+async def stats() -> dict[str, Any]:
+    return {"coalescing": coalescing_stats()}
+
+
+EXPORTERS: dict[str, Exporter] = {
+    "prometheus": PrometheusExporter(),
+    "otlp": OTLPJsonExporter(),
+}
+
+
+@app.get("/metrics")
+async def metrics(format: str = "prometheus") -> Response:
+    """Spans and counters, in Prometheus text or OTLP/HTTP JSON format"""
+    exporter = EXPORTERS.get(format)
+    if exporter is None:
+        raise HTTPException(
+            status_code=422, detail=f"Expected format as one of {list(EXPORTERS)}"
+        )
+    collected = get_metrics()
+    if collected is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(exporter.export(collected), media_type=exporter.content_type)
+
+
+def main() -> None:
+    load_dotenv()
+    settings = ServerSettings()
+    uvicorn.run(app, host=settings.host, port=settings.port)
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import Future
+from typing import Awaitable
+from typing import Callable
+from typing import Generic
+from typing import Hashable
+from typing import TYPE_CHECKING
+from typing import TypeVar
+
+if TYPE_CHECKING:  # pragma: no cover
+    import asyncio
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Concurrent calls with the same key wait for, and share, the first call
+
+    `hits` counts the calls that were coalesced, `misses` the calls that ran.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls: dict[Hashable, Future[T]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.calls[key] = Future()
+        if future is not None:
+            return future.result()
+
+        future = self.calls[key]
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class AsyncSingleFlight(Generic[T]):
+    """Like SingleFlight, for coroutines, sharing calls within an event loop"""
+
+    def __init__(self) -> None:
+        self.calls: dict[Hashable, asyncio.Future[T]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        import asyncio
+
+        key = (asyncio.get_running_loop(), key)
+        future = self.calls.get(key)
+        if future is not None:
+            self.hits += 1
+            # A cancelled waiter must not cancel the call of the others
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.ensure_future(fn())
+        self.calls[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                del self.calls[key]
+            else:
+                future.add_done_callback(lambda _: self.calls.pop(key, None))
@@ -0,0 +1,155 @@
+import contextlib
+import json
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from functools import cache
+from typing import Any
+from typing import Iterable
+from typing import Optional
+
+from nstimes.metrics import span
+
+SCRIPT_DIR = os.path.dirname(__file__)
+STATIONS_FILE = os.path.join(SCRIPT_DIR, "stations.json")
+
+
+@dataclass
+class StationInfo:
+    code: Optional[str]
+    lat: Optional[float]
+    lng: Optional[float]
+
+
+def snapshot_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.pickle"
+
+
+def metadata_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.meta.json"
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write through a temporary file and a rename, so readers never see half of it"""
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = 0o644
+    file = tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(os.path.abspath(path)), delete=False
+    )
+    try:
+        with file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(file.name, mode)
+        os.replace(file.name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(file.name)
+        raise
+
+
+def write_stations(uic_mapping: dict[str, str], path: str = STATIONS_FILE) -> bool:
+    """Write the station lookup to `path`, returns False when it was up to date"""
+    data = json.dumps(uic_mapping).encode()
+    try:
+        with open(path, "rb") as file:
+            if file.read() == data:
+                return False
+    except OSError:
+        pass
+    atomic_write(path, data)
+    return True
+
+
+def write_snapshot(uic_mapping: dict[str, str], path: str = STATIONS_FILE) -> str:
+    """Precompile the station lookup into a pickle next to `path`"""
+    snapshot = snapshot_path(path)
+    atomic_write(snapshot, pickle.dumps(uic_mapping, protocol=pickle.HIGHEST_PROTOCOL))
+    return snapshot
+
+
+def build_metadata(
+    stations: Iterable[dict[str, Any]],
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+) -> dict[str, Any]:
+    """Side index of the codes and coordinates in a v2/stations payload
+
+    The stations are stored as columns, next to the validators (ETag and
+    Last-Modified) of the response they came from.
+    """
+    stations = list(stations)
+    return {
+        "etag": etag,
+        "last_modified": last_modified,
+        "names": [station["namen"]["lang"] for station in stations],
+        "codes": [station.get("code") for station in stations],
+        "lat": [station.get("lat") for station in stations],
+        "lng": [station.get("lng") for station in stations],
+    }
+
+
+def write_metadata(metadata: dict[str, Any], path: str = STATIONS_FILE) -> None:
+    atomic_write(metadata_path(path), json.dumps(metadata).encode())
+
+
+def read_metadata(path: str = STATIONS_FILE) -> dict[str, Any]:
+    """The side index next to `path`, empty when stations were never updated"""
+    try:
+        with open(metadata_path(path), "r", encoding="utf-8") as file:
+            metadata: dict[str, Any] = json.load(file)
+        return metadata
+    except (OSError, ValueError):
+        return {}
+
+
+def load_station_info(path: str = STATIONS_FILE) -> dict[str, StationInfo]:
+    metadata = read_metadata(path)
+    columns = [metadata.get(key, []) for key in ("names", "codes", "lat", "lng")]
+    return {
+        name: StationInfo(code=code, lat=lat, lng=lng)
+        for name, code, lat, lng in zip(*columns)
+    }
+
+
+def load_stations(path: str = STATIONS_FILE) -> dict[str, str]:
+    """Load the station lookup, preferring a snapshot that is not older than the json"""
+    snapshot = snapshot_path(path)
+    try:
+        if os.path.getmtime(snapshot) >= os.path.getmtime(path):
+            with open(snapshot, "rb") as file:
+                uic_mapping: dict[str, str] = pickle.load(file)
+            return uic_mapping
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    with open(path, "r", encoding="utf-8") as file:
+        uic_mapping = json.load(file)
+    return uic_mapping
+
+
+@cache
+def get_uic_mapping() -> dict[str, str]:
+    with span("stations.load"):
+        return load_stations(STATIONS_FILE)
+
+
+@cache
+def get_station_info() -> dict[str, StationInfo]:
+    """Codes and coordinates per station, only loaded when first needed"""
+    return load_station_info(STATIONS_FILE)
+
+
+@cache
+def get_station_codes() -> dict[str, str]:
+    """Station name per short code, e.g. ASD for Amsterdam Centraal"""
+    return {info.code: name for name, info in get_station_info().items() if info.code}
+
+
+def invalidate_station_index() -> None:
+    get_uic_mapping.cache_clear()
+    get_station_info.cache_clear()
+    get_station_codes.cache_clear()
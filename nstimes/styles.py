@@ -16,3 +16,10 @@ def strike(text: str | int) -> str:
 
 def cancelled(text: str | int) -> str:
     return red(strike(text))
+
+
+# The same styles as ANSI escape codes, for printers that bypass rich markup
+ANSI_RED = "\x1b[1;31m"
+ANSI_CYAN = "\x1b[1;36m"
+ANSI_CANCELLED = "\x1b[1;9;31m"
+ANSI_RESET = "\x1b[0m"
@@ -1,40 +1,295 @@
-import json
-import os
+import asyncio
+import atexit
 from datetime import datetime
+from typing import Any
+from typing import Optional
 
 import httpx
-import typer
+from pydantic_settings import BaseSettings
+from pydantic_settings import SettingsConfigDict
 
+from nstimes.cache import get_response_cache
+from nstimes.cache import ResponseCache
+from nstimes.departure import DATE_FORMAT
+from nstimes.departure import TIME_FORMAT
+from nstimes.errors import api_errors
+from nstimes.errors import NSAPIError
+from nstimes.metrics import count
+from nstimes.metrics import http_trace
+from nstimes.metrics import http_trace_async
+from nstimes.metrics import span
+from nstimes.ratelimit import DEFAULT_RATE
+from nstimes.ratelimit import DEFAULT_RETRIES
+from nstimes.ratelimit import RetryPolicy
+from nstimes.ratelimit import TokenBucket
+from nstimes.ratelimit import UNLIMITED
+from nstimes.stations import get_uic_mapping as get_uic_mapping
+from nstimes.stations import SCRIPT_DIR as SCRIPT_DIR
+from nstimes.stations import STATIONS_FILE as STATIONS_FILE
 
-SCRIPT_DIR = os.path.dirname(__file__)
-STATIONS_FILE = os.path.join(SCRIPT_DIR, "stations.json")
-DATE_FORMAT = "%d-%m-%Y"
-TIME_FORMAT = "%H:%M"
+API_URL = "https://gateway.apiportal.ns.nl/reisinformatie-api/api"
 
 
-def get_uic_mapping() -> dict[str, str]:
-    with open(STATIONS_FILE, "r", encoding="utf-8") as file:
-        uic_mapping: dict[str, str] = json.load(file)
-    return uic_mapping
+class ClientSettings(BaseSettings):
+    """Connection settings of the shared client, configurable as NS_API_* env vars"""
+
+    model_config = SettingsConfigDict(env_prefix="NS_API_")
+
+    base_url: str = API_URL
+    timeout: float = 10.0
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    # Requests per second and retries of transient errors, shared by all requests
+    rate_limit: float = DEFAULT_RATE
+    retries: int = DEFAULT_RETRIES
+    # Save every response in this directory, or answer requests from it offline
+    record_dir: Optional[str] = None
+    replay_dir: Optional[str] = None
+
+    def client_kwargs(self) -> dict[str, Any]:
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        kwargs = {
+            "base_url": self.base_url,
+            "timeout": self.timeout,
+            "limits": limits,
+            "http2": self.http2,
+        }
+        if self.replay_dir is not None:
+            from nstimes.replay import ReplayTransport
+
+            kwargs["transport"] = ReplayTransport(self.replay_dir)
+        elif self.record_dir is not None:
+            from nstimes.replay import RecordTransport
+
+            kwargs["transport"] = RecordTransport(
+                self.record_dir,
+                httpx.HTTPTransport(limits=limits, http2=self.http2),
+                httpx.AsyncHTTPTransport(limits=limits, http2=self.http2),
+            )
+        return kwargs
+
+
+_client: Optional[httpx.Client] = None
+_client_settings: Optional[ClientSettings] = None
+_rate_limiter: Optional[TokenBucket] = None
+_retry_policy: Optional[RetryPolicy] = None
+
+
+def configure_client(settings: ClientSettings) -> None:
+    """Use `settings` for the shared client, replacing an already open one"""
+    global _client_settings, _rate_limiter, _retry_policy
+    close_client()
+    _client_settings = settings
+    _rate_limiter = None
+    _retry_policy = None
+
+
+def configure_rate_limiter(limiter: TokenBucket) -> None:
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Rate limiter shared by all requests to the NS API"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        settings = get_client_settings()
+        # Replayed responses do not count against the quota of the NS API
+        rate = UNLIMITED if settings.replay_dir is not None else settings.rate_limit
+        _rate_limiter = TokenBucket(rate)
+    return _rate_limiter
+
+
+def configure_retry_policy(policy: RetryPolicy) -> None:
+    global _retry_policy
+    _retry_policy = policy
+
+
+def get_retry_policy() -> RetryPolicy:
+    global _retry_policy
+    _retry_policy = _retry_policy or RetryPolicy(retries=get_client_settings().retries)
+    return _retry_policy
+
+
+def get_client_settings() -> ClientSettings:
+    global _client_settings
+    _client_settings = _client_settings or ClientSettings()
+    return _client_settings
+
+
+def get_client() -> httpx.Client:
+    """Shared client that keeps connections to the NS API alive between requests"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.Client(**get_client_settings().client_kwargs())
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """New async client with the shared settings, bound to the running event loop"""
+    return httpx.AsyncClient(**get_client_settings().client_kwargs())
+
+
+@atexit.register
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
 
 
 def get_headers(token: str) -> dict[str, str]:
-    return {"Cache-Control": "no-cache", "Ocp-Apim-Subscription-Key": token}
+    return {"Ocp-Apim-Subscription-Key": token}
+
+
+def api_request(api: str, query_params: dict[str, str]) -> httpx.Request:
+    base_url = get_client_settings().base_url.rstrip("/")
+    return httpx.Request("GET", f"{base_url}/{api}", params=query_params)
+
+
+def raise_for_status(response: httpx.Response) -> None:
+    # A 304 answers a conditional request, it is not an error
+    if response.status_code != httpx.codes.NOT_MODIFIED:
+        response.raise_for_status()
+
+
+def fetch(
+    client: httpx.Client,
+    token: str,
+    query_params: dict[str, str],
+    api: str,
+    limiter: Optional[TokenBucket] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> httpx.Response:
+    """One rate limited request, raises a NSAPIError when it fails"""
+    (limiter or get_rate_limiter()).acquire()
+    trace = http_trace()
+    count("http.requests")
+    with api_errors(), span("http.request"):
+        response = client.get(
+            url=api,
+            headers={**get_headers(token), **(headers or {})},
+            params=query_params,
+            extensions={"trace": trace} if trace else None,
+        )
+        raise_for_status(response)
+    return response
+
 
+async def fetch_async(
+    client: httpx.AsyncClient,
+    token: str,
+    query_params: dict[str, str],
+    api: str,
+    limiter: Optional[TokenBucket] = None,
+) -> httpx.Response:
+    await (limiter or get_rate_limiter()).acquire_async()
+    trace = http_trace_async()
+    count("http.requests")
+    with api_errors(), span("http.request"):
+        response = await client.get(
+            url=api,
+            headers=get_headers(token),
+            params=query_params,
+            extensions={"trace": trace} if trace else None,
+        )
+        raise_for_status(response)
+    return response
 
-def httpx_get(token: str, query_params: dict[str, str], api: str) -> httpx.Response:
-    API_URL = "https://gateway.apiportal.ns.nl/reisinformatie-api/api"
+
+def httpx_get(
+    token: str,
+    query_params: dict[str, str],
+    api: str,
+    client: Optional[httpx.Client] = None,
+    use_cache: bool = True,
+    retry_policy: Optional[RetryPolicy] = None,
+    limiter: Optional[TokenBucket] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> httpx.Response:
+    """Cached, rate limited and retried request, raises a NSAPIError when it fails
+
+    Extra `headers`, e.g. for a conditional request, are only sent when the
+    response is not served from the cache.
+    """
+    client = client or get_client()
+    cache = get_response_cache() if use_cache else None
+    cached = cache.get(api, query_params) if cache is not None else None
+    if cache is not None:
+        count("cache.hits" if cached is not None else "cache.misses")
+    if cache is not None and cached is not None:
+        if not cached.is_fresh():
+            cache.revalidate(
+                api,
+                query_params,
+                lambda: fetch(client, token, query_params, api, limiter),
+            )
+        return cached.to_response(api_request(api, query_params))
+    response = (retry_policy or get_retry_policy()).call(
+        lambda: fetch(client, token, query_params, api, limiter, headers)
+    )
+    if cache is not None:
+        cache.set(api, query_params, response)
+    return response
+
+
+_revalidations: set["asyncio.Task[None]"] = set()
+
+
+async def revalidate_async(
+    cache: ResponseCache, token: str, query_params: dict[str, str], api: str
+) -> None:
     try:
-        with httpx.Client() as client:
-            response = client.get(
-                url=f"{API_URL}/{api}", headers=get_headers(token), params=query_params
+        # The client of the original request may be closed before this finishes
+        async with get_async_client() as client:
+            cache.set(
+                api, query_params, await fetch_async(client, token, query_params, api)
+            )
+    except NSAPIError:
+        pass
+    finally:
+        cache.finish_revalidation(api, query_params)
+
+
+async def httpx_get_async(
+    token: str,
+    query_params: dict[str, str],
+    api: str,
+    client: Optional[httpx.AsyncClient] = None,
+    use_cache: bool = True,
+    retry_policy: Optional[RetryPolicy] = None,
+    limiter: Optional[TokenBucket] = None,
+) -> httpx.Response:
+    cache = get_response_cache() if use_cache else None
+    cached = cache.get(api, query_params) if cache is not None else None
+    if cache is not None:
+        count("cache.hits" if cached is not None else "cache.misses")
+    if cache is not None and cached is not None:
+        if not cached.is_fresh() and cache.start_revalidation(api, query_params):
+            task = asyncio.create_task(
+                revalidate_async(cache, token, query_params, api)
+            )
+            _revalidations.add(task)
+            task.add_done_callback(_revalidations.discard)
+        return cached.to_response(api_request(api, query_params))
+    if client is None:
+        async with get_async_client() as client:
+            return await httpx_get_async(
+                token, query_params, api, client, use_cache, retry_policy, limiter
             )
-            response.raise_for_status()
-            return response
-    except httpx.ReadTimeout:
-        raise typer.Exit(2)
-    except httpx.HTTPStatusError:
-        raise typer.Exit(1)
+    async_client = client
+    response = await (retry_policy or get_retry_policy()).call_async(
+        lambda: fetch_async(async_client, token, query_params, api, limiter)
+    )
+    if cache is not None:
+        cache.set(api, query_params, response)
+    return response
 
 
 def convert_to_rfc3339(time: str, date: str) -> str:
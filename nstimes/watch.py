@@ -0,0 +1,166 @@
+import dataclasses
+import time
+from datetime import datetime
+from typing import Callable
+from typing import Hashable
+from typing import Iterable
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from nstimes.departure import Departure
+from nstimes.departure import minutes_left
+from nstimes.printers import create_table
+from nstimes.printers import table_row
+from nstimes.styles import red
+
+if TYPE_CHECKING:  # pragma: no cover
+    from rich.table import Table
+
+DEFAULT_INTERVAL = 30.0
+# Poll twice as often once the first train leaves within this many minutes
+SOON_MINUTES = 5
+# Back off up to this many times the interval while nothing changes
+MAX_BACKOFF = 4
+# Seconds between updates of the minutes left on the board, without polling
+COUNTDOWN_INTERVAL = 60.0
+
+
+def row_key(departure: Departure) -> Hashable:
+    """Identifies a train across polls, whatever its delay or platform"""
+    return (departure.train_type, departure.departure_time.planned)
+
+
+def row_state(departure: Departure) -> Hashable:
+    """What the API tells about a departure, a row is redrawn when it changes
+
+    The minutes left are not part of it, they count down by themselves and
+    are updated by DepartureBoard.tick.
+    """
+    return (
+        departure.platform,
+        departure.departure_time.actual,
+        departure.arrival_time.actual,
+        departure.cancelled,
+    )
+
+
+class DepartureBoard:
+    """Departure table that only re-renders the rows that changed between polls"""
+
+    def __init__(self, title: str = "") -> None:
+        self.title = title
+        self.states: dict[Hashable, Hashable] = {}
+        self.rows: dict[Hashable, tuple[str, ...]] = {}
+        self.departures: dict[Hashable, Departure] = {}
+        self.error: Optional[str] = None
+
+    def update(self, departures: Iterable[Departure]) -> int:
+        """Replace the departures on the board, returns the number of changed rows"""
+        states: dict[Hashable, Hashable] = {}
+        rows: dict[Hashable, tuple[str, ...]] = {}
+        shown: dict[Hashable, Departure] = {}
+        changed = 0
+        for departure in departures:
+            key = row_key(departure)
+            states[key] = row_state(departure)
+            if self.states.get(key) == states[key]:
+                rows[key] = self.rows[key]
+                shown[key] = self.departures[key]
+            else:
+                rows[key] = table_row(departure)
+                shown[key] = departure
+                changed += 1
+        # Departed trains and a new order count as changes too
+        changed += len(self.rows.keys() - rows.keys())
+        if not changed and list(rows) != list(self.rows):
+            changed = 1
+        self.states = states
+        self.rows = rows
+        self.departures = shown
+        return changed
+
+    def tick(self, reference_time: datetime) -> bool:
+        """Count the minutes left down to `reference_time`, True if any row changed"""
+        changed = False
+        for key, departure in self.departures.items():
+            time_left = minutes_left(departure.departure_time.actual, reference_time)
+            if time_left != departure.time_left_minutes:
+                departure = dataclasses.replace(departure, time_left=time_left)
+                self.departures[key] = departure
+                self.rows[key] = table_row(departure)
+                changed = True
+        return changed
+
+    def render(self) -> "Table":
+        table = create_table(self.title)
+        for row in self.rows.values():
+            table.add_row(*row)
+        if self.error is not None:
+            from rich.markup import escape
+
+            table.caption = red(escape(self.error))
+        return table
+
+
+class PollSchedule:
+    """Seconds to wait between polls
+
+    Polls every `interval` seconds, twice as often when the first train leaves
+    within SOON_MINUTES, and doubles the wait, up to MAX_BACKOFF times the
+    interval, for every poll in a row that changed nothing.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL) -> None:
+        self.interval = interval
+        self.backoff = 1
+
+    def next_delay(self, changed: bool, departures: list[Departure]) -> float:
+        self.backoff = 1 if changed else min(self.backoff * 2, MAX_BACKOFF)
+        if departures and departures[0].time_left_minutes < SOON_MINUTES:
+            return self.interval / 2
+        return self.interval * self.backoff
+
+
+def watch(
+    board: DepartureBoard,
+    fetch: Callable[[datetime], list[Departure]],
+    on_change: Callable[[DepartureBoard], None],
+    schedule: Optional[PollSchedule] = None,
+    polls: Optional[int] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], datetime] = datetime.now,
+) -> None:
+    """Poll `fetch` with the current time and update `board` until `polls` ran
+
+    A failed poll keeps the last departures on the board, shows the error
+    and counts as a poll that changed nothing. Between polls the minutes
+    left are counted down every COUNTDOWN_INTERVAL seconds.
+    """
+    from nstimes.errors import NSAPIError
+
+    schedule = schedule or PollSchedule()
+    departures: list[Departure] = []
+    count = 0
+    while polls is None or count < polls:
+        moment = clock()
+        try:
+            departures = fetch(moment)
+        except NSAPIError as error:
+            changed = 0
+            redraw = board.error != str(error)
+            board.error = str(error)
+        else:
+            changed = board.update(departures)
+            redraw = bool(changed) or board.error is not None
+            board.error = None
+        if board.tick(moment) or redraw:
+            on_change(board)
+        count += 1
+        if polls is None or count < polls:
+            delay = schedule.next_delay(bool(changed), departures)
+            while delay > 0:
+                step = min(delay, COUNTDOWN_INTERVAL)
+                sleep(step)
+                delay -= step
+                if delay > 0 and board.tick(clock()):
+                    on_change(board)
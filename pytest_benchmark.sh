@@ -0,0 +1,3 @@
+#! /bin/bash
+# Saves every run to .benchmarks/ and compares it with the previous one
+poetry run pytest benchmarks --benchmark-autosave --benchmark-compare --benchmark-compare-fail=mean:25% "$@"
@@ -0,0 +1,64 @@
+from typing import Iterator
+
+import pytest
+
+from nstimes.cache import configure_response_cache
+from nstimes.cache import ResponseCache
+from nstimes.history import configure_history_store
+from nstimes.metrics import configure_metrics
+from nstimes.ratelimit import RetryPolicy
+from nstimes.ratelimit import TokenBucket
+from nstimes.ratelimit import UNLIMITED
+from nstimes.utils import ClientSettings
+from nstimes.utils import configure_client
+from nstimes.utils import configure_rate_limiter
+from nstimes.utils import configure_retry_policy
+
+
+@pytest.fixture(autouse=True)
+def api_token(monkeypatch: pytest.MonkeyPatch) -> str:
+    """Commands get a token without one in the environment, no test needs a real one"""
+    monkeypatch.setenv("NS_API_TOKEN", "test-token")
+    return "test-token"
+
+
+@pytest.fixture(autouse=True)
+def response_cache() -> ResponseCache:
+    """Every test starts with an empty in-memory response cache"""
+    cache = ResponseCache()
+    configure_response_cache(cache)
+    return cache
+
+
+async def no_sleep(seconds: float) -> None:
+    pass
+
+
+@pytest.fixture(autouse=True)
+def client_settings() -> Iterator[ClientSettings]:
+    """Tests that record or replay do not leave their transport behind"""
+    settings = ClientSettings()
+    configure_client(settings)
+    yield settings
+    configure_client(ClientSettings())
+
+
+@pytest.fixture(autouse=True)
+def retry_policy(client_settings: ClientSettings) -> RetryPolicy:
+    """Requests are retried without waiting, and not rate limited"""
+    policy = RetryPolicy(sleep=lambda seconds: None, async_sleep=no_sleep)
+    configure_retry_policy(policy)
+    configure_rate_limiter(TokenBucket(rate=UNLIMITED))
+    return policy
+
+
+@pytest.fixture(autouse=True)
+def no_history() -> None:
+    """Fetched departures are not recorded, unless a test configures a store"""
+    configure_history_store(None)
+
+
+@pytest.fixture(autouse=True)
+def no_metrics() -> None:
+    """Metrics are disabled, unless a test or the server enables them"""
+    configure_metrics(None)
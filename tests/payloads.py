@@ -0,0 +1,87 @@
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import Optional
+
+from nstimes.departure import DATETIME_FORMAT_STRING
+
+
+def ns_time(value: datetime) -> str:
+    return value.astimezone().strftime(DATETIME_FORMAT_STRING)
+
+
+def trip(
+    departure: datetime,
+    delay_minutes: int = 0,
+    duration_minutes: int = 30,
+    train_type: str = "IC",
+    track: Optional[str] = "5b",
+    cancelled: bool = False,
+) -> dict[str, Any]:
+    actual = departure + timedelta(minutes=delay_minutes)
+    arrival = departure + timedelta(minutes=duration_minutes)
+    origin: dict[str, Any] = {
+        "plannedDateTime": ns_time(departure),
+        "actualDateTime": ns_time(actual),
+    }
+    if track is not None:
+        origin["plannedTrack"] = track
+    leg: dict[str, Any] = {
+        "origin": origin,
+        "destination": {
+            "plannedDateTime": ns_time(arrival),
+            "actualDateTime": ns_time(arrival + timedelta(minutes=delay_minutes)),
+        },
+        "product": {"categoryCode": train_type},
+    }
+    if cancelled:
+        leg["cancelled"] = True
+    return {"legs": [leg]}
+
+
+def trips_payload(count: int = 3, start: Optional[datetime] = None) -> dict[str, Any]:
+    start = start or datetime.now() + timedelta(minutes=5)
+    return {"trips": [trip(start + timedelta(minutes=15 * i)) for i in range(count)]}
+
+
+def multi_leg_trip(
+    departure: datetime,
+    margins: list[int],
+    leg_minutes: int = 20,
+    train_types: Optional[list[str]] = None,
+) -> dict[str, Any]:
+    """A trip with a transfer of `margins[i]` minutes after the i-th leg"""
+    train_types = train_types or ["IC"] * (len(margins) + 1)
+    legs = []
+    for index, train_type in enumerate(train_types):
+        leg = trip(departure, duration_minutes=leg_minutes, train_type=train_type)
+        leg = leg["legs"][0]
+        leg["origin"]["name"] = f"Station {index}"
+        leg["destination"]["name"] = f"Station {index + 1}"
+        leg["destination"]["plannedTrack"] = str(index + 1)
+        legs.append(leg)
+        if index < len(margins):
+            departure += timedelta(minutes=leg_minutes + margins[index])
+    return {"legs": legs}
+
+
+def station_departure(
+    departure: datetime,
+    direction: str,
+    route_stations: list[str],
+    train_type: str = "IC",
+    track: str = "5",
+) -> dict[str, Any]:
+    """A departure of v2/departures, calling at the UIC codes in `route_stations`"""
+    return {
+        "direction": direction,
+        "plannedDateTime": ns_time(departure),
+        "actualDateTime": ns_time(departure),
+        "plannedTrack": track,
+        "product": {"categoryCode": train_type},
+        "routeStations": [{"uicCode": code} for code in route_stations],
+    }
+
+
+def departures_payload(departures: list[dict[str, Any]]) -> dict[str, Any]:
+    return {"payload": {"source": "PPV", "departures": departures}}
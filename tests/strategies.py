@@ -8,7 +8,7 @@ from hypothesis import strategies as st
 
 from nstimes.departure import Departure
 from nstimes.departure import Time
-from nstimes.utils import STATIONS_FILE
+from nstimes.stations import STATIONS_FILE
 
 # Define a Hypothesis strategy for generating times in the format "HH:MM"
 time_strategy: st.SearchStrategy[datetime] = st.datetimes(
@@ -40,6 +40,7 @@ def departure_strategy(draw: st.DrawFn) -> st.SearchStrategy[Departure]:
         platform="14b",
         departure_time=departure_time,
         arrival_time=arrival_time,
+        transfers=draw(st.integers(min_value=0, max_value=3)),
     )
 
 
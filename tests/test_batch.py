@@ -0,0 +1,114 @@
+import json
+import tempfile
+from pathlib import Path
+
+from pytest_httpx import HTTPXMock
+from typer.testing import CliRunner
+
+from nstimes.batch import BatchRunner
+from nstimes.batch import checkpoint_path
+from nstimes.batch import errors_path
+from nstimes.batch import read_checkpoint
+from nstimes.main import app
+from tests.payloads import trips_payload
+
+runner = CliRunner()
+ROUTES = "start,end,date,time\nAsd,Ut,15-10-2023,12:00\nUt,Amf,,\nNowhere,Ut,,\n"
+
+
+def write_routes(directory: str, routes: str = ROUTES) -> str:
+    path = Path(directory) / "routes.csv"
+    path.write_text(routes, encoding="utf-8")
+    return str(path)
+
+
+def read_results(path: str) -> dict[int, dict]:  # type: ignore
+    with open(path, encoding="utf-8") as file:
+        return {result["row"]: result for result in map(json.loads, file)}
+
+
+def test_batch_writes_results_and_resumes(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=2))
+    httpx_mock.add_response(json=trips_payload(count=2))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output = str(Path(temp_dir) / "results.jsonl")
+        result = runner.invoke(
+            app,
+            ["batch", "--input", write_routes(temp_dir), "--output", output],
+        )
+        assert result.exit_code == 0
+        results = read_results(output)
+        assert len(results[0]["departures"]) == 2
+        assert len(results[1]["departures"]) == 2
+        assert results[2]["error"] == "Station 'Nowhere' does not exist"
+        assert read_checkpoint(checkpoint_path(output)) == {0, 1, 2}
+
+        # Nothing is requested again
+        summary = BatchRunner(token="x").run(write_routes(temp_dir), output)
+        assert summary.skipped == 3
+        assert len(read_results(output)) == 3
+
+
+def test_batch_retries_rate_limited_requests(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(status_code=429)
+    httpx_mock.add_response(json=trips_payload(count=1))
+    sleeps: list[float] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output = str(Path(temp_dir) / "results.jsonl")
+        routes = write_routes(temp_dir, "start,end\nAsd,Ut\n")
+        summary = BatchRunner(token="x", sleep=sleeps.append).run(routes, output)
+        assert summary.done == 1
+        assert len(sleeps) == 1 and 0.5 <= sleeps[0] <= 1.0
+
+
+def test_batch_does_not_checkpoint_transient_failures(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(status_code=429)
+    httpx_mock.add_response(status_code=429)
+    httpx_mock.add_response(json=trips_payload(count=1))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output = str(Path(temp_dir) / "results.jsonl")
+        routes = write_routes(temp_dir, "start,end\nAsd,Ut\n")
+        runner = BatchRunner(token="x", retries=1, sleep=lambda _: None)
+        summary = runner.run(routes, output)
+        assert summary.failed == 1
+        assert Path(output).read_text(encoding="utf-8") == ""
+        assert "429" in read_results(errors_path(output))[0]["error"]
+        assert read_checkpoint(checkpoint_path(output)) == set()
+
+        # Resuming writes the row to the output once
+        assert runner.run(routes, output).done == 1
+        lines = Path(output).read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 1
+        assert len(json.loads(lines[0])["departures"]) == 1
+
+
+def test_batch_records_unexpected_responses_per_row(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(content=b"not json")
+    httpx_mock.add_response(json={"no trips": []})
+    httpx_mock.add_response(json=trips_payload(count=1))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output = str(Path(temp_dir) / "results.jsonl")
+        routes = write_routes(temp_dir, "start,end\nAsd,Ut\nUt,Amf\nAmf,Ut\n")
+        runner = BatchRunner(token="x", concurrency=1, sleep=lambda _: None)
+        summary = runner.run(routes, output)
+        assert summary.failed == 2 and summary.done == 1
+        assert read_checkpoint(checkpoint_path(output)) == {0, 1, 2}
+        results = read_results(output)
+        for row in [0, 1]:
+            assert results[row]["error"].startswith("Unexpected response")
+            assert "departures" not in results[row]
+        assert len(results[2]["departures"]) == 1
+
+
+def test_batch_resume_skips_rows_missing_from_the_checkpoint(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(json=trips_payload(count=1))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output = str(Path(temp_dir) / "results.jsonl")
+        routes = write_routes(temp_dir, "start,end\nAsd,Ut\nUt,Amf\n")
+        # The batch stopped after writing row 0 but before checkpointing it
+        Path(output).write_text(json.dumps({"row": 0, "departures": []}) + "\n")
+        summary = BatchRunner(token="x").run(routes, output)
+        assert summary.skipped == 1 and summary.done == 1
+        assert sorted(read_results(output)) == [0, 1]
@@ -0,0 +1,82 @@
+from datetime import datetime
+from datetime import timedelta
+
+from pytest_httpx import HTTPXMock
+from typer.testing import CliRunner
+
+from nstimes.board import get_station_board
+from nstimes.board import parse_board_departures
+from nstimes.main import app
+from tests.payloads import departures_payload
+from tests.payloads import station_departure
+
+AMERSFOORT = "8400055"
+UTRECHT = "8400621"
+
+runner = CliRunner()
+
+
+def board_payload() -> dict:  # type: ignore
+    start = datetime.now() + timedelta(minutes=5)
+    return departures_payload(
+        [
+            station_departure(start, "Zwolle", [UTRECHT, AMERSFOORT]),
+            station_departure(start + timedelta(minutes=3), "Utrecht Centraal", []),
+            station_departure(start + timedelta(minutes=9), "Rotterdam Centraal", []),
+            station_departure(
+                start + timedelta(minutes=15), "Amersfoort Centraal", [UTRECHT], "SPR"
+            ),
+        ]
+    )
+
+
+def test_board_answers_every_destination_from_one_request(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(json=board_payload())
+    board = get_station_board("Amsterdam Centraal", token="x", use_cache=False)
+
+    assert [d.direction for d in board.to("Utrecht Centraal")] == [
+        "Zwolle",
+        "Utrecht Centraal",
+        "Amersfoort Centraal",
+    ]
+    assert [d.train_type for d in board.to("Amersfoort Centraal")] == ["IC", "SPR"]
+    assert len(board.to("Utrecht Centraal", limit=1)) == 1
+    assert board.to("Zwolle")[0].stops[-1] == "8400747"
+    assert board.to("Schiphol Airport") == []
+    assert len(httpx_mock.get_requests()) == 1
+    assert httpx_mock.get_requests()[0].url.params["uicCode"] == "8400058"
+
+
+def test_board_is_cached_per_station(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=board_payload())
+    for _ in range(3):
+        get_station_board("Amsterdam Centraal", token="x", rdc3339_datetime="t")
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_board_skips_departed_trains() -> None:
+    now = datetime.now()
+    payload = departures_payload(
+        [
+            station_departure(now - timedelta(minutes=5), "Zwolle", []),
+            station_departure(now + timedelta(minutes=5), "Zwolle", []),
+        ]
+    )
+    departures = list(parse_board_departures(payload["payload"]["departures"]))
+    assert len(departures) == 1
+    assert departures[0].as_dict()["direction"] == "Zwolle"
+
+
+def test_board_command(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=board_payload())
+    result = runner.invoke(
+        app,
+        ["board", "--station", "Asd", "--to", "Amf", "--to", "Schiphol", "--to", "Ut"],
+        env={"COLUMNS": "200"},
+    )
+    assert result.exit_code == 0
+    assert result.stdout.count("Amersfoort Centraal") >= 2
+    assert "no direct trains" in result.stdout
+    assert len(httpx_mock.get_requests()) == 1
@@ -0,0 +1,115 @@
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from pytest_httpx import HTTPXMock
+
+from nstimes.cache import cache_key
+from nstimes.cache import CachedResponse
+from nstimes.cache import CachePolicy
+from nstimes.cache import DiskCache
+from nstimes.cache import MemoryCache
+from nstimes.cache import ResponseCache
+from nstimes.errors import NSAPIStatusError
+from nstimes.utils import httpx_get
+
+QUERY = {"originUicCode": "8400058", "destinationUicCode": "8400621"}
+
+
+def test_cache_key_ignores_param_order() -> None:
+    assert cache_key("v3/trips", {"a": "1", "b": "2"}) == cache_key(
+        "v3/trips", {"b": "2", "a": "1"}
+    )
+
+
+def test_repeated_requests_are_served_from_cache(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json={"trips": []})
+    first = httpx_get(token="x", query_params=QUERY, api="v3/trips")
+    second = httpx_get(
+        token="x", query_params=dict(reversed(QUERY.items())), api="v3/trips"
+    )
+    assert second.json() == first.json() == {"trips": []}
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_use_cache_false_bypasses_cache(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json={"trips": []})
+    httpx_mock.add_response(json={"trips": []})
+    httpx_get(token="x", query_params=QUERY, api="v3/trips", use_cache=False)
+    httpx_get(token="x", query_params=QUERY, api="v3/trips", use_cache=False)
+    assert len(httpx_mock.get_requests()) == 2
+
+
+def test_errors_are_not_cached(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(status_code=500)
+    httpx_mock.add_response(json={"trips": []})
+    with pytest.raises(NSAPIStatusError):
+        httpx_get(token="x", query_params=QUERY, api="v3/trips")
+    assert httpx_get(token="x", query_params=QUERY, api="v3/trips").json() == {
+        "trips": []
+    }
+
+
+def test_stale_response_is_served_while_revalidating(
+    httpx_mock: HTTPXMock, response_cache: ResponseCache
+) -> None:
+    response_cache.policies = {"v3/trips": CachePolicy(ttl=0, stale=60)}
+    response_cache.set("v3/trips", QUERY, httpx.Response(200, json={"trips": []}))
+    httpx_mock.add_response(json={"trips": ["fresh"]})
+
+    assert httpx_get(token="x", query_params=QUERY, api="v3/trips").json() == {
+        "trips": []
+    }
+    for _ in range(100):
+        if not response_cache.revalidating:
+            break
+        time.sleep(0.01)
+    entry = response_cache.get("v3/trips", QUERY)
+    assert entry is not None
+    assert entry.to_response().json() == {"trips": ["fresh"]}
+
+
+def test_expired_response_is_not_served(response_cache: ResponseCache) -> None:
+    response_cache.policies = {"v3/trips": CachePolicy(ttl=0, stale=0)}
+    response_cache.set("v3/trips", QUERY, httpx.Response(200, json={}))
+    assert response_cache.get("v3/trips", QUERY) is None
+
+
+def test_memory_cache_evicts_least_recently_used() -> None:
+    cache = ResponseCache(memory=MemoryCache(max_entries=2))
+    for origin in ["1", "2", "3"]:
+        cache.set("v3/trips", {"originUicCode": origin}, httpx.Response(200))
+    assert cache.get("v3/trips", {"originUicCode": "1"}) is None
+    assert cache.get("v3/trips", {"originUicCode": "3"}) is not None
+
+
+def test_disk_cache_survives_restart() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "cache" / "responses.sqlite3")
+        disk = DiskCache(path)
+        ResponseCache(disk=disk).set(
+            "v2/stations", {"countryCodes": "nl"}, httpx.Response(200, json=[1])
+        )
+        disk.close()
+
+        disk = DiskCache(path)
+        entry = ResponseCache(disk=disk).get("v2/stations", {"countryCodes": "nl"})
+        disk.close()
+        assert entry is not None
+        assert entry.to_response().json() == [1]
+
+
+def test_disk_cache_purges_unusable_responses() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        disk = DiskCache(str(Path(temp_dir) / "responses.sqlite3"))
+        policy = CachePolicy(ttl=30, stale=60)
+        expired = CachedResponse(200, [], b"", time.time() - 91, policy)
+        disk.set("v3/trips?dateTime=old", expired)
+        disk.set(
+            "v3/trips?dateTime=new", CachedResponse(200, [], b"", time.time(), policy)
+        )
+        assert disk.get("v3/trips?dateTime=old") is None
+        assert disk.get("v3/trips?dateTime=new") is not None
+        disk.close()
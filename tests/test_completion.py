@@ -0,0 +1,78 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from nstimes.completion import CompletionIndex
+from nstimes.completion import get_completion_index
+from nstimes.completion import load_index_snapshot
+from nstimes.completion import normalize
+from nstimes.completion import reset_completion_index
+from nstimes.completion import write_index_snapshot
+
+
+def test_normalize_strips_case_and_accents() -> None:
+    assert normalize("Mariënberg") == "marienberg"
+    assert normalize("Feanwâlden") == "feanwalden"
+
+
+def test_completion_prefix_before_infix() -> None:
+    index = CompletionIndex(["Utrecht Centraal", "Amsterdam Centraal", "Centrum"])
+    assert index.complete("Utr") == ["Utrecht Centraal"]
+    assert index.complete("cent") == [
+        "Centrum",
+        "Utrecht Centraal",
+        "Amsterdam Centraal",
+    ]
+    assert index.complete("centraal") == ["Utrecht Centraal", "Amsterdam Centraal"]
+    assert index.complete("z") == []
+
+
+def test_completion_infix_fallback() -> None:
+    index = CompletionIndex(["Utrecht Centraal", "Amsterdam Centraal"])
+    assert index.complete("traal") == ["Utrecht Centraal", "Amsterdam Centraal"]
+    assert index.complete("") == ["Utrecht Centraal", "Amsterdam Centraal"]
+
+
+def test_completion_on_stations() -> None:
+    index = get_completion_index()
+    assert index is get_completion_index()
+    assert index.complete("marien") == ["Mariënberg"]
+    assert "'s-Hertogenbosch" in index.complete("hertogen")
+    assert index.complete("Utrecht C") == ["Utrecht Centraal"]
+
+
+def test_completion_index_from_snapshot_skips_the_stations(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def unexpected() -> None:
+        raise AssertionError("the stations are read")
+
+    snapshot = CompletionIndex(["Utrecht Centraal"])
+    monkeypatch.setattr("nstimes.completion.load_index_snapshot", lambda: snapshot)
+    monkeypatch.setattr("nstimes.completion.get_uic_mapping", unexpected)
+    monkeypatch.setattr("nstimes.completion.get_station_codes", unexpected)
+    reset_completion_index()
+    try:
+        assert get_completion_index() is snapshot
+    finally:
+        reset_completion_index()
+
+
+def test_index_snapshot_is_loaded_when_fresh() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "stations.json")
+        Path(path).write_text('{"Utrecht Centraal": "8400621"}', encoding="utf-8")
+        assert load_index_snapshot(path) is None
+        snapshot = write_index_snapshot(
+            CompletionIndex(["Utrecht Centraal"], aliases={"UT": "Utrecht Centraal"}),
+            path,
+        )
+        index = load_index_snapshot(path)
+        assert index is not None
+        assert index.complete("ut") == ["Utrecht Centraal"]
+
+        # Stations that are newer than the snapshot need a new index
+        os.utime(snapshot, (0, 0))
+        assert load_index_snapshot(path) is None
@@ -1,11 +1,31 @@
+import asyncio
 from datetime import datetime
 from datetime import timedelta
+from datetime import timezone
+from typing import Iterator
 
+import httpx
 from hypothesis import given
+from hypothesis import strategies as st
+from pytest_httpx import HTTPXMock
 
+from nstimes.departure import DATETIME_FORMAT_STRING
 from nstimes.departure import Departure
+from nstimes.departure import DepartureTable
+from nstimes.departure import get_departures
+from nstimes.departure import get_departures_async
+from nstimes.departure import get_departures_batch
+from nstimes.departure import parse_datetime
+from nstimes.departure import parse_departures
+from nstimes.departure import set_time_left
 from nstimes.departure import Time
+from nstimes.departure import TripFilter
+from nstimes.utils import API_URL
+from tests.payloads import multi_leg_trip
+from tests.payloads import trip
+from tests.payloads import trips_payload
 from tests.strategies import delay_strategy
+from tests.strategies import departure_strategy
 from tests.strategies import time_strategy
 
 
@@ -47,3 +67,180 @@ def test_departure_minutes_left(delay: int, time_now: datetime) -> None:
     )
     assert departure.calc_time_left_minutes(reference_time=time_now) == delay
     assert departure.departure_time.delay_minutes == delay
+
+
+def test_get_departures_async(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=2))
+    departures = asyncio.run(
+        get_departures_async(
+            start="Amsterdam Centraal",
+            end="Utrecht Centraal",
+            token="x",
+            rdc3339_datetime="2023-10-15T12:19:00",
+        )
+    )
+    assert [d.train_type for d in departures] == ["IC", "IC"]
+
+
+def test_get_departures_batch_keeps_query_order(httpx_mock: HTTPXMock) -> None:
+    for count in range(1, 5):
+        httpx_mock.add_response(
+            json=trips_payload(count=count),
+            url=httpx.URL(
+                f"{API_URL}/v3/trips",
+                params={
+                    "originUicCode": "8400058",
+                    "destinationUicCode": "8400621",
+                    "dateTime": f"2023-10-15T12:1{count}:00",
+                },
+            ),
+        )
+    queries = [
+        ("Amsterdam Centraal", "Utrecht Centraal", f"2023-10-15T12:1{count}:00")
+        for count in range(1, 5)
+    ]
+    results = asyncio.run(get_departures_batch(queries, token="x", concurrency=2))
+    assert [len(departures) for departures in results] == [1, 2, 3, 4]
+
+
+def test_parse_departures_skips_past_and_stops_at_max_len() -> None:
+    now = datetime.now()
+    trips = [
+        trip(now - timedelta(minutes=10)),
+        trip(now + timedelta(minutes=5)),
+        trip(now + timedelta(minutes=20)),
+        {"legs": "never parsed"},
+    ]
+    departures = parse_departures(trips, max_len=2)
+    assert isinstance(departures, Iterator)
+    assert len(list(departures)) == 2
+    assert list(parse_departures(trips, max_len=0)) == []
+
+
+def test_parse_departures_uses_one_reference_time() -> None:
+    reference_time = datetime.now().astimezone().replace(second=0, microsecond=0)
+    trips = [trip(reference_time + timedelta(minutes=m)) for m in (-1, 3, 12)]
+    departures = list(parse_departures(trips, reference_time=reference_time))
+    assert [departure.time_left for departure in departures] == [3, 12]
+    assert [departure.time_left_minutes for departure in departures] == [3, 12]
+
+
+def test_time_left_is_not_frozen_at_import() -> None:
+    reference_time = datetime.now().astimezone()
+    departure_time = Time(
+        planned=reference_time, actual=reference_time + timedelta(minutes=30)
+    )
+    departure = Departure(
+        train_type="IC",
+        platform="1",
+        departure_time=departure_time,
+        arrival_time=departure_time,
+    )
+    assert departure.time_left is None
+    assert departure.time_left_minutes in (29, 30)
+
+    set_time_left([departure], reference_time=reference_time - timedelta(hours=1))
+    assert departure.time_left_minutes == 90
+
+
+def test_get_departures_respects_max_len(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=5))
+    departures = get_departures(
+        start="Amsterdam Centraal",
+        end="Utrecht Centraal",
+        token="x",
+        rdc3339_datetime="2023-10-15T12:19:00",
+        max_len=3,
+    )
+    assert len(departures) == 3
+
+
+@given(
+    time=time_strategy,
+    offset_minutes=st.integers(min_value=-12 * 60, max_value=14 * 60),
+)
+def test_parse_datetime_matches_strptime(time: datetime, offset_minutes: int) -> None:
+    value = time.replace(
+        microsecond=0, tzinfo=timezone(timedelta(minutes=offset_minutes))
+    ).strftime(DATETIME_FORMAT_STRING)
+    assert parse_datetime(value) == datetime.strptime(value, DATETIME_FORMAT_STRING)
+    assert parse_datetime(value).utcoffset() == timedelta(minutes=offset_minutes)
+
+
+def test_departure_has_no_instance_dict() -> None:
+    time = Time(planned=datetime(2023, 10, 15, 12, 19))
+    departure = Departure(
+        train_type="IC", platform="5b", departure_time=time, arrival_time=time
+    )
+    assert not hasattr(departure, "__dict__")
+    assert not hasattr(time, "__dict__")
+
+
+@given(departures=st.lists(departure_strategy(), max_size=20))
+def test_departure_table_round_trip(departures: list[Departure]) -> None:
+    table = DepartureTable(departures)
+    assert len(table) == len(departures)
+    for stored, departure in zip(table, departures):
+        assert stored.as_dict() == departure.as_dict()
+        assert (
+            stored.departure_time.delay_minutes
+            == departure.departure_time.delay_minutes
+        )
+
+
+def test_departure_table_keeps_utc_offsets() -> None:
+    departures = list(parse_departures(trips_payload(count=3)["trips"]))
+    table = DepartureTable(departures)
+    assert [d.as_dict() for d in table] == [d.as_dict() for d in departures]
+    assert table.strings == ["IC", "5b"]
+
+
+def test_multi_leg_trip_arrives_with_its_last_leg() -> None:
+    start = datetime.now().astimezone().replace(second=0, microsecond=0)
+    trips = [
+        multi_leg_trip(
+            start + timedelta(minutes=5), [4, 7], train_types=["IC", "SPR", "IC"]
+        )
+    ]
+    (departure,) = parse_departures(trips, reference_time=start)
+    assert departure.transfers == 2
+    assert departure.train_type == "IC"
+    assert departure.arrival_time.planned == start + timedelta(minutes=5 + 3 * 20 + 11)
+
+    itinerary = departure.itinerary
+    assert itinerary is not None
+    assert itinerary._legs is None
+    assert [leg.train_type for leg in itinerary.legs] == ["IC", "SPR", "IC"]
+    assert itinerary.transfer_margins == [4, 7]
+    assert itinerary.duration_minutes == 3 * 20 + 11
+    assert [leg.arrival_platform for leg in itinerary.legs] == ["1", "2", "3"]
+    assert itinerary.legs[1].origin == "Station 1"
+
+
+def test_cancelled_transfer_cancels_the_trip() -> None:
+    start = datetime.now() + timedelta(minutes=5)
+    payload = multi_leg_trip(start, [5])
+    payload["legs"][1]["cancelled"] = True
+    (departure,) = parse_departures([payload])
+    assert departure.cancelled
+
+
+def test_trip_filter_runs_before_parsing() -> None:
+    start = datetime.now() + timedelta(minutes=5)
+    trips = [
+        trip(start),
+        multi_leg_trip(start, [2]),
+        multi_leg_trip(start, [8]),
+        multi_leg_trip(start, [8, 8]),
+        # Too many transfers, its times are never looked at
+        {"legs": [{}, {}, {}, {}]},
+    ]
+
+    def transfers(trip_filter: TripFilter) -> list[int]:
+        departures = parse_departures(trips, trip_filter=trip_filter)
+        return [departure.transfers for departure in departures]
+
+    assert not TripFilter()
+    assert transfers(TripFilter(max_transfers=0)) == [0]
+    assert transfers(TripFilter(max_transfers=2, min_transfer_minutes=5)) == [0, 1, 2]
+    assert transfers(TripFilter(max_transfers=1, min_transfer_minutes=0)) == [0, 1, 1]
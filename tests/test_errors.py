@@ -0,0 +1,61 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from nstimes.errors import api_errors
+from nstimes.errors import NSAPIConnectionError
+from nstimes.errors import NSAPIError
+from nstimes.errors import NSAPIRateLimitError
+from nstimes.errors import NSAPIStatusError
+from nstimes.errors import NSAPITimeoutError
+from nstimes.errors import parse_retry_after
+
+
+def raise_status(status_code: int, headers: dict[str, str] = {}) -> None:
+    request = httpx.Request("GET", "https://example.com")
+    httpx.Response(status_code, headers=headers, request=request).raise_for_status()
+
+
+@pytest.mark.parametrize(
+    "status_code,error_class,retryable",
+    [
+        (400, NSAPIStatusError, False),
+        (401, NSAPIStatusError, False),
+        (429, NSAPIRateLimitError, True),
+        (500, NSAPIStatusError, False),
+        (503, NSAPIStatusError, True),
+    ],
+)
+def test_status_errors(
+    status_code: int, error_class: type[NSAPIError], retryable: bool
+) -> None:
+    with pytest.raises(error_class) as error:
+        with api_errors():
+            raise_status(status_code, {"Retry-After": "7"})
+    assert error.value.status_code == status_code
+    assert error.value.retryable == retryable
+    assert error.value.retry_after == 7
+
+
+def test_transport_errors() -> None:
+    with pytest.raises(NSAPITimeoutError):
+        with api_errors():
+            raise httpx.ReadTimeout("timeout")
+    with pytest.raises(NSAPIConnectionError) as error:
+        with api_errors():
+            raise httpx.ConnectError("refused")
+    assert error.value.retryable
+    assert isinstance(error.value.__cause__, httpx.ConnectError)
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("soon") is None
+    later = datetime.now(timezone.utc) + timedelta(seconds=60)
+    retry_after = parse_retry_after(format_datetime(later, usegmt=True))
+    assert retry_after is not None and 50 < retry_after <= 60
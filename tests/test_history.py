@@ -0,0 +1,110 @@
+import asyncio
+import os
+import tempfile
+import threading
+from datetime import datetime
+from datetime import timedelta
+from unittest import mock
+
+from pytest_httpx import HTTPXMock
+from typer.testing import CliRunner
+
+from nstimes.departure import Departure
+from nstimes.departure import get_departures
+from nstimes.departure import get_departures_async
+from nstimes.departure import Time
+from nstimes.history import configure_history_store
+from nstimes.history import HistoryStore
+from nstimes.history import RouteStats
+from nstimes.main import app
+from tests.payloads import trips_payload
+
+runner = CliRunner()
+START = datetime(2023, 10, 15, 8, 0)
+
+
+def departure(minutes: int, delay: int = 0, cancelled: bool = False) -> Departure:
+    planned = START + timedelta(minutes=minutes)
+    return Departure(
+        train_type="IC",
+        platform="5",
+        departure_time=Time(planned=planned, actual=planned + timedelta(minutes=delay)),
+        arrival_time=Time(planned=planned + timedelta(minutes=30)),
+        cancelled=cancelled,
+    )
+
+
+def test_percentiles() -> None:
+    stats = RouteStats(departures=12, cancelled=2, delays={0: 7, 2: 1, 5: 1, 20: 1})
+    assert stats.percentile(50) == 0
+    assert stats.percentile(90) == 5
+    assert stats.percentile(99) == 20
+    assert stats.cancellation_rate == 2 / 12
+    assert stats.mean_delay == 2.7
+    assert RouteStats().percentile(50) == 0
+
+
+def test_departures_are_recorded_once_with_latest_delay() -> None:
+    store = HistoryStore(":memory:")
+    store.record("A", "B", [departure(0), departure(15), departure(30)])
+    store.record("A", "B", [departure(15, delay=4), departure(30, cancelled=True)])
+    store.record("B", "A", [departure(0, delay=10)])
+
+    stats = store.stats("A", "B")
+    assert stats.departures == 3
+    assert stats.cancelled == 1
+    assert stats.delays == {0: 1, 4: 1}
+    assert store.stats("A", "B", since=START + timedelta(minutes=10)).departures == 2
+
+
+def test_get_departures_records_history(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=3))
+    store = HistoryStore(":memory:")
+    configure_history_store(store)
+    get_departures("Amsterdam Centraal", "Utrecht Centraal", "x", "2023-10-15T12:00")
+    assert store.stats("Amsterdam Centraal", "Utrecht Centraal").departures == 3
+
+
+def test_get_departures_async_records_history_off_the_event_loop(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(json=trips_payload(count=3))
+    store = HistoryStore(":memory:")
+    configure_history_store(store)
+    threads = []
+    record = store.record
+    with mock.patch.object(
+        store,
+        "record",
+        lambda *args: threads.append(threading.get_ident()) or record(*args),
+    ):
+        asyncio.run(
+            get_departures_async(
+                "Amsterdam Centraal", "Utrecht Centraal", "x", "2023-10-15T12:00"
+            )
+        )
+    assert threads and threads[0] != threading.get_ident()
+    assert store.stats("Amsterdam Centraal", "Utrecht Centraal").departures == 3
+
+
+def test_stats_command() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "history.sqlite3")
+        HistoryStore(path).record(
+            "Amsterdam Centraal",
+            "Utrecht Centraal",
+            [departure(0), departure(15, delay=3), departure(30, cancelled=True)],
+        )
+        with mock.patch.dict(os.environ, {"NSTIMES_HISTORY_PATH": path}):
+            result = runner.invoke(app, ["stats", "--route", "Asd:Ut"])
+            assert result.exit_code == 0
+            assert "Departures: 3" in result.stdout
+            assert "Cancelled: 33.3%" in result.stdout
+            assert "p50 0 min" in result.stdout
+
+            result = runner.invoke(app, ["stats", "--route", "Ut:Asd"])
+            assert result.exit_code == 1
+            result = runner.invoke(
+                app, ["stats", "--route", "Asd:Ut", "--since", "2023-10-15"]
+            )
+            assert result.exit_code == 2
@@ -1,5 +1,10 @@
+import csv
+import io
 import json
+import re
 import tempfile
+from datetime import datetime
+from datetime import timedelta
 from importlib.metadata import version
 from pathlib import Path
 
@@ -13,9 +18,14 @@ from typer.testing import CliRunner
 
 from nstimes.main import app
 from nstimes.main import complete_name
+from tests.payloads import multi_leg_trip
+from tests.payloads import trip
+from tests.payloads import trips_payload
 from tests.strategies import two_different_stations_strategy
 
 runner = CliRunner()
+# Responses of the NS API, recorded with --record, so no test needs the network
+REPLAY = ["--replay", str(Path(__file__).parent / "recordings")]
 
 
 def test_app_version_is_correct() -> None:
@@ -26,9 +36,18 @@ def test_app_version_is_correct() -> None:
 
 def test_app_gets_train_times() -> None:
     result = runner.invoke(
-        app, ["journey", "--start", "Amersfoort Centraal", "--end", "Utrecht Centraal"]
+        app,
+        [
+            *REPLAY,
+            "journey",
+            "--start",
+            "Amersfoort Centraal",
+            "--end",
+            "Utrecht Centraal",
+        ],
     )
     assert result.exit_code == 0
+    assert result.stdout.count(" min ") == 10
 
 
 def test_app_unknown_stations_raises_1() -> None:
@@ -42,6 +61,7 @@ def test_app_gets_train_times_table() -> None:
     result = runner.invoke(
         app,
         [
+            *REPLAY,
             "journey",
             "--start",
             "Amersfoort Centraal",
@@ -106,7 +126,7 @@ def test_update_stations_writes_file() -> None:
         temp_json_file = Path(temp_dir) / "test.json"
 
         result = runner.invoke(
-            app, ["update-stations-json", "--path", str(temp_json_file)]
+            app, [*REPLAY, "update-stations-json", "--path", str(temp_json_file)]
         )
 
         assert result.exit_code == 0
@@ -157,3 +177,102 @@ def test_exception_raising(httpx_mock: HTTPXMock) -> None:
     with httpx.Client() as client:
         with pytest.raises(httpx.ReadTimeout):
             client.get("https://test_url")
+
+
+def test_journeys_prints_every_route(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=1))
+    httpx_mock.add_response(json=trips_payload(count=1))
+    result = runner.invoke(
+        app, ["journeys", "--route", "Asd:Ut", "--route", "Utrecht Centraal:Amf"]
+    )
+    assert result.exit_code == 0
+    assert "Amsterdam Centraal -> Utrecht Centraal" in result.stdout
+    assert "Utrecht Centraal -> Amersfoort Centraal" in result.stdout
+
+
+def test_journeys_streams_every_route_as_one_csv(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=1))
+    httpx_mock.add_response(json=trips_payload(count=2))
+    result = runner.invoke(
+        app,
+        ["journeys", "--route", "Asd:Ut", "--route", "Ut:Amf"]
+        + ["--printer-choice", "csv"],
+    )
+    assert result.exit_code == 0
+    rows = list(csv.DictReader(io.StringIO(result.stdout)))
+    assert [(row["start"], row["end"]) for row in rows] == [
+        ("Amsterdam Centraal", "Utrecht Centraal"),
+        ("Utrecht Centraal", "Amersfoort Centraal"),
+        ("Utrecht Centraal", "Amersfoort Centraal"),
+    ]
+
+
+def test_journeys_prints_the_routes_that_succeeded(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(
+        json=trips_payload(count=1),
+        url=re.compile(r".*originUicCode=8400058.*"),
+    )
+    httpx_mock.add_response(
+        status_code=404, url=re.compile(r".*originUicCode=8400621.*")
+    )
+    result = runner.invoke(app, ["journeys", "--route", "Asd:Ut", "--route", "Ut:Amf"])
+    assert result.exit_code == 1
+    assert "Amsterdam Centraal -> Utrecht Centraal" in result.stdout
+    assert result.stdout.count(" min ") == 1
+    assert "Utrecht Centraal -> Amersfoort Centraal failed" in result.stderr
+
+
+def test_journeys_bad_route_raises_2() -> None:
+    result = runner.invoke(app, ["journeys", "--route", "Asd-Ut"])
+    assert result.exit_code == 2
+
+
+def test_journey_limit(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=5))
+    result = runner.invoke(
+        app, ["journey", "--start", "Asd", "--end", "Ut", "--limit", "2"]
+    )
+    assert result.exit_code == 0
+    assert result.stdout.count(" min ") == 2
+
+
+def test_watch_polls_and_renders_board(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=2))
+    result = runner.invoke(
+        app, ["watch", "--start", "Asd", "--end", "Ut", "--polls", "1"]
+    )
+    assert result.exit_code == 0
+    assert "Amsterdam Centraal -> Utrecht Centraal" in result.stdout
+    assert result.stdout.count(" min ") == 2
+
+
+def test_journey_jsonl_output(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=2))
+    result = runner.invoke(
+        app, ["journey", "--start", "Asd", "--end", "Ut", "--printer-choice", "jsonl"]
+    )
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["train_type"] for line in lines] == ["IC", "IC"]
+
+
+def test_journey_max_transfers(httpx_mock: HTTPXMock) -> None:
+    start = datetime.now() + timedelta(minutes=5)
+    payload = {"trips": [multi_leg_trip(start, [5]), trip(start)]}
+    httpx_mock.add_response(json=payload)
+    args = ["journey", "--start", "Asd", "--end", "Ut", "--printer-choice", "jsonl"]
+    result = runner.invoke(app, [*args, "--max-transfers", "0"])
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["transfers"] for line in lines] == [0]
+
+
+def test_profile_prints_stages(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=2))
+    result = runner.invoke(
+        app, ["--profile", "journey", "--start", "Asd", "--end", "Ut"]
+    )
+    assert result.exit_code == 0
+    stages = [line.split()[0] for line in result.stderr.splitlines()[1:]]
+    for stage in ["http.request", "json.decode", "parse.departures", "render"]:
+        assert stage in stages
@@ -0,0 +1,77 @@
+import json
+
+from nstimes.metrics import configure_metrics
+from nstimes.metrics import count
+from nstimes.metrics import format_profile
+from nstimes.metrics import http_trace
+from nstimes.metrics import Metrics
+from nstimes.metrics import NO_SPAN
+from nstimes.metrics import OTLPJsonExporter
+from nstimes.metrics import PrometheusExporter
+from nstimes.metrics import span
+from nstimes.metrics import timed_iter
+
+
+def test_disabled_metrics_cost_nothing() -> None:
+    assert span("parse") is NO_SPAN
+    items = iter([1, 2])
+    assert timed_iter("parse", items) is items
+    assert http_trace() is None
+    count("requests")
+
+
+def test_spans_and_counters() -> None:
+    metrics = Metrics()
+    configure_metrics(metrics)
+    for _ in range(3):
+        with span("parse"):
+            pass
+    count("cache.hits", 2)
+    assert list(timed_iter("render", [1, 2])) == [1, 2]
+
+    assert metrics.spans["parse"].count == 3
+    # Two items and the end of the iterator
+    assert metrics.spans["render"].count == 3
+    assert metrics.counters == {"cache.hits": 2}
+    profile = format_profile(metrics, total_seconds=0.5).splitlines()
+    assert [line.split()[0] for line in profile[1:]] == [
+        "parse",
+        "render",
+        "total",
+        "cache.hits",
+    ]
+
+
+def test_http_trace_times_connection_stages() -> None:
+    metrics = Metrics()
+    configure_metrics(metrics)
+    trace = http_trace()
+    assert trace is not None
+    for event in [
+        "connection.connect_tcp.started",
+        "connection.connect_tcp.complete",
+        "http11.send_request_headers.started",
+        "http11.send_request_headers.complete",
+        "http11.receive_response_headers.started",
+        "http11.receive_response_headers.failed",
+    ]:
+        trace(event, {})
+    assert list(metrics.spans) == ["http.connect", "http.wait"]
+
+
+def test_exporters() -> None:
+    metrics = Metrics()
+    metrics.record("http.request", 0.25)
+    metrics.increment("cache.misses")
+
+    text = PrometheusExporter().export(metrics)
+    assert 'nstimes_span_seconds_sum{span="http.request"} 0.25' in text
+    assert "nstimes_cache_misses_total 1" in text
+
+    request = json.loads(OTLPJsonExporter().export(metrics))
+    (resource,) = request["resourceMetrics"]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "nstimes"}
+    duration, calls, misses = resource["scopeMetrics"][0]["metrics"]
+    assert duration["sum"]["dataPoints"][0]["asDouble"] == 0.25
+    assert calls["sum"]["dataPoints"][0]["attributes"][0]["key"] == "span"
+    assert misses["name"] == "nstimes.cache.misses"
@@ -1,4 +1,9 @@
+import csv
+import io
+import json
 import os
+from datetime import datetime
+from datetime import timedelta
 from typing import Any
 from unittest import mock
 
@@ -9,11 +14,22 @@ from hypothesis import given
 from hypothesis import strategies as st
 from pytest_httpx import httpx_mock
 from pytest_httpx import HTTPXMock
+from rich.text import Text
 
 from nstimes.departure import Departure
+from nstimes.departure import parse_departures
+from nstimes.printers import ArrowPrinter
 from nstimes.printers import ConsolePrinter
 from nstimes.printers import ConsoleTablePrinter
+from nstimes.printers import CsvPrinter
 from nstimes.printers import get_printer
+from nstimes.printers import JsonLinesPrinter
+from nstimes.printers import PlainPrinter
+from nstimes.styles import ANSI_CANCELLED
+from nstimes.styles import ANSI_RED
+from nstimes.styles import ANSI_RESET
+from tests.payloads import multi_leg_trip
+from tests.payloads import trip
 from tests.strategies import departure_strategy
 
 
@@ -54,3 +70,133 @@ def mock_env(monkeypatch: pytest.MonkeyPatch) -> Any:
 def test_invalid_printer_raises_exit_1() -> None:
     with pytest.raises(typer.Exit, match=r"1"):
         get_printer("invalid")  # type: ignore
+
+
+@given(departures=st.lists(departure_strategy(), min_size=1, max_size=5))
+def test_jsonl_printer_streams_as_dict(departures: list[Departure]) -> None:
+    stream = io.StringIO()
+    printer = JsonLinesPrinter(stream)
+    printer.add_departure(departures[0])
+    assert stream.getvalue().count("\n") == 1
+    for departure in departures[1:]:
+        printer.add_departure(departure)
+    printer.generate_output()
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines == [departure.as_dict() for departure in departures]
+    assert "delay_minutes" in lines[0]["departure_time"]
+
+
+@given(departures=st.lists(departure_strategy(), min_size=1, max_size=5))
+def test_csv_printer_writes_one_header(departures: list[Departure]) -> None:
+    stream = io.StringIO()
+    printer = CsvPrinter(stream)
+    for departure in departures:
+        printer.add_departure(departure)
+    printer.generate_output()
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert len(rows) == len(departures)
+    assert rows[0]["train_type"] == departures[0].train_type
+    assert int(rows[0]["departure_time_delay_minutes"]) == (
+        departures[0].departure_time.delay_minutes
+    )
+    assert "[" not in stream.getvalue()
+
+
+@given(departures=st.lists(departure_strategy(), min_size=1, max_size=5))
+def test_arrow_printer_writes_ipc_stream(departures: list[Departure]) -> None:
+    pa = pytest.importorskip("pyarrow")
+    stream = io.BytesIO()
+    printer = ArrowPrinter(stream)
+    for departure in departures:
+        printer.add_departure(departure)
+    printer.generate_output()
+    table = pa.ipc.open_stream(stream.getvalue()).read_all()
+    assert table.column("train_type").to_pylist() == [
+        departure.train_type for departure in departures
+    ]
+
+
+def test_arrow_printer_without_pyarrow_exits_1(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    with mock.patch.dict("sys.modules", {"pyarrow": None}):
+        with pytest.raises(typer.Exit) as error:
+            ArrowPrinter(io.BytesIO())
+    assert error.value.exit_code == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "nstimes[arrow]" in captured.err
+
+
+def test_ascii_printer_shows_transfers() -> None:
+    start = datetime.now() + timedelta(minutes=5)
+    printer = ConsolePrinter()
+    for departure in parse_departures(
+        [multi_leg_trip(start, [6], train_types=["IC", "SPR"])]
+    ):
+        printer.add_departure(departure)
+    assert printer.lines[0].endswith("via Station 1 p.1 -> p.5b SPR (6 min)")
+
+
+@given(departures=st.lists(departure_strategy(), min_size=1, max_size=20))
+def test_plain_printer_matches_ascii_without_markup(
+    departures: list[Departure],
+) -> None:
+    ascii_printer = ConsolePrinter()
+    plain_printer = PlainPrinter(io.StringIO(), color=False)
+    for departure in departures:
+        ascii_printer.add_departure(departure)
+        plain_printer.add_departure(departure)
+    assert plain_printer.lines == [
+        Text.from_markup(line).plain for line in ascii_printer.lines
+    ]
+
+
+def test_plain_printer_writes_once() -> None:
+    stream = mock.MagicMock(wraps=io.StringIO())
+    stream.isatty.return_value = False
+    printer = PlainPrinter(stream)
+    printer.title = "Amsterdam Centraal -> Utrecht Centraal"
+    start = datetime.now() + timedelta(minutes=5)
+    for departure in parse_departures([trip(start, 2), trip(start, cancelled=True)]):
+        printer.add_departure(departure)
+    printer.generate_output()
+    assert stream.write.call_count == 1
+    output = stream.write.call_args.args[0]
+    assert "\x1b" not in output
+    assert output.splitlines()[0] == printer.title
+    assert len(output.splitlines()) == 4
+
+
+def test_plain_printer_colors_terminals() -> None:
+    start = datetime.now() + timedelta(minutes=5)
+    printer = PlainPrinter(io.StringIO(), color=True)
+    for departure in parse_departures([trip(start, 2), trip(start, cancelled=True)]):
+        printer.add_departure(departure)
+    delayed, cancelled = printer.lines
+    assert f"{ANSI_RED}+2{ANSI_RESET}" in delayed
+    assert cancelled.startswith(ANSI_CANCELLED)
+
+
+def test_plain_printer_keeps_cancelled_style_after_a_delay() -> None:
+    start = datetime.now() + timedelta(minutes=5)
+    printer = PlainPrinter(io.StringIO(), color=True)
+    for departure in parse_departures([trip(start, 3, cancelled=True)]):
+        printer.add_departure(departure)
+    (line,) = printer.lines
+    assert line.startswith(ANSI_CANCELLED) and line.endswith(ANSI_RESET)
+    # Every reset but the last is followed by the cancelled style again
+    assert line.count(ANSI_RESET) == line.count(ANSI_CANCELLED)
+    assert f"+3{ANSI_RESET}{ANSI_CANCELLED}" in line
+
+
+def test_plain_printer_can_generate_output_twice() -> None:
+    stream = io.StringIO()
+    printer = PlainPrinter(stream, color=False)
+    printer.title = "title"
+    for departure in parse_departures([trip(datetime.now() + timedelta(minutes=5))]):
+        printer.add_departure(departure)
+    printer.generate_output()
+    first = stream.getvalue()
+    printer.generate_output()
+    assert stream.getvalue() == first * 2
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from nstimes.errors import NSAPIRateLimitError
+from nstimes.errors import NSAPIStatusError
+from nstimes.errors import NSAPITimeoutError
+from nstimes.ratelimit import RetryPolicy
+from nstimes.ratelimit import TokenBucket
+
+
+def test_token_bucket_allows_bursts_then_waits() -> None:
+    now = [0.0]
+    sleeps: list[float] = []
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0], sleep=sleeps.append)
+    bucket.acquire()
+    bucket.acquire()
+    assert sleeps == []
+    bucket.acquire()
+    bucket.acquire()
+    assert sleeps == [0.5, 1.0]
+
+    now[0] = 10.0
+    bucket.acquire()
+    assert sleeps == [0.5, 1.0]
+
+
+def test_backoff_is_jittered_and_capped() -> None:
+    policy = RetryPolicy(retries=10, base_delay=1, max_delay=8)
+    error = NSAPITimeoutError("timeout")
+    for attempt, backoff in enumerate([1, 2, 4, 8, 8]):
+        delay = policy.delay(attempt, error)
+        assert delay is not None
+        assert backoff / 2 <= delay <= backoff
+    assert policy.delay(10, error) is None
+    assert policy.delay(0, NSAPIStatusError("bad request", status_code=400)) is None
+    assert policy.delay(0, ValueError()) is None
+
+
+def test_retry_after_is_respected() -> None:
+    policy = RetryPolicy(max_delay=30)
+    assert policy.delay(0, NSAPIRateLimitError("quota", 429, retry_after=12)) == 12
+    assert policy.delay(0, NSAPIRateLimitError("quota", 429, retry_after=60)) is None
+
+
+def test_call_retries_transient_errors() -> None:
+    errors = [NSAPITimeoutError("timeout"), NSAPIStatusError("gateway", 503)]
+    sleeps: list[float] = []
+
+    def fn() -> str:
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert RetryPolicy(retries=3, sleep=sleeps.append).call(fn) == "ok"
+    assert len(sleeps) == 2
+
+
+def test_call_gives_up() -> None:
+    status_codes = [429, 429, 429, 500]
+    sleeps: list[float] = []
+
+    def fn() -> str:
+        raise NSAPIStatusError("error", status_codes.pop(0))
+
+    with pytest.raises(NSAPIStatusError):
+        RetryPolicy(retries=2, sleep=sleeps.append).call(fn)
+    assert len(sleeps) == 2
+
+    # Other errors are not retried
+    with pytest.raises(NSAPIStatusError):
+        RetryPolicy(sleep=sleeps.append).call(fn)
+    assert len(sleeps) == 2
+
+
+def test_call_async_retries_transient_errors() -> None:
+    errors = [NSAPIRateLimitError("quota", 429, retry_after=0)]
+    sleeps: list[float] = []
+
+    async def fn() -> str:
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    async def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+
+    policy = RetryPolicy(async_sleep=sleep)
+    assert asyncio.run(policy.call_async(fn)) == "ok"
+    assert sleeps == [0]
@@ -0,0 +1,121 @@
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from datetime import timedelta
+
+import httpx
+import pytest
+from typer.testing import CliRunner
+
+from nstimes import utils
+from nstimes.departure import parse_datetime
+from nstimes.errors import NSAPIStatusError
+from nstimes.main import app
+from nstimes.replay import recording_key
+from nstimes.replay import RecordTransport
+from nstimes.replay import ReplayTransport
+from nstimes.utils import API_URL
+from nstimes.utils import httpx_get
+from tests.payloads import trips_payload
+
+START = datetime(2023, 10, 15, 12, 0)
+QUERY = {
+    "originUicCode": "8400058",
+    "destinationUicCode": "8400621",
+    "dateTime": START.isoformat(),
+}
+
+
+def record(directory: str, payload: dict) -> None:  # type: ignore
+    transport = RecordTransport(
+        directory,
+        httpx.MockTransport(lambda request: httpx.Response(200, json=payload)),
+    )
+    with httpx.Client(base_url=API_URL, transport=transport) as client:
+        client.get("v3/trips", params=QUERY)
+
+
+def replay(directory: str, **params: str) -> httpx.Response:
+    with httpx.Client(base_url=API_URL, transport=ReplayTransport(directory)) as client:
+        return client.get("v3/trips", params={**QUERY, **params})
+
+
+def departure_times(response: httpx.Response) -> list[datetime]:
+    return [
+        parse_datetime(trip["legs"][0]["origin"]["plannedDateTime"])
+        for trip in response.json()["trips"]
+    ]
+
+
+def test_recording_key_normalizes_params() -> None:
+    def key(params: dict[str, str]) -> str:
+        return recording_key(httpx.Request("GET", f"{API_URL}/v3/trips", params=params))
+
+    assert key(QUERY) == key(dict(reversed(list(QUERY.items()))))
+    assert key(QUERY) == key({**QUERY, "dateTime": "2024-01-01T08:00:00"})
+    assert key(QUERY) != key({**QUERY, "originUicCode": "8400055"})
+    assert key(QUERY).startswith("v3_trips-")
+
+
+def test_replay_shifts_times_to_the_request() -> None:
+    payload = trips_payload(count=3, start=START + timedelta(minutes=5))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        record(temp_dir, payload)
+        (name,) = os.listdir(temp_dir)
+        with gzip.open(os.path.join(temp_dir, name)) as file:
+            assert json.load(file)["params"] == QUERY
+
+        recorded = departure_times(replay(temp_dir))
+        later = START + timedelta(days=1, minutes=30)
+        replayed = departure_times(replay(temp_dir, dateTime=later.isoformat()))
+    assert recorded == departure_times(httpx.Response(200, json=payload))
+    assert [b - a for a, b in zip(recorded, replayed)] == [
+        timedelta(days=1, minutes=30)
+    ] * 3
+
+
+def test_replay_without_recording_is_404() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with httpx.Client(
+            base_url=API_URL, transport=ReplayTransport(temp_dir)
+        ) as client:
+            with pytest.raises(NSAPIStatusError) as error:
+                httpx_get(token="x", query_params=QUERY, api="v3/trips", client=client)
+    assert error.value.status_code == 404
+    assert not error.value.retryable
+
+
+def test_replay_async() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        record(temp_dir, trips_payload(count=2, start=START))
+
+        async def get() -> httpx.Response:
+            async with httpx.AsyncClient(
+                base_url=API_URL, transport=ReplayTransport(temp_dir)
+            ) as client:
+                return await client.get("v3/trips", params=QUERY)
+
+        response = asyncio.run(get())
+    assert len(response.json()["trips"]) == 2
+
+
+def test_replay_option_reads_settings_from_dotenv(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def load_dotenv() -> None:
+        os.environ["NS_API_TIMEOUT"] = "3"
+
+    # As in a new process, where nothing configured the client yet
+    monkeypatch.setattr(utils, "_client_settings", None)
+    monkeypatch.setattr("dotenv.load_dotenv", load_dotenv)
+    monkeypatch.setenv("NS_API_TIMEOUT", "10")
+    monkeypatch.delenv("NS_API_TIMEOUT")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result = CliRunner().invoke(app, ["--replay", temp_dir, "journey", "--help"])
+        assert result.exit_code == 0
+        settings = utils.get_client_settings()
+        assert settings.replay_dir == temp_dir
+        assert settings.timeout == 3
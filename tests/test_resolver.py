@@ -0,0 +1,66 @@
+import pytest
+from pytest_httpx import HTTPXMock
+from typer.testing import CliRunner
+
+from nstimes.main import app
+from nstimes.resolver import get_resolver
+from nstimes.resolver import StationResolver
+from nstimes.resolver import UnknownStationError
+from tests.payloads import trips_payload
+
+runner = CliRunner()
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("Utrecht Centraal", "Utrecht Centraal"),
+        ("utrecht centraal", "Utrecht Centraal"),
+        ("Ut", "Utrecht Centraal"),
+        ("Asd", "Amsterdam Centraal"),
+        ("Rtd", "Rotterdam Centraal"),
+        ("Den Haag C", "Den Haag Centraal"),
+        ("Utrecht Cantraal", "Utrecht Centraal"),
+        ("amsterdm zuid", "Amsterdam Zuid"),
+        ("Marienberg", "Mariënberg"),
+    ],
+)
+def test_resolve_station(query: str, expected: str) -> None:
+    assert get_resolver().resolve(query) == expected
+
+
+def test_resolve_unknown_station_raises() -> None:
+    with pytest.raises(UnknownStationError) as error:
+        get_resolver().resolve("bad input")
+    assert isinstance(error.value, KeyError)
+    assert error.value.candidates[0][0] == "Bad Nieuweschans"
+
+
+@pytest.mark.parametrize("query", ["", "   "])
+def test_resolve_empty_station_raises(query: str) -> None:
+    with pytest.raises(UnknownStationError) as error:
+        get_resolver().resolve(query)
+    assert error.value.candidates == []
+
+
+def test_resolve_ambiguous_station_raises() -> None:
+    with pytest.raises(UnknownStationError) as error:
+        get_resolver().resolve("Dt")
+    names = {name for name, _ in error.value.candidates}
+    assert {"Delft", "Deventer", "Dordrecht"} <= names
+
+
+def test_resolver_aliases() -> None:
+    resolver = StationResolver(["Utrecht Centraal"], aliases={"UT": "Utrecht Centraal"})
+    assert resolver.candidates("ut") == [("Utrecht Centraal", 1.0)]
+
+
+def test_journey_resolves_abbreviations(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload())
+    result = runner.invoke(app, ["journey", "--start", "Asd", "--end", "Ut"])
+    assert result.exit_code == 0
+    assert "Amsterdam Centraal -> Utrecht Centraal" in result.stdout
+    request = httpx_mock.get_request()
+    assert request is not None
+    assert request.url.params["originUicCode"] == "8400058"
+    assert request.url.params["destinationUicCode"] == "8400621"
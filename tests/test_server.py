@@ -0,0 +1,113 @@
+from typing import Iterator
+from unittest import mock
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from pytest_httpx import HTTPXMock
+
+from nstimes.server import app
+from tests.payloads import trips_payload
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    with TestClient(app) as client:
+        yield client
+
+
+def test_journey_returns_departures(client: TestClient, httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=2))
+    response = client.get("/journey", params={"start": "Asd", "end": "Ut"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["start"] == "Amsterdam Centraal"
+    assert body["end"] == "Utrecht Centraal"
+    assert [d["train_type"] for d in body["departures"]] == ["IC", "IC"]
+    assert body["departures"][0]["departure_time"]["delay_minutes"] == 0
+
+
+def test_identical_journeys_share_upstream_response(
+    client: TestClient, httpx_mock: HTTPXMock
+) -> None:
+    httpx_mock.add_response(json=trips_payload(count=1))
+    params = {"start": "Asd", "end": "Ut", "time": "12:00", "date": "15-10-2023"}
+    assert client.get("/journey", params=params).status_code == 200
+    assert client.get("/journey", params=params).status_code == 200
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_journey_unknown_station_is_404(client: TestClient) -> None:
+    response = client.get("/journey", params={"start": "bad input", "end": "Ut"})
+    assert response.status_code == 404
+    assert "Bad Nieuweschans" in response.json()["detail"]["candidates"]
+
+
+def test_journey_bad_time_is_422(client: TestClient) -> None:
+    params = {"start": "Asd", "end": "Ut", "time": "noon"}
+    assert client.get("/journey", params=params).status_code == 422
+
+
+@pytest.mark.parametrize(
+    "upstream,status_code",
+    [
+        (httpx.Response(status_code=500), 502),
+        (httpx.Response(status_code=429), 503),
+        (httpx.ReadTimeout("Unable to read within timeout"), 504),
+    ],
+)
+def test_journey_upstream_failure(
+    client: TestClient,
+    httpx_mock: HTTPXMock,
+    upstream: httpx.Response | Exception,
+    status_code: int,
+) -> None:
+    if isinstance(upstream, Exception):
+        httpx_mock.add_exception(upstream)
+    else:
+        httpx_mock.add_response(status_code=upstream.status_code)
+    response = client.get("/journey", params={"start": "Asd", "end": "Ut"})
+    assert response.status_code == status_code
+
+
+def test_stations_by_prefix(client: TestClient) -> None:
+    response = client.get("/stations", params={"prefix": "Utrecht C"})
+    assert response.json() == [{"name": "Utrecht Centraal", "uic_code": "8400621"}]
+
+
+def test_stats_reports_coalescing(client: TestClient) -> None:
+    stats = client.get("/stats").json()
+    assert set(stats["coalescing"]) == {"hits", "misses"}
+
+
+def test_journey_retries_gateway_errors(
+    client: TestClient, httpx_mock: HTTPXMock
+) -> None:
+    httpx_mock.add_response(status_code=503)
+    httpx_mock.add_response(json=trips_payload(count=1))
+    response = client.get("/journey", params={"start": "Asd", "end": "Ut"})
+    assert response.status_code == 200
+    assert len(httpx_mock.get_requests()) == 2
+
+
+def test_metrics_are_scraped(client: TestClient, httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=1))
+    client.get("/journey", params={"start": "Asd", "end": "Ut"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'nstimes_span_seconds_count{span="http.request"} 1' in response.text
+    assert "nstimes_http_requests_total 1" in response.text
+
+    response = client.get("/metrics", params={"format": "otlp"})
+    (resource,) = response.json()["resourceMetrics"]
+    names = [m["name"] for m in resource["scopeMetrics"][0]["metrics"]]
+    assert "nstimes.span.duration" in names
+    assert client.get("/metrics", params={"format": "xml"}).status_code == 422
+
+
+def test_server_loads_the_env_file_at_startup() -> None:
+    with mock.patch("nstimes.server.load_dotenv") as load_dotenv:
+        with TestClient(app):
+            load_dotenv.assert_called_once_with()
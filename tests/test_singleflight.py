@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from pytest_httpx import HTTPXMock
+
+from nstimes.departure import coalescing_stats
+from nstimes.departure import Departure
+from nstimes.departure import get_departures
+from nstimes.departure import get_departures_async
+from nstimes.singleflight import AsyncSingleFlight
+from nstimes.singleflight import SingleFlight
+from tests.payloads import trips_payload
+
+QUERY = ("Amsterdam Centraal", "Utrecht Centraal", "x", "2023-10-15T12:19:00")
+
+
+def test_single_flight_shares_concurrent_calls() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow() -> int:
+        calls.append(1)
+        release.wait(timeout=5)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, "key", slow) for _ in range(4)]
+        while flight.hits < 3:
+            time.sleep(0.001)
+        release.set()
+        assert [future.result() for future in futures] == [42] * 4
+    assert len(calls) == 1
+    assert (flight.hits, flight.misses) == (3, 1)
+    assert flight.calls == {}
+
+
+def test_single_flight_shares_errors() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+
+    def fail() -> int:
+        raise ValueError("upstream")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_async_single_flight_shares_concurrent_calls() -> None:
+    flight: AsyncSingleFlight[int] = AsyncSingleFlight()
+    calls = []
+
+    async def slow() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run() -> list[int]:
+        return await asyncio.gather(*(flight.do("key", slow) for _ in range(4)))
+
+    assert asyncio.run(run()) == [42] * 4
+    assert len(calls) == 1
+    assert (flight.hits, flight.misses) == (3, 1)
+    assert flight.calls == {}
+
+
+def test_get_departures_coalesces_threads(httpx_mock: HTTPXMock) -> None:
+    def slow_response(request: httpx.Request) -> httpx.Response:
+        time.sleep(0.2)
+        return httpx.Response(200, json=trips_payload(count=2))
+
+    httpx_mock.add_callback(slow_response)
+    before = coalescing_stats()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: get_departures(*QUERY), range(4)))
+    assert all(result is results[0] for result in results)
+    assert len(httpx_mock.get_requests()) == 1
+    assert coalescing_stats()["hits"] - before["hits"] == 3
+
+
+def test_get_departures_async_coalesces_tasks(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=trips_payload(count=2))
+
+    async def run() -> list[list[Departure]]:
+        return list(
+            await asyncio.gather(*(get_departures_async(*QUERY) for _ in range(4)))
+        )
+
+    before = coalescing_stats()
+    results = asyncio.run(run())
+    assert all(result is results[0] for result in results)
+    assert len(httpx_mock.get_requests()) == 1
+    assert coalescing_stats()["hits"] - before["hits"] == 3
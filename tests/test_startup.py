@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+# Milliseconds that importing nstimes.main may take on top of importing typer
+IMPORT_BUDGET_MS = 150
+HEAVY_MODULES = ["asyncio", "dotenv", "httpx", "pydantic", "rich"]
+
+
+def run_python(code: str, **env: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **env},
+        check=True,
+    )
+
+
+def cumulative_import_us(importtime: str) -> dict[str, int]:
+    """Cumulative microseconds per module from `python -X importtime` output"""
+    times = {}
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def loaded_heavy_modules(code: str, **env: str) -> list[str]:
+    result = run_python(
+        f"{code}\nimport sys\nprint(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])",
+        **env,
+    )
+    return result.stdout.splitlines()[-1].split()
+
+
+def test_import_stays_within_budget() -> None:
+    times = cumulative_import_us(run_python("import nstimes.main").stderr)
+    assert (times["nstimes.main"] - times["typer"]) / 1000 < IMPORT_BUDGET_MS
+
+
+def test_import_does_not_load_heavy_modules() -> None:
+    assert loaded_heavy_modules("import nstimes.main") == []
+
+
+def test_completion_does_not_load_heavy_modules() -> None:
+    code = "\n".join(
+        [
+            "from nstimes.main import app",
+            "try:",
+            "    app(prog_name='nstimes')",
+            "except SystemExit:",
+            "    pass",
+        ]
+    )
+    loaded = loaded_heavy_modules(
+        code,
+        _NSTIMES_COMPLETE="complete_bash",
+        COMP_WORDS="nstimes journey --start Utr",
+        COMP_CWORD="3",
+    )
+    assert loaded == []
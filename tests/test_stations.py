@@ -0,0 +1,139 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from pytest_httpx import HTTPXMock
+from typer.testing import CliRunner
+
+from nstimes.completion import CompletionIndex
+from nstimes.completion import load_index_snapshot
+from nstimes.main import app
+from nstimes.resolver import StationResolver
+from nstimes.stations import atomic_write
+from nstimes.stations import build_metadata
+from nstimes.stations import get_uic_mapping
+from nstimes.stations import load_station_info
+from nstimes.stations import load_stations
+from nstimes.stations import read_metadata
+from nstimes.stations import snapshot_path
+from nstimes.stations import STATIONS_FILE
+from nstimes.stations import write_metadata
+from nstimes.stations import write_snapshot
+from nstimes.stations import write_stations
+
+runner = CliRunner()
+
+
+def test_uic_mapping_is_loaded_once() -> None:
+    assert get_uic_mapping() is get_uic_mapping()
+    assert get_uic_mapping()["Utrecht Centraal"] == "8400621"
+
+
+def test_stations_are_still_importable_from_utils() -> None:
+    from nstimes import utils
+
+    assert utils.get_uic_mapping() is get_uic_mapping()
+    assert utils.STATIONS_FILE == STATIONS_FILE
+
+
+def test_snapshot_is_preferred_when_fresh() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "stations.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"A": "1"}, file)
+        write_snapshot({"A": "1", "B": "2"}, path)
+        assert load_stations(path) == {"A": "1", "B": "2"}
+
+        # A json file that is newer than the snapshot wins
+        os.utime(snapshot_path(path), (0, 0))
+        assert load_stations(path) == {"A": "1"}
+
+
+def test_update_stations_invalidates_index(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(
+        json={"payload": [{"namen": {"lang": "Test"}, "UICCode": "123"}]}
+    )
+    get_uic_mapping()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "stations.json"
+        result = runner.invoke(
+            app,
+            ["update-stations-json", "--token", "x", "--path", str(path), "--snapshot"],
+        )
+        assert result.exit_code == 0
+        assert load_stations(str(path)) == {"Test": "123"}
+        assert Path(snapshot_path(str(path))).exists()
+        index = load_index_snapshot(str(path))
+        assert index is not None and index.complete("te") == ["Test"]
+    assert get_uic_mapping.cache_info().currsize == 0
+
+
+STATIONS_PAYLOAD = {
+    "payload": [
+        {
+            "namen": {"lang": "Amsterdam Centraal"},
+            "UICCode": "8400058",
+            "code": "ASD",
+            "lat": 52.37888718,
+            "lng": 4.90027761,
+        },
+        {
+            "namen": {"lang": "Utrecht Centraal"},
+            "UICCode": "8400621",
+            "code": "UT",
+            "lat": 52.08900070,
+            "lng": 5.11027765,
+        },
+    ]
+}
+
+
+def test_update_stations_is_conditional(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=STATIONS_PAYLOAD, headers={"ETag": '"v1"'})
+    httpx_mock.add_response(status_code=304, match_headers={"If-None-Match": '"v1"'})
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "stations.json"
+        args = ["update-stations-json", "--token", "x", "--path", str(path)]
+        assert runner.invoke(app, args).exit_code == 0
+        assert read_metadata(str(path))["etag"] == '"v1"'
+        modified = path.stat().st_mtime_ns
+
+        result = runner.invoke(app, args)
+        assert result.exit_code == 0
+        assert "up to date" in result.stdout
+        assert path.stat().st_mtime_ns == modified
+        assert sorted(os.listdir(temp_dir)) == ["stations.json", "stations.meta.json"]
+
+
+def test_write_stations_skips_unchanged_file() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "stations.json")
+        assert write_stations({"A": "1"}, path)
+        assert not write_stations({"A": "1"}, path)
+        assert write_stations({"A": "2"}, path)
+        assert load_stations(path) == {"A": "2"}
+
+
+def test_atomic_write_cleans_up_on_failure() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "stations.json")
+        atomic_write(path, b"{}")
+        with pytest.raises(TypeError):
+            atomic_write(path, None)  # type: ignore
+        assert os.listdir(temp_dir) == ["stations.json"]
+        assert Path(path).read_bytes() == b"{}"
+
+
+def test_codes_resolve_and_complete() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "stations.json")
+        write_metadata(build_metadata(STATIONS_PAYLOAD["payload"]), path)
+        info = load_station_info(path)
+    assert info["Utrecht Centraal"].code == "UT"
+    codes = {info.code: name for name, info in info.items() if info.code}
+    names = ["Amsterdam Centraal", "Utrecht Centraal"]
+    assert StationResolver(names, aliases=codes).resolve("asd") == names[0]
+    assert CompletionIndex(names, aliases=codes).complete("ut") == [names[1]]
+    assert load_station_info(str(Path(temp_dir) / "missing.json")) == {}
@@ -0,0 +1,40 @@
+import httpx
+from pytest_httpx import HTTPXMock
+
+from nstimes.utils import API_URL
+from nstimes.utils import ClientSettings
+from nstimes.utils import close_client
+from nstimes.utils import configure_client
+from nstimes.utils import get_client
+from nstimes.utils import httpx_get
+
+
+def test_client_is_shared_between_requests(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json={})
+    httpx_mock.add_response(json={})
+    client = get_client()
+    httpx_get(token="x", query_params={}, api="v3/trips")
+    httpx_get(token="x", query_params={}, api="v2/stations")
+    assert get_client() is client
+    assert [str(request.url) for request in httpx_mock.get_requests()] == [
+        f"{API_URL}/v3/trips",
+        f"{API_URL}/v2/stations",
+    ]
+
+
+def test_configure_client_replaces_client() -> None:
+    client = get_client()
+    configure_client(ClientSettings(base_url="http://localhost:8000", timeout=1.5))
+    assert client.is_closed
+    assert get_client().base_url == "http://localhost:8000"
+    assert get_client().timeout == httpx.Timeout(1.5)
+    configure_client(ClientSettings())
+    assert get_client().base_url == f"{API_URL}/"
+
+
+def test_close_client_is_idempotent() -> None:
+    client = get_client()
+    close_client()
+    close_client()
+    assert client.is_closed
+    assert not get_client().is_closed
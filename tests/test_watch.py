@@ -0,0 +1,127 @@
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import cast
+from typing import Optional
+
+from nstimes.departure import Departure
+from nstimes.departure import Time
+from nstimes.errors import NSAPIError
+from nstimes.watch import DepartureBoard
+from nstimes.watch import MAX_BACKOFF
+from nstimes.watch import PollSchedule
+from nstimes.watch import watch
+
+NOW = datetime(2023, 10, 15, 12, 0)
+
+
+def departure(
+    minutes: int, delay: int = 0, platform: str = "5", cancelled: bool = False
+) -> Departure:
+    planned = NOW + timedelta(minutes=minutes)
+    actual = planned + timedelta(minutes=delay)
+    return Departure(
+        train_type="IC",
+        platform=platform,
+        departure_time=Time(planned=planned, actual=actual),
+        arrival_time=Time(planned=planned + timedelta(minutes=30), actual=actual),
+        cancelled=cancelled,
+        time_left=minutes + delay,
+    )
+
+
+def test_board_only_renders_changed_rows() -> None:
+    board = DepartureBoard("title")
+    assert board.update([departure(10), departure(20), departure(30)]) == 3
+    first, second, _ = board.rows.values()
+
+    assert board.update([departure(10), departure(20), departure(30)]) == 0
+    assert board.update([departure(10, delay=3), departure(20), departure(30)]) == 1
+    assert board.update([departure(10, delay=3), departure(20, platform="7")]) == 2
+    assert list(board.rows.values())[0] != first
+    assert list(board.rows.values())[1] != second
+
+    assert board.update([departure(20, platform="7", cancelled=True)]) == 2
+    assert len(board.render().rows) == 1
+
+
+def test_schedule_backs_off_and_speeds_up() -> None:
+    schedule = PollSchedule(interval=30)
+    later = [departure(20)]
+    assert schedule.next_delay(True, later) == 30
+    assert schedule.next_delay(False, later) == 60
+    assert schedule.next_delay(False, later) == 30 * MAX_BACKOFF
+    assert schedule.next_delay(False, later) == 30 * MAX_BACKOFF
+    assert schedule.next_delay(True, later) == 30
+    assert schedule.next_delay(False, [departure(2)]) == 15
+
+
+def test_watch_redraws_only_on_change() -> None:
+    polls = [[departure(10)], [departure(10)], [departure(10, delay=2)]]
+    redraws = []
+    delays: list[float] = []
+    watch(
+        DepartureBoard(),
+        fetch=lambda moment: polls.pop(0),
+        on_change=lambda board: redraws.append(dict(board.rows)),
+        polls=3,
+        sleep=delays.append,
+        clock=lambda: NOW,
+    )
+    assert len(redraws) == 2
+    assert len(delays) == 2
+
+
+def test_board_counts_down_without_changing_rows() -> None:
+    board = DepartureBoard()
+    board.update([departure(10)])
+    assert not board.tick(NOW)
+    # The same train a minute later is not a change
+    a_minute_later = departure(10)
+    a_minute_later.time_left = 9
+    assert board.update([a_minute_later]) == 0
+    assert board.tick(NOW + timedelta(minutes=1))
+    assert "9" in list(board.rows.values())[0][2]
+
+
+def test_watch_backs_off_while_only_time_passes() -> None:
+    moments = [NOW + timedelta(minutes=minute) for minute in range(0, 20, 2)]
+    clock = iter(moment for moment in moments for _ in range(4))
+    delays: list[float] = []
+    watch(
+        DepartureBoard(),
+        fetch=lambda moment: [departure(30)],
+        on_change=lambda board: None,
+        schedule=PollSchedule(interval=30),
+        polls=4,
+        sleep=delays.append,
+        clock=lambda: next(clock),
+    )
+    # Backs off to MAX_BACKOFF, slept in steps of COUNTDOWN_INTERVAL
+    assert delays == [30, 60, 60, 60]
+    assert sum(delays[2:]) == 30 * MAX_BACKOFF
+
+
+def test_watch_shows_errors_and_keeps_polling() -> None:
+    responses: list[Any] = [
+        [departure(10)],
+        NSAPIError("NS API returned 500"),
+        [departure(10)],
+    ]
+
+    def fetch(moment: datetime) -> list[Departure]:
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return cast(list[Departure], response)
+
+    shown: list[Optional[str]] = []
+    watch(
+        DepartureBoard(),
+        fetch=fetch,
+        on_change=lambda board: shown.append(board.error),
+        polls=3,
+        sleep=lambda _: None,
+        clock=lambda: NOW,
+    )
+    assert shown == [None, "NS API returned 500", None]